@@ -0,0 +1,263 @@
+# coding=utf-8
+
+"""
+Análisis de las sesiones guardadas en data/*.csv.
+
+Cada archivo se lee a columnas numpy tipadas y se resume por sujeto y bloque con operaciones
+vectorizadas: tasa de omisiones, precisión, TR medio de los aciertos (recortado) en ensayos
+congruentes (HH, SS) e incongruentes (HS, SH) y el efecto de interferencia (incongruente -
+congruente). Los archivos se procesan en paralelo y el resumen de cada uno se guarda en
+data/analysis_cache.json, así que al volver a correr solo se leen los archivos nuevos o modificados.
+
+Recorte del TR: se descartan los TR fuera de [min_rt, max_rt] y luego, por sujeto, bloque y
+congruencia, los que se alejan más de trim_sd desviaciones estándar de la media.
+
+Uso:
+    python analysis.py                              # todos los archivos de data/
+    python analysis.py data/a.csv data/b.csv --out resumen.csv --workers 4
+"""
+import argparse, csv, json, os, sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from time import perf_counter
+
+import numpy as np
+
+script_path = Path(__file__).parent.resolve()
+
+data_folder = script_path/"data"
+cache_file = data_folder/"analysis_cache.json"
+cache_version = 1
+
+defaults = {"min_rt": 200, "max_rt": 1200, "trim_sd": 2.5}
+
+summary_columns = ("Archivo", "Sujeto", "Bloque", "TipoRespuesta", "Ensayos", "Omisiones", "Precision",
+                   "PrecisionCongruente", "PrecisionIncongruente", "TRCongruente", "TRIncongruente",
+                   "Interferencia", "InterferenciaPrecision", "Recortados")
+
+
+def session_files(folder=data_folder):
+    """Result files of a folder (telemetry sidecars and other CSVs are skipped)"""
+    files = []
+    for path in sorted(Path(folder).glob("*.csv")):
+        with open(path, newline='', encoding='utf-8') as f:
+            header = f.readline()
+        if header.startswith("Sujeto,"):
+            files.append(path)
+    return files
+
+
+def read_columns(path):
+    """Reads a result file into typed numpy arrays (one per column)
+
+    A last line cut by a crash and rows with a wrong number of values are skipped. The RT is
+    taken from TReaccionUs (from the stimulus onset) when the file has it, else from TReaccion.
+    """
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        rows = [row for row in reader if header and len(row) == len(header)]
+    if not rows:
+        return None
+    values = dict(zip(header, zip(*rows)))
+
+    if "TReaccionUs" in values:
+        rt = np.array([float(value) / 1000 if value else np.nan for value in values["TReaccionUs"]])
+    else:
+        rt = np.array([float(value) if value else np.nan for value in values["TReaccion"]])
+    answer = np.array(values["Respuesta"])
+    missed = answer == "Missed"
+    rt[missed] = np.nan
+
+    return {
+        "subject": values["Sujeto"][0],
+        "block": np.array(values["Bloque"], dtype=np.int16),
+        "task": np.array(values["TipoRespuesta"]),
+        "face_happy": np.array(values["TipoImagen"]) == "Happy",
+        "word_happy": np.array(values["Palabra"]) == "Happy",
+        "correct": np.array([value == "1" for value in values["Acierto"]]),
+        "missed": missed,
+        "rt": rt,
+    }
+
+
+def trim(rt, groups, min_rt, max_rt, trim_sd):
+    """Mask of the RTs kept: inside [min_rt, max_rt] and within trim_sd SD of their group mean"""
+    keep = ~np.isnan(rt) & (rt >= min_rt) & (rt <= max_rt)
+    count = np.bincount(groups, weights=keep)
+    total = np.bincount(groups, weights=np.where(keep, rt, 0))
+    squares = np.bincount(groups, weights=np.where(keep, rt ** 2, 0))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = total / count
+        sd = np.sqrt(np.maximum(squares / count - mean ** 2, 0))
+    if trim_sd:
+        keep &= np.abs(rt - mean[groups]) <= trim_sd * sd[groups]
+    return keep
+
+
+def summarize(columns, min_rt=defaults["min_rt"], max_rt=defaults["max_rt"], trim_sd=defaults["trim_sd"]):
+    """Per-block summary rows of one session"""
+    blocks, block_index = np.unique(columns["block"], return_inverse=True)
+    correct = columns["correct"]
+    answered = ~columns["missed"]
+
+    # Grupos bloque x congruencia: 2 * bloque + congruente
+    groups = 2 * block_index + (columns["face_happy"] == columns["word_happy"])
+    size = 2 * len(blocks)
+    valid = answered & correct
+    keep = trim(np.where(valid, columns["rt"], np.nan), groups, min_rt, max_rt, trim_sd)
+
+    def per_group(mask, weights=None):
+        return np.bincount(groups, weights=mask if weights is None else np.where(mask, weights, 0), minlength=size)
+
+    trials = per_group(np.ones_like(correct))
+    answered_n = per_group(answered)
+    correct_n = per_group(correct & answered)
+    kept_n = per_group(keep)
+    rt_sum = per_group(keep, columns["rt"])
+    trimmed_n = per_group(valid) - kept_n
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        accuracy = correct_n / answered_n
+        mean_rt = rt_sum / kept_n
+
+    summary = []
+    for index, block in enumerate(blocks):
+        incongruent, congruent = 2 * index, 2 * index + 1
+        n = trials[incongruent] + trials[congruent]
+        answered_block = answered_n[incongruent] + answered_n[congruent]
+        tasks = columns["task"][block_index == index]
+        summary.append({
+            "Sujeto": columns["subject"],
+            "Bloque": int(block),
+            "TipoRespuesta": str(tasks[0]) if len(tasks) else "",
+            "Ensayos": int(n),
+            "Omisiones": float(1 - answered_block / n) if n else None,
+            "Precision": float((correct_n[incongruent] + correct_n[congruent]) / answered_block) if answered_block else None,
+            "PrecisionCongruente": nullable(accuracy[congruent]),
+            "PrecisionIncongruente": nullable(accuracy[incongruent]),
+            "TRCongruente": nullable(mean_rt[congruent]),
+            "TRIncongruente": nullable(mean_rt[incongruent]),
+            "Interferencia": nullable(mean_rt[incongruent] - mean_rt[congruent]),
+            "InterferenciaPrecision": nullable(accuracy[congruent] - accuracy[incongruent]),
+            "Recortados": int(trimmed_n[incongruent] + trimmed_n[congruent]),
+        })
+    return summary
+
+
+def nullable(value):
+    return None if np.isnan(value) else float(value)
+
+
+def analyze_file(path, settings=defaults):
+    """Summary rows of one file (run in the worker processes)"""
+    columns = read_columns(path)
+    if columns is None:
+        return []
+    return [{"Archivo": Path(path).name, **row} for row in summarize(columns, **settings)]
+
+
+def file_key(path):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def load_cache(path, settings):
+    try:
+        with open(path, encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if cache.get("version") != cache_version or cache.get("settings") != settings:
+        return {}  # otros parámetros de recorte: se recalcula todo
+    return cache.get("files", {})
+
+
+def save_cache(path, settings, files):
+    tmp_path = Path(str(path) + ".tmp")
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": cache_version, "settings": settings, "files": files}, f)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+
+
+def analyze(paths, settings=defaults, workers=None, cache_path=cache_file):
+    """Summary rows of every file, parsing only the files that are not cached (in parallel)"""
+    settings = {**defaults, **settings}
+    cached = load_cache(cache_path, settings) if cache_path else {}
+    files = {}
+    pending = []
+    for path in paths:
+        name = str(Path(path).resolve())
+        entry = cached.get(name)
+        if entry is not None and entry["key"] == file_key(path):
+            files[name] = entry
+        else:
+            pending.append(path)
+
+    if len(pending) > 1 and workers != 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(analyze_file, pending, [settings] * len(pending),
+                                    chunksize=max(1, len(pending) // (4 * (workers or os.cpu_count() or 1)))))
+    else:
+        results = [analyze_file(path, settings) for path in pending]
+    for path, rows in zip(pending, results):
+        files[str(Path(path).resolve())] = {"key": file_key(path), "rows": rows}
+
+    if cache_path and pending:
+        save_cache(cache_path, settings, {**cached, **files})
+    return [row for path in paths for row in files[str(Path(path).resolve())]["rows"]], len(pending)
+
+
+def group_means(rows):
+    """Mean of each measure across subjects, per response type (Cara/Palabra)"""
+    groups = {}
+    for row in rows:
+        groups.setdefault(row["TipoRespuesta"], []).append(row)
+    means = {}
+    for task, task_rows in sorted(groups.items()):
+        means[task] = {"n": len(task_rows)}
+        for column in summary_columns[5:]:
+            values = np.array([row[column] for row in task_rows if row[column] is not None], dtype=float)
+            means[task][column] = float(values.mean()) if len(values) else None
+    return means
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="*", help="archivos de resultados (por defecto todos los de data/)")
+    parser.add_argument("--out", help="guardar el resumen por sujeto y bloque en este CSV")
+    parser.add_argument("--workers", type=int, default=None, help="procesos en paralelo (1 = sin procesos)")
+    parser.add_argument("--min-rt", type=float, default=defaults["min_rt"], help="TR mínimo válido (ms)")
+    parser.add_argument("--max-rt", type=float, default=defaults["max_rt"], help="TR máximo válido (ms)")
+    parser.add_argument("--trim-sd", type=float, default=defaults["trim_sd"], help="recorte en DE (0 = sin recorte)")
+    parser.add_argument("--no-cache", action="store_true", help="no usar ni actualizar el cache")
+    args = parser.parse_args(argv)
+
+    paths = [Path(path) for path in args.paths] or session_files()
+    settings = {"min_rt": args.min_rt, "max_rt": args.max_rt, "trim_sd": args.trim_sd}
+    t0 = perf_counter()
+    rows, parsed = analyze(paths, settings, args.workers, None if args.no_cache else cache_file)
+    print(f"{len(paths)} archivos ({parsed} leídos, {len(paths) - parsed} desde el cache), "
+          f"{len(rows)} bloques en {perf_counter() - t0:.2f} s")
+
+    for task, means in group_means(rows).items():
+        print(f"{task} (n={means['n']}): precisión {format_value(means['Precision'], 3)}, "
+              f"omisiones {format_value(means['Omisiones'], 3)}, TR congruente {format_value(means['TRCongruente'], 1)} ms, "
+              f"incongruente {format_value(means['TRIncongruente'], 1)} ms, interferencia {format_value(means['Interferencia'], 1)} ms")
+
+    if args.out:
+        with open(args.out, "w", newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, summary_columns, lineterminator='\n')
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+def format_value(value, decimals):
+    return "-" if value is None else f"{value:.{decimals}f}"
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3.11
+# coding=utf-8
+
+"""
+Atlas de estímulos pre-renderizados.
+
+Compila todas las caras (ya escaladas y en escala de grises) en un único archivo de pixeles
+crudos (media/atlas.bin) con un índice (media/atlas.json). El experimento mapea el archivo en
+memoria al iniciar y crea las Surfaces directamente desde el buffer, sin decodificar JPEG/PNG.
+
+Uso:
+    python atlas.py --size 350
+    python atlas.py --force        # recompila aunque las imágenes no hayan cambiado
+"""
+import argparse, hashlib, json, mmap, os, sys
+import pygame
+from pathlib import Path
+from time import perf_counter
+
+import stimuli
+
+script_path = Path(__file__).parent.resolve()
+
+atlas_file = script_path/"media"/"atlas.bin"
+index_file = script_path/"media"/"atlas.json"
+
+atlas_version = 1
+pixel_format = "RGB"
+
+
+def file_hash(path):
+    """Returns the sha1 of a file content"""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def relative_key(path):
+    """Index key of an image: its path relative to the script folder, with / separators"""
+    path = Path(path).resolve()
+    try:
+        return path.relative_to(script_path).as_posix()
+    except ValueError:
+        return path.as_posix()
+
+
+def read_index(index_path=index_file):
+    try:
+        with open(index_path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def compile_atlas(folders=stimuli.image_folders, size=350, grayscale=True, atlas_path=atlas_file,
+                  index_path=index_file, force=False):
+    """Renders every image of the folders into the atlas, returns True if it was rebuilt"""
+    images = [image for folder in folders for image in stimuli.list_images(folder)]
+    hashes = {relative_key(image): file_hash(image) for image in images}
+
+    index = read_index(index_path)
+    if (not force and index is not None and Path(atlas_path).exists()
+            and index.get("version") == atlas_version and index.get("size") == size
+            and index.get("grayscale") == grayscale
+            and {key: entry["sha1"] for key, entry in index["images"].items()} == hashes):
+        return False
+
+    entries = {}
+    offset = 0
+    tmp_path = Path(str(atlas_path) + ".tmp")
+    with open(tmp_path, "wb") as f:
+        for image in images:
+            try:
+                picture = stimuli.load_image(image, size, grayscale)
+            except pygame.error as e:
+                print(f"Error al cargar imagen {image}: {e}")
+                continue
+            data = pygame.image.tobytes(picture, pixel_format)
+            f.write(data)
+            stat = os.stat(image)
+            entries[relative_key(image)] = {
+                "offset": offset,
+                "width": picture.get_width(),
+                "height": picture.get_height(),
+                "sha1": hashes[relative_key(image)],
+                "bytes": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+            }
+            offset += len(data)
+    os.replace(tmp_path, atlas_path)
+
+    with open(index_path, "w", encoding="utf-8") as f:
+        json.dump({"version": atlas_version, "size": size, "grayscale": grayscale,
+                   "format": pixel_format, "images": entries}, f, indent=1)
+    return True
+
+
+class Atlas:
+    """Memory-mapped atlas, surfaces are created straight from the mapped buffer"""
+
+    def __init__(self, atlas_path=atlas_file, index_path=index_file):
+        self.index = read_index(index_path)
+        if self.index is None or self.index.get("version") != atlas_version:
+            raise FileNotFoundError(f"Índice de atlas inválido o inexistente: {index_path}")
+        self.file = open(atlas_path, "rb")
+        self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def matches(self, size, grayscale):
+        return self.index["size"] == size and self.index["grayscale"] == grayscale
+
+    def is_fresh(self, image):
+        """True if the image is in the atlas and its source was not modified since compiling"""
+        entry = self.index["images"].get(relative_key(image))
+        if entry is None:
+            return False
+        try:
+            stat = os.stat(image)
+        except OSError:
+            return False
+        return stat.st_size == entry["bytes"] and stat.st_mtime_ns == entry["mtime_ns"]
+
+    def surface(self, image):
+        """Returns a Surface referencing the mapped pixels of the image"""
+        entry = self.index["images"][relative_key(image)]
+        length = entry["width"] * entry["height"] * len(self.index["format"])
+        view = memoryview(self.buffer)[entry["offset"]:entry["offset"] + length]
+        return pygame.image.frombuffer(view, (entry["width"], entry["height"]), self.index["format"])
+
+    def close(self):
+        # las Surfaces de frombuffer deben convertirse (copiarse) antes de cerrar el mapa
+        self.buffer.close()
+        self.file.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compila las imágenes de estímulos en un atlas de pixeles crudos")
+    parser.add_argument("folders", nargs="*", default=stimuli.image_folders, help="carpetas de imágenes (por defecto Happy y Sad)")
+    parser.add_argument("--size", type=int, default=350, help="ancho final en pixeles (base_size)")
+    parser.add_argument("--color", action="store_true", help="no convertir a escala de grises")
+    parser.add_argument("--force", action="store_true", help="recompilar aunque no haya cambios")
+    args = parser.parse_args(argv)
+
+    t0 = perf_counter()
+    if compile_atlas(args.folders, args.size, not args.color, force=args.force):
+        index = read_index()
+        print(f"Atlas compilado: {len(index['images'])} imágenes, {atlas_file.stat().st_size / 2**20:.1f} MB en {perf_counter() - t0:.2f} s")
+    else:
+        print("Atlas al día, no hay cambios en las imágenes")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
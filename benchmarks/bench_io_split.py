@@ -0,0 +1,117 @@
+#!/usr/bin/env python3.11
+# coding=utf-8
+
+"""
+Variación del tiempo entre cuadros con y sin el proceso de E/S (io_split, iochannel.py).
+
+Presenta cuadros a ritmo de refresco con el FrameScheduler del experimento y, cada tantos
+cuadros, hace la E/S de un ensayo: los print de depuración de wait_answer y de los triggers
+y la fila del archivo de resultados. La consola lenta de Windows se emula con una pausa por
+cada escritura. En modo directo esa E/S ocurre en el hilo de presentación; con la división
+solo se copian registros a memoria compartida y la pausa la sufre el proceso acompañante.
+
+Uso:
+    python benchmarks/bench_io_split.py
+    python benchmarks/bench_io_split.py --trials 200 --console-delay 5 --json io_split.json
+"""
+import argparse, json, os, sys, tempfile
+from pathlib import Path
+from time import sleep
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from headless import load_experiment
+import iochannel
+from results import ResultWriter
+
+
+class SlowConsole:
+    """stdout stand-in that pauses on every write, like a slow Windows console"""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.sink = open(os.devnull, "w", encoding="utf-8")
+
+    def write(self, text):
+        self.sink.write(text)
+        sleep(self.delay)
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+def trial_io(dfile, trial):
+    """Console output and result row of one trial, as in show_images/wait_answer/send_triggert"""
+    print("Happy")
+    print("Sad")
+    print(False)
+    print("Trigger 1")
+    print("Trigger 21")
+    print("Trigger 200")
+    dfile.write(["bench", f"{trial:03d}", 1, 612, "Happy", "Sad", "Cara", "Sad", 0, 812345, 903456])
+
+
+def run(experiment, split, trials, frames_per_trial, console_delay, folder):
+    """Presents trials * frames_per_trial frames, returns the frame intervals (ms)"""
+    path = Path(folder)/("split.csv" if split else "direct.csv")
+    stdout = sys.stdout
+    if split:
+        _, dfile, sys.stdout = iochannel.start(path, console_path=os.devnull, console_delay=console_delay)
+    else:
+        dfile = ResultWriter(path)
+        sys.stdout = SlowConsole(console_delay)
+
+    scheduler = experiment.scheduler
+    scheduler.reset()
+    scheduler.resync()
+    dropped = scheduler.dropped_frames
+    onsets = []
+    try:
+        for trial in range(trials):
+            for frame in range(frames_per_trial):
+                onsets.append(scheduler.flip([]))
+                if frame == 1:
+                    trial_io(dfile, trial)
+    finally:
+        sys.stdout = stdout
+        dfile.close()
+    return [(b - a) / 1e6 for a, b in zip(onsets, onsets[1:])], scheduler.dropped_frames - dropped
+
+
+def stats(intervals):
+    intervals = sorted(intervals)
+    mean = sum(intervals) / len(intervals)
+    sd = (sum((value - mean) ** 2 for value in intervals) / len(intervals)) ** 0.5
+    return {"mean_ms": mean, "sd_ms": sd, "p99_ms": intervals[int(0.99 * (len(intervals) - 1))], "max_ms": intervals[-1]}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trials", type=int, default=100, help="ensayos simulados por modo")
+    parser.add_argument("--frames", type=int, default=12, help="cuadros por ensayo")
+    parser.add_argument("--console-delay", type=float, default=3.0, help="pausa por escritura en la consola (ms)")
+    parser.add_argument("--json", help="guardar los resultados en este archivo")
+    args = parser.parse_args(argv)
+
+    experiment = load_experiment(headless=True, discover=False)
+    experiment.debug_mode = False
+    experiment.init()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as folder:
+        for split in (False, True):
+            intervals, dropped = run(experiment, split, args.trials, args.frames, args.console_delay / 1000, folder)
+            name = "dividido" if split else "directo"
+            results[name] = {**stats(intervals), "dropped_frames": dropped}
+            row = results[name]
+            print(f"{name:>9}: intervalo {row['mean_ms']:.3f} ± {row['sd_ms']:.3f} ms, p99 {row['p99_ms']:.3f} ms, "
+                  f"máx {row['max_ms']:.3f} ms, {dropped} cuadros perdidos")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"refresh_rate": experiment.scheduler.refresh_rate, "settings": vars(args), "results": results},
+                      f, indent=1)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3.11
+# coding=utf-8
+
+"""
+Compara el costo de presentar cada fase del ensayo con flips de pantalla completa y con
+rectángulos sucios (dirty_rects), a varias resoluciones, usando redraw/trial_frame y el
+FrameScheduler del experimento.
+
+Sin pantalla (driver dummy) mide el costo de copiar el framebuffer; en el PC del laboratorio
+se puede correr con --display para medir con el driver de video real.
+
+Uso:
+    python benchmarks/bench_render.py
+    python benchmarks/bench_render.py --resolutions 1920x1080 2560x1440 --trials 200 --json render.json
+"""
+import argparse, json, os, sys
+from pathlib import Path
+from time import perf_counter_ns
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from headless import load_experiment
+
+default_resolutions = ["1280x720", "1920x1080", "2560x1440", "3840x2160"]
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+
+def run(experiment, resolution, dirty, trials):
+    """Times redraw + present of every phase, returns {phase: [ms, ...]}"""
+    experiment.window_resolution = resolution
+    experiment.dirty_rects = dirty
+    experiment.use_vsync = False
+    experiment.init()
+
+    # Scheduler sin ritmo de refresco: solo se mide el costo de dibujar y presentar
+    scheduler = experiment.FrameScheduler(vsync=True, partial_updates=dirty)
+    experiment.trial_frames.clear()
+    image_list = experiment.first_experiment_block[:trials]
+    experiment.build_trial_frames([image_list], experiment.base_size, grayscale=True)
+
+    times = {"inicio": [], "fijacion": [], "estimulo": [], "respuesta": [], "iti": []}
+
+    def present(phase, rects):
+        scheduler.flip(rects)
+
+    for count, (image, word) in enumerate(image_list):
+        t0 = perf_counter_ns()
+        if count == 0:
+            present("inicio", experiment.clear_screen())
+            times["inicio"].append((perf_counter_ns() - t0) / 1e6)
+            t0 = perf_counter_ns()
+        present("fijacion", experiment.redraw([(experiment.fix, experiment.fixbox)]))
+        times["fijacion"].append((perf_counter_ns() - t0) / 1e6)
+
+        t0 = perf_counter_ns()
+        present("estimulo", experiment.redraw(experiment.trial_frame(image, word, experiment.base_size, grayscale=True)))
+        times["estimulo"].append((perf_counter_ns() - t0) / 1e6)
+
+        t0 = perf_counter_ns()
+        present("respuesta", [])  # la ventana de respuesta no cambia la pantalla
+        times["respuesta"].append((perf_counter_ns() - t0) / 1e6)
+
+        t0 = perf_counter_ns()
+        present("iti", experiment.redraw([]))
+        times["iti"].append((perf_counter_ns() - t0) / 1e6)
+    return times
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--resolutions", nargs="+", default=default_resolutions, help="resoluciones ANCHOxALTO")
+    parser.add_argument("--trials", type=int, default=100, help="ensayos por combinación")
+    parser.add_argument("--display", action="store_true", help="usar el driver de video real en lugar de dummy")
+    parser.add_argument("--json", help="guardar los resultados en este archivo")
+    args = parser.parse_args(argv)
+
+    experiment = load_experiment(headless=not args.display)
+    experiment.debug_mode = False
+    experiment.FullScreenShow = False
+
+    results = []
+    print(f"{'resolución':>11} {'modo':>6} {'fase':>10} {'media ms':>9} {'p95 ms':>8} {'máx ms':>8}")
+    for text in args.resolutions:
+        resolution = tuple(int(value) for value in text.lower().split("x"))
+        for dirty in (False, True):
+            times = run(experiment, resolution, dirty, args.trials)
+            for phase, values in times.items():
+                row = {"resolution": text, "mode": "dirty" if dirty else "full", "phase": phase,
+                       "mean_ms": sum(values) / len(values), "p95_ms": percentile(values, 95), "max_ms": max(values)}
+                results.append(row)
+                print(f"{text:>11} {row['mode']:>6} {phase:>10} {row['mean_ms']:9.3f} {row['p95_ms']:8.3f} {row['max_ms']:8.3f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"driver": os.environ.get("SDL_VIDEODRIVER", "default"), "results": results}, f, indent=1)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
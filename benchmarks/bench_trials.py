@@ -0,0 +1,241 @@
+#!/usr/bin/env python3.11
+# coding=utf-8
+
+"""
+Benchmark del ciclo de ensayos sin pantalla ni participante.
+
+Ejecuta el show_images/wait_answer/paragraph reales con el driver de video dummy de SDL. Un
+participante sintético envía KEYDOWN/KEYUP con tiempos de reacción ex-gaussianos y los
+triggers van a un puerto falso que registra cuándo se escribió cada byte. Reporta:
+
+- error por fase (lograda - pedida) en percentiles,
+- distancia entre el flip del estímulo y la escritura de su trigger,
+- duración total del bloque frente al programa nominal,
+- uso de CPU y costo de paragraph(),
+
+y guarda todo en JSON para comparar versiones.
+
+Uso:
+    python benchmarks/bench_trials.py --trials 40 --out benchmarks/results/trials.json
+"""
+import argparse, json, platform, random, subprocess, sys, tempfile, threading
+from pathlib import Path
+from time import gmtime, perf_counter_ns, strftime
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from headless import load_experiment, script_path
+
+stimulus_codes = {11, 12, 21, 22}
+
+
+def percentiles(values, qs=(50, 90, 95, 99, 100)):
+    values = sorted(values)
+    if not values:
+        return {}
+    return {f"p{q}": values[min(len(values) - 1, int(q / 100 * len(values)))] for q in qs}
+
+
+class FakePort:
+    """Serial port stand-in: keeps (byte, perf_counter_ns) of every write"""
+
+    is_open = True
+
+    def __init__(self):
+        self.writes = []
+
+    def write(self, data):
+        self.writes.append((data[0], perf_counter_ns()))
+
+    def close(self):
+        pass
+
+
+class SyntheticParticipant:
+    """Answers each stimulus with an ex-Gaussian RT, a given accuracy and miss rate"""
+
+    def __init__(self, experiment, image_list, block, keys, mu=550, sigma=60, tau=120, accuracy=0.9,
+                 miss_rate=0.05, hold_ms=(80, 140), seed=None):
+        self.experiment = experiment
+        self.image_list = image_list
+        self.keys_by_answer = {answer: key for key, answer in keys.items()}
+        self.type_of_answer = "image" if block == 1 else "word"
+        self.mu, self.sigma, self.tau = mu, sigma, tau
+        self.accuracy = accuracy
+        self.miss_rate = miss_rate
+        self.hold_ms = hold_ms
+        self.random = random.Random(seed)
+        self.trial = 0
+        self.timers = []
+
+    def rt_ms(self):
+        return max(120.0, self.random.gauss(self.mu, self.sigma) + self.random.expovariate(1 / self.tau))
+
+    def post(self, event_type, key):
+        pygame = self.experiment.pygame
+        pygame.event.post(pygame.event.Event(event_type, key=key))
+
+    def on_stimulus(self):
+        image, word = self.image_list[self.trial]
+        self.trial += 1
+        if self.random.random() < self.miss_rate:
+            return
+        correct = self.experiment.image_type(image) if self.type_of_answer == "image" else word
+        answer = correct if self.random.random() < self.accuracy else ("Sad" if correct == "Happy" else "Happy")
+        key = self.keys_by_answer[answer]
+        rt = self.rt_ms() / 1000
+        release = rt + self.random.uniform(*self.hold_ms) / 1000
+        for delay, event_type in ((rt, self.experiment.pygame.KEYDOWN), (release, self.experiment.pygame.KEYUP)):
+            timer = threading.Timer(delay, self.post, (event_type, key))
+            timer.daemon = True
+            timer.start()
+            self.timers.append(timer)
+
+
+def git_version():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], cwd=script_path, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_block(experiment, args, block):
+    image_list = (experiment.first_experiment_block if block == 1 else experiment.second_experiment_block)[:args.trials]
+    keys = experiment.response_keys("F", "T")
+    participant = SyntheticParticipant(experiment, image_list, block, keys, args.mu, args.sigma, args.tau,
+                                       args.accuracy, args.miss_rate, seed=args.seed)
+
+    scheduler = experiment.scheduler
+    present = scheduler.present
+
+    def present_and_answer(phase, frames, rects=None):
+        onset = present(phase, frames, rects)
+        if phase == "estimulo":
+            participant.on_stimulus()
+        return onset
+
+    scheduler.present = present_and_answer
+    port = FakePort()
+    experiment.trigger_dispatcher = experiment.TriggerDispatcher(port, None, pulse_ms=experiment.trigger_latency,
+                                                                 telemetry=experiment.telemetry)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dfile = experiment.ResultWriter(Path(tmp)/"bench.csv")
+        experiment.events.start_measure()
+        t0 = perf_counter_ns()
+        experiment.show_images(image_list, uid="bench", dfile=dfile, block=block, VKeyboardSelection="F", NKeyboardSelection="T")
+        wall_ms = (perf_counter_ns() - t0) / 1e6
+        cpu = experiment.events.stop_measure()
+        dfile.close()
+        rows = experiment.read_session(Path(tmp)/"bench.csv")["rows"]
+
+    experiment.trigger_dispatcher.close()
+    experiment.trigger_dispatcher = None
+    del scheduler.present
+
+    phase_errors = {}
+    for phase, requested, achieved, interrupted in scheduler.durations():
+        if not interrupted:
+            phase_errors.setdefault(phase, []).append(achieved - requested)
+
+    # Flip del estímulo -> escritura de su trigger (en el mismo orden)
+    onsets = [onset for phase, _, onset, _, _ in scheduler.phases if phase == "estimulo"]
+    writes = [written for code, written in port.writes if code in stimulus_codes]
+    gaps = [(written - onset) / 1e6 for onset, written in zip(onsets, writes)]
+
+    # Programa nominal: lo pedido por fase; las ventanas de respuesta cortadas por la tecla
+    # cuentan lo que duraron, de modo que la diferencia con la pared es solo sobrecarga
+    durations = list(scheduler.durations())
+    nominal_ms = sum(achieved if interrupted else requested for _, requested, achieved, interrupted in durations)
+    measured_ms = sum(achieved for _, _, achieved, _ in durations)
+
+    rts = [int(row["TReaccionUs"]) / 1000 for row in rows if row["TReaccionUs"]]
+    return {
+        "block": block,
+        "trials": len(rows),
+        "answered": len(rts),
+        "accuracy": sum(row["Acierto"] == "1" for row in rows) / len(rows) if rows else None,
+        "rt_ms": percentiles(rts),
+        "phase_error_ms": {phase: percentiles(errors) for phase, errors in phase_errors.items()},
+        "onset_to_trigger_ms": percentiles(gaps),
+        "dropped_frames": scheduler.dropped_frames,
+        "wall_ms": wall_ms,
+        "scheduled_ms": measured_ms,
+        "nominal_ms": nominal_ms,
+        "cpu": cpu,
+    }
+
+
+def time_paragraph(experiment, repeats=50):
+    """Cost of drawing and presenting a full slide with paragraph()"""
+    slide = experiment.select_slide('welcome')
+    times = []
+    for _ in range(repeats):
+        t0 = perf_counter_ns()
+        experiment.paragraph(slide, no_foot=True)
+        times.append((perf_counter_ns() - t0) / 1e6)
+    return percentiles(times)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trials", type=int, default=40, help="ensayos por bloque")
+    parser.add_argument("--blocks", type=int, nargs="+", default=[1, 2], help="bloques a ejecutar")
+    parser.add_argument("--mu", type=float, default=550, help="media de la parte normal del TR (ms)")
+    parser.add_argument("--sigma", type=float, default=60, help="desviación de la parte normal del TR (ms)")
+    parser.add_argument("--tau", type=float, default=120, help="media de la parte exponencial del TR (ms)")
+    parser.add_argument("--accuracy", type=float, default=0.9, help="proporción de respuestas correctas")
+    parser.add_argument("--miss-rate", type=float, default=0.05, help="proporción de ensayos sin respuesta")
+    parser.add_argument("--seed", type=int, default=None, help="semilla del participante sintético")
+    parser.add_argument("--resolution", default="1920x1080", help="resolución de la ventana")
+    parser.add_argument("--dirty-rects", action="store_true", help="usar el modo de rectángulos sucios")
+    parser.add_argument("--no-gc-control", action="store_true", help="dejar el recolector de basura activo durante los bloques")
+    parser.add_argument("--alloc-audit", action="store_true", help="reportar la memoria asignada por ensayo (tracemalloc)")
+    parser.add_argument("--out", help="archivo JSON de resultados (por defecto benchmarks/results/trials_<fecha>.json)")
+    args = parser.parse_args(argv)
+
+    experiment = load_experiment(headless=True)
+    experiment.debug_mode = False
+    experiment.window_resolution = tuple(int(value) for value in args.resolution.lower().split("x"))
+    experiment.dirty_rects = args.dirty_rects
+    experiment.gc_control = not args.no_gc_control
+    experiment.alloc_audit = args.alloc_audit
+    experiment.init()
+
+    image_lists = [experiment.first_experiment_block[:args.trials], experiment.second_experiment_block[:args.trials]]
+    load_s = experiment.load_stimuli(image_lists, experiment.base_size, grayscale=True)
+    frames_s = experiment.build_trial_frames(image_lists, experiment.base_size, grayscale=True)
+
+    results = {
+        "date": strftime("%Y-%m-%d_%H-%M-%S", gmtime()),
+        "version": git_version(),
+        "python": platform.python_version(),
+        "pygame": experiment.pygame.version.ver,
+        "settings": vars(args),
+        "refresh_rate": experiment.scheduler.refresh_rate,
+        "vsync": experiment.scheduler.vsync,
+        "load_stimuli_s": load_s,
+        "build_trial_frames_s": frames_s,
+        "paragraph_ms": time_paragraph(experiment),
+        "blocks": [run_block(experiment, args, block) for block in args.blocks],
+    }
+
+    out = Path(args.out) if args.out else script_path/"benchmarks"/"results"/f"trials_{results['date']}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=1)
+
+    for block in results["blocks"]:
+        print(f"Bloque {block['block']}: {block['trials']} ensayos, {block['wall_ms'] / 1000:.1f} s "
+              f"(nominal {block['nominal_ms'] / 1000:.1f} s), CPU {block['cpu']['cpu_percent']:.1f}%, "
+              f"{block['dropped_frames']} cuadros perdidos")
+        for phase, stats in block["phase_error_ms"].items():
+            print(f"  {phase:>10}: error p50={stats['p50']:+.2f} p95={stats['p95']:+.2f} máx={stats['p100']:+.2f} ms")
+        gap = block["onset_to_trigger_ms"]
+        if gap:
+            print(f"  flip->trigger: p50={gap['p50']:.3f} p95={gap['p95']:.3f} máx={gap['p100']:.3f} ms")
+    print(f"Resultados en {out}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3.11
+# coding=utf-8
+
+"""
+Latencia de extremo a extremo de los triggers sobre un dispositivo virtual.
+
+Envía ráfagas de los códigos de trigger_helper por TriggerDispatcher (el mismo hilo de
+envío del experimento) hacia un puerto virtual (trigger_devices.py) que marca el instante en
+que recibe cada byte, y mide:
+
+- latencia encolado -> escritura, escritura -> recepción y encolado -> recepción,
+- códigos por segundo dentro de cada ráfaga,
+- orden y pérdidas (la secuencia recibida debe ser idéntica a la enviada),
+- pulsos superpuestos: un código escrito antes de que termine el pulso del anterior, según los
+  tiempos de escritura del propio dispatcher (en el puerto paralelo, además, cada código
+  recibido debe volver a cero antes del siguiente). La separación medida del lado receptor
+  incluye el jitter del hilo lector y solo se informa.
+
+Termina con código 1 si hay pérdidas, desorden o superposición, para usarlo como prueba de regresión.
+
+Uso:
+    python benchmarks/bench_triggers.py
+    python benchmarks/bench_triggers.py --devices loopback pty lpt --bursts 50 --json triggers.json
+"""
+import argparse, json, sys
+from pathlib import Path
+from time import perf_counter_ns, sleep
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from headless import load_experiment
+from trigger_devices import VirtualLpt, open_virtual
+from triggers import TriggerDispatcher
+
+
+def percentiles(values, qs=(50, 95, 99, 100)):
+    values = sorted(values)
+    if not values:
+        return {}
+    return {f"p{q}": values[min(len(values) - 1, int(q / 100 * len(values)))] for q in qs}
+
+
+def run(device_name, codes, bursts, pulse_ms, gap_ms):
+    """Sends the bursts through a dispatcher to the virtual device, returns the measurements"""
+    if device_name == "lpt":
+        device = VirtualLpt()
+        dispatcher = TriggerDispatcher(lpt=device, lpt_address=0, pulse_ms=pulse_ms)
+    else:
+        device = open_virtual(device_name)
+        dispatcher = TriggerDispatcher(serial_port=device.port, pulse_ms=pulse_ms)
+
+    burst_rates = []
+    for _ in range(bursts):
+        start = perf_counter_ns()
+        for code in codes:
+            dispatcher.send(code)
+        dispatcher.flush(timeout=10)
+        if device_name != "lpt":
+            device.wait(len(dispatcher.log))
+        burst_rates.append(len(codes) / ((perf_counter_ns() - start) / 1e9))
+        sleep(gap_ms / 1000)
+    dispatcher.close()
+
+    received = list(device.received)
+    if device_name != "lpt":
+        device.close()
+
+    # Del lado de escritura: cada código empieza después de que terminó el pulso del anterior
+    # (vuelta a cero o fin del ancho de pulso) y su pulso dura al menos pulse_ms
+    log = dispatcher.log
+    overlaps = sum(written < previous_reset for (_, _, _, previous_reset, _), (_, _, written, _, _) in zip(log, log[1:]))
+    short_pulses = sum(reset - written < pulse_ms * 1_000_000 for _, _, written, reset, _ in log)
+
+    # En el puerto paralelo cada código recibido va seguido de su vuelta a cero
+    widths = []
+    if device_name == "lpt":
+        pulses = []
+        for (value, t), (following, t_next) in zip(received, received[1:] + [(None, None)]):
+            if value == 0:
+                continue
+            if following != 0:
+                overlaps += 1  # el siguiente código pisó a este sin volver a cero
+                continue
+            pulses.append((value, t))
+            widths.append((t_next - t) / 1e6)
+        received = pulses
+
+    # Del lado serial el ancho es la separación entre bytes sucesivos de una ráfaga (con el jitter del lector)
+    gaps = [(b - a) / 1e6 for (_, a), (_, b) in zip(received, received[1:])]
+
+    sent = [code for code, *_ in dispatcher.log]
+    got = [code for code, _ in received]
+    reordered = next((i for i, (a, b) in enumerate(zip(sent, got)) if a != b), None)
+    latency = [(t - queued) / 1e6 for (_, queued, *_), (_, t) in zip(dispatcher.log, received)]
+    transport = [(t - written) / 1e6 for (_, _, written, *_), (_, t) in zip(dispatcher.log, received)]
+    write_latency = [(written - queued) / 1e6 for _, queued, written, _, _ in dispatcher.log]
+
+    return {
+        "device": device_name,
+        "sent": len(sent),
+        "received": len(got),
+        "dropped": len(sent) - len(got),
+        "first_out_of_order": reordered,
+        "overlapping_pulses": overlaps,
+        "short_pulses": short_pulses,
+        "failed_writes": sum(not ok for *_, ok in dispatcher.log),
+        "write_latency_ms": percentiles(write_latency),
+        "receive_latency_ms": percentiles(latency),  # incluye la espera en la cola detrás de la ráfaga
+        "transport_latency_ms": percentiles(transport),
+        "codes_per_second": percentiles(burst_rates, (0, 50, 100)),
+        "pulse_spacing_ms": percentiles(widths if device_name == "lpt" else gaps, (0, 50, 100)),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--devices", nargs="+", default=["loopback", "pty", "lpt"], help="loopback, pty y/o lpt")
+    parser.add_argument("--bursts", type=int, default=20, help="ráfagas por dispositivo")
+    parser.add_argument("--repeat", type=int, default=2, help="veces que se repite trigger_helper en cada ráfaga")
+    parser.add_argument("--pulse-ms", type=float, default=None, help="ancho de pulso (por defecto trigger_latency)")
+    parser.add_argument("--gap-ms", type=float, default=20, help="pausa entre ráfagas (ms)")
+    parser.add_argument("--json", help="guardar los resultados en este archivo")
+    args = parser.parse_args(argv)
+
+    experiment = load_experiment(headless=True, discover=False)
+    codes = list(experiment.trigger_helper.values()) * args.repeat
+    pulse_ms = experiment.trigger_latency if args.pulse_ms is None else args.pulse_ms
+
+    results = []
+    for device_name in args.devices:
+        if device_name == "pty" and sys.platform == "win32":
+            continue
+        result = run(device_name, codes, args.bursts, pulse_ms, args.gap_ms)
+        results.append(result)
+        transport = result["transport_latency_ms"]
+        print(f"{device_name:>8}: {result['received']}/{result['sent']} recibidos, "
+              f"escritura->recepción p50/p99/máx = {transport['p50']:.3f}/{transport['p99']:.3f}/{transport['p100']:.3f} ms, "
+              f"{result['codes_per_second']['p50']:.0f} códigos/s, superpuestos={result['overlapping_pulses']}, "
+              f"cortos={result['short_pulses']}, "
+              f"desorden={'no' if result['first_out_of_order'] is None else result['first_out_of_order']}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"pulse_ms": pulse_ms, "results": results}, f, indent=1)
+
+    failed = any(result["dropped"] or result["overlapping_pulses"] or result["short_pulses"]
+                 or result["first_out_of_order"] is not None
+                 or result["failed_writes"] for result in results)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
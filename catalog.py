@@ -0,0 +1,221 @@
+# coding=utf-8
+
+"""
+Catálogo de estímulos: tabla indexada con los atributos de cada imagen.
+
+Las carpetas de imágenes se recorren una vez y cada nombre de archivo se interpreta con el
+codebook de caras (docs/codebook_faces.csv): <número>_<código>.<ext>, p. ej. 001_ha_c.jpg es
+la cara 1 con el código ha_c (feliz, boca cerrada). Por imagen se guarda IdImagen, carpeta de
+emoción (Happy/Sad = TipoImagen), código, descripción, tamaño (leído del encabezado, sin
+decodificar) y el SHA-1 del contenido.
+
+El catálogo se guarda en media/catalog.json. Una carpeta cuyo mtime no cambió se toma completa
+del catálogo; en una que cambió solo se vuelven a leer los archivos nuevos o modificados.
+Las consultas (IdImagen, emoción y código de una imagen, selección por atributos) son búsquedas
+en diccionarios, sin trabajo de rutas ni de texto.
+Solo usa la biblioteca estándar para poder cargarse antes que pygame.
+
+Uso:
+    python catalog.py                      # resumen por emoción y código
+    python catalog.py --csv catalogo.csv   # tabla completa
+    python catalog.py --rebuild            # vuelve a leer y calcular el hash de todas las imágenes
+"""
+import argparse, csv, hashlib, json, os, re, struct, sys
+from pathlib import Path
+
+import manifest
+
+script_path = Path(__file__).parent.resolve()
+
+catalog_file = script_path/"media"/"catalog.json"
+codebook_file = script_path/"docs"/"codebook_faces.csv"
+image_folders = (script_path/"media"/"images"/"Happy", script_path/"media"/"images"/"Sad")
+catalog_version = 1
+
+# <número>_<código del codebook>, p. ej. 001_ha_c
+file_name = re.compile(r"^(?P<number>\d+)_(?P<code>[a-z]{2}_[a-z])$")
+
+columns = ("id", "emotion", "code", "expression", "number", "width", "height", "sha1", "path")
+
+# Marcadores JPEG con el tamaño de la imagen (SOF0-SOF15 salvo DHT, JPG y DAC)
+jpeg_frames = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def load_codebook(path=codebook_file):
+    """{code: description} from the codebook (rows whose first column is a face code)"""
+    codebook = {}
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for row in csv.reader(f):
+            if len(row) >= 2 and re.fullmatch(r"[a-z]{2}_[a-z]", row[0].strip()):
+                codebook[row[0].strip()] = row[1].strip()
+    return codebook
+
+
+def image_size(path):
+    """(width, height) read from a PNG or JPEG header, (None, None) for other formats"""
+    with open(path, "rb") as f:
+        header = f.read(26)
+        if header.startswith(b"\x89PNG\r\n\x1a\n"):
+            return struct.unpack(">II", header[16:24])
+        if not header.startswith(b"\xff\xd8"):
+            return None, None
+        f.seek(2)
+        while True:
+            marker = f.read(2)
+            if len(marker) < 2 or marker[0] != 0xFF:
+                return None, None
+            if marker[1] in (0xD8, 0x01) or 0xD0 <= marker[1] <= 0xD7:
+                continue  # marcadores sin longitud
+            length = struct.unpack(">H", f.read(2))[0]
+            if marker[1] in jpeg_frames:
+                height, width = struct.unpack(">xHH", f.read(5))
+                return width, height
+            f.seek(length - 2, os.SEEK_CUR)
+
+
+def file_hash(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def describe(path, emotion, codebook):
+    """Catalog entry of one image file (without the path)"""
+    path = Path(path)
+    stat = path.stat()
+    stem = path.name.split(".")[0]  # IdImagen, igual que image_id() del experimento
+    match = file_name.match(stem)
+    code = match["code"] if match else None
+    width, height = image_size(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "id": stem, "emotion": emotion, "code": code,
+            "expression": codebook.get(code), "number": int(match["number"]) if match else None,
+            "width": width, "height": height, "sha1": file_hash(path)}
+
+
+class Catalog:
+    """Column table of the stimuli with O(1) lookups by path and by IdImagen"""
+
+    def __init__(self, entries):
+        # Una lista por columna; la fila de una imagen es su posición
+        self.table = {column: [entry[column] for entry in entries] for column in columns}
+        self.by_path = {os.fspath(path): row for row, path in enumerate(self.table["path"])}
+        self.by_id = {image_id: row for row, image_id in enumerate(self.table["id"])}
+
+    def __len__(self):
+        return len(self.by_path)
+
+    def __contains__(self, image):
+        return os.fspath(image) in self.by_path
+
+    def get(self, image, column):
+        """Value of a column for an image path, None if the image is not in the catalog"""
+        row = self.by_path.get(os.fspath(image))
+        return None if row is None else self.table[column][row]
+
+    def id(self, image):
+        return self.table["id"][self.by_path[os.fspath(image)]]
+
+    def emotion(self, image):
+        return self.table["emotion"][self.by_path[os.fspath(image)]]
+
+    def record(self, image_id):
+        """Every column of an image by its IdImagen (e.g. when reading a result file)"""
+        row = self.by_id.get(image_id)
+        return None if row is None else {column: self.table[column][row] for column in columns}
+
+    def select(self, emotion=None, codes=None):
+        """Image paths with the given emotion folder and codebook codes (None = any), in file order"""
+        table = self.table
+        return [table["path"][row] for row in range(len(self))
+                if (emotion is None or table["emotion"][row] == emotion)
+                and (codes is None or table["code"][row] in codes)]
+
+    def counts(self):
+        """{(emotion, code): number of images}"""
+        counts = {}
+        for emotion, code in zip(self.table["emotion"], self.table["code"]):
+            counts[emotion, code] = counts.get((emotion, code), 0) + 1
+        return counts
+
+
+def load_catalog(folders=image_folders, catalog_path=catalog_file, codebook_path=codebook_file, rebuild=False,
+                 manifest_path=manifest.manifest_file):
+    """Builds the catalog of the image folders, reading only what changed since the saved one"""
+    try:
+        codebook = load_codebook(codebook_path)
+        codebook_mtime = os.stat(codebook_path).st_mtime_ns
+    except OSError:
+        codebook, codebook_mtime = {}, None
+    try:
+        with open(catalog_path, encoding="utf-8") as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        saved = {}
+    if rebuild or saved.get("version") != catalog_version or saved.get("codebook_mtime_ns") != codebook_mtime:
+        saved = {}
+    saved_folders = saved.get("folders", {})
+
+    changed = not saved
+    entries = []
+    content = {"version": catalog_version, "codebook_mtime_ns": codebook_mtime, "folders": {}}
+    images = manifest.load_manifest(folders, manifest_path)
+    for folder in folders:
+        folder = Path(folder)
+        mtime = os.stat(folder).st_mtime_ns
+        cached = saved_folders.get(folder.name, {})
+        files = cached.get("files", {})
+        if cached.get("mtime_ns") != mtime:
+            # Carpeta modificada: solo se vuelven a leer los archivos nuevos o distintos
+            changed = True
+            current = {}
+            for path in images[folder.name]:
+                entry = files.get(path.name)
+                stat = path.stat()
+                if entry is None or entry["size"] != stat.st_size or entry["mtime_ns"] != stat.st_mtime_ns:
+                    entry = describe(path, folder.name, codebook)
+                current[path.name] = entry
+            files = current
+        content["folders"][folder.name] = {"mtime_ns": mtime, "files": files}
+        entries += [{**entry, "path": folder/name} for name, entry in sorted(files.items())]
+
+    if changed:
+        try:
+            tmp_path = Path(str(catalog_path) + ".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(content, f, indent=1)
+            os.replace(tmp_path, catalog_path)
+        except OSError:
+            pass  # sin permiso de escritura en media/ se sigue sin cache
+    return Catalog(entries)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", help="guardar la tabla completa en este archivo")
+    parser.add_argument("--rebuild", action="store_true", help="no usar el catálogo guardado")
+    args = parser.parse_args(argv)
+
+    stimuli = load_catalog(rebuild=args.rebuild)
+    codebook = load_codebook()
+    print(f"{len(stimuli)} imágenes")
+    for (emotion, code), count in sorted(stimuli.counts().items(), key=lambda item: (item[0][0], item[0][1] or "")):
+        print(f"  {emotion:>6} {code or '(sin código)':>12}: {count:4d}  {codebook.get(code, '')}")
+    unknown = [image_id for image_id, code in zip(stimuli.table["id"], stimuli.table["code"])
+               if code is not None and code not in codebook]
+    if unknown:
+        print(f"Códigos que no están en el codebook: {', '.join(unknown)}")
+
+    if args.csv:
+        with open(args.csv, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f, lineterminator="\n")
+            writer.writerow(columns)
+            for row in range(len(stimuli)):
+                writer.writerow(["" if stimuli.table[column][row] is None else stimuli.table[column][row]
+                                 for column in columns[:-1]]
+                                + [Path(stimuli.table["path"][row]).relative_to(script_path).as_posix()])
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+# coding=utf-8
+
+"""
+Despacho central de eventos.
+
+En lugar de girar sobre pygame.event.get() sin pausa, las esperas se bloquean en
+pygame.event.wait con un tiempo límite y los últimos milisegundos antes de un plazo se
+esperan con un sondeo activo corto, para no perder precisión. Los eventos se envían a:
+
+- listeners: funciones (evento, instante_ns) que consumen el evento si retornan True
+  (p.ej. la captura de respuestas);
+- bindings: (tipo, tecla) -> handler(evento); si el handler retorna True la espera termina.
+"""
+import pygame
+from array import array
+from contextlib import contextmanager
+from pygame.locals import NOEVENT
+from time import perf_counter_ns, process_time_ns
+
+# Últimos ns antes de un plazo que se esperan con sondeo activo
+spin_margin = 1_500_000
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of a sorted list"""
+    if not values:
+        return float("nan")
+    return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+
+class EventDispatcher:
+    """Blocks on the event queue with timeouts and routes events to listeners and bindings"""
+
+    def __init__(self):
+        self.bindings = [{}]
+        self.listeners = []
+        self.measurement = None
+
+    def bind(self, event_type, handler, key=None):
+        """Permanent binding, e.g. bind(QUIT, exit)"""
+        self.bindings[0][(event_type, key)] = handler
+
+    @contextmanager
+    def bound(self, bindings=None, listener=None):
+        """Temporarily adds bindings {(type, key): handler} and/or a listener"""
+        self.bindings.append(bindings or {})
+        if listener is not None:
+            self.listeners.append(listener)
+        try:
+            yield self
+        finally:
+            self.bindings.pop()
+            if listener is not None:
+                self.listeners.remove(listener)
+
+    def dispatch(self, event, now):
+        """Sends one event to the listeners and bindings, True if a binding asked to stop"""
+        for listener in reversed(self.listeners):
+            if listener(event, now):
+                return False
+        key = getattr(event, "key", None)
+        for bindings in reversed(self.bindings):
+            handler = bindings.get((event.type, key)) or bindings.get((event.type, None))
+            if handler is not None:
+                return bool(handler(event))
+        return False
+
+    def pump(self):
+        """Dispatches every pending event without blocking"""
+        now = perf_counter_ns()
+        stop = False
+        for event in pygame.event.get():
+            stop = self.dispatch(event, now) or stop
+        return stop
+
+    def wait_until(self, deadline_ns=None, until=None):
+        """Waits for events until the deadline (None = no deadline)
+
+        Returns True as soon as a binding asks to stop or until() becomes true, False when the
+        deadline is reached.
+        """
+        while True:
+            if until is not None and until():
+                return True
+            now = perf_counter_ns()
+            remaining = None if deadline_ns is None else deadline_ns - now
+            if remaining is not None and remaining <= spin_margin:
+                return self.spin_until(deadline_ns, until)
+
+            timeout = 1000 if remaining is None else int(remaining - spin_margin) // 1_000_000
+            timeout = max(1, min(timeout, 1000))  # las esperas largas se hacen en tramos de 1 s
+            event = pygame.event.wait(timeout)
+            woke = perf_counter_ns()
+            if event.type == NOEVENT:
+                self.record_wake(woke, now + timeout * 1_000_000 if remaining is not None else None)
+                continue
+            self.record_wake(woke, None)
+            if self.dispatch(event, woke) or self.pump():
+                return True
+
+    def spin_until(self, deadline_ns, until=None):
+        """Polls the queue without sleeping during the last instants before a deadline"""
+        while True:
+            now = perf_counter_ns()
+            if now >= deadline_ns:
+                self.record_wake(now, deadline_ns)
+                return False
+            event = pygame.event.poll()
+            if event.type != NOEVENT:
+                if self.dispatch(event, now):
+                    return True
+                if until is not None and until():
+                    return True
+
+    # Medición de uso de CPU y latencia de despertar
+    def start_measure(self):
+        self.measurement = {"cpu": process_time_ns(), "wall": perf_counter_ns(), "events": 0, "lateness": array('d')}  # sin un float por espera
+
+    def record_wake(self, woke, deadline):
+        if self.measurement is None:
+            return
+        if deadline is None:
+            self.measurement["events"] += 1
+        else:
+            self.measurement["lateness"].append((woke - deadline) / 1000)
+
+    def stop_measure(self):
+        """Returns the CPU time, wall time and wake-up lateness (µs) since start_measure"""
+        measurement, self.measurement = self.measurement, None
+        if measurement is None:
+            return None
+        lateness = sorted(measurement["lateness"])
+        cpu = (process_time_ns() - measurement["cpu"]) / 1e9
+        wall = (perf_counter_ns() - measurement["wall"]) / 1e9
+        return {
+            "cpu_s": cpu,
+            "wall_s": wall,
+            "cpu_percent": 100 * cpu / wall if wall else 0.0,
+            "events": measurement["events"],
+            "timeouts": len(lateness),
+            "lateness_us": {q: percentile(lateness, q) for q in (50, 95, 99, 100)},
+        }
+
+
+def format_measurement(name, stats):
+    lateness = stats["lateness_us"]
+    return (f"{name}: CPU {stats['cpu_s']:.2f} s de {stats['wall_s']:.2f} s ({stats['cpu_percent']:.1f}%), "
+            f"{stats['events']} eventos, retraso al despertar p50/p95/p99/máx = "
+            f"{lateness[50]:.0f}/{lateness[95]:.0f}/{lateness[99]:.0f}/{lateness[100]:.0f} µs")
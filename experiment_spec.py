@@ -0,0 +1,323 @@
+# coding=utf-8
+
+"""
+Especificación declarativa del experimento y compilador a un plan de ejecución.
+
+experiment.json describe la estructura de la sesión:
+
+- subject: expresión regular del ID del participante, con los grupos uid, keys (asignación
+  de teclas, una de las entradas de keys) y first (tarea del primer bloque, una de tasks),
+- timing_ms: duración de cada fase (blanco inicial, fijación, estímulo, respuesta, ITI [mín, máx]),
+- triggers: código de cada evento (condiciones cara x palabra, respuestas, inicio de bloque,
+  start/stop de la sesión),
+- keys: por asignación, la respuesta de cada tecla; answer_labels: cómo se nombra cada respuesta,
+- tasks: por código, nombre (TipoRespuesta), qué se responde (face/word) y su diapositiva,
+- blocks: número, tarea ("first", "second" o un código de tasks) y trigger de inicio,
+- sequence: pasos de la sesión en orden ({"slide": ...}, {"block": n} o {"trigger": ...}),
+- slides: texto de cada diapositiva, con los campos {block}, {v}, {n} (respuesta de cada tecla)
+  y {opening} (task_openings según la posición del bloque).
+
+La diapositiva "intro" es la de la tarea del bloque. Un paso con "block" se omite si al
+bloque no le quedan ensayos (sesión reanudada).
+
+parse_subject() valida el ID contra la especificación y compile_plan() resuelve todo antes de
+la primera diapositiva: textos (ya renderizados en el cache), teclas, códigos de trigger, duraciones en
+cuadros y los ensayos de cada bloque (trials.Trial, con su respuesta esperada). El experimento
+solo recorre la lista de pasos.
+
+Uso:
+    python experiment_spec.py                    # valida experiment.json
+    python experiment_spec.py --id 4321_F_C      # muestra el plan compilado de ese participante
+"""
+import argparse, json, re, string, sys
+from pathlib import Path
+
+script_path = Path(__file__).parent.resolve()
+
+spec_file = script_path/"experiment.json"
+
+# Triggers que usa el ciclo de ensayos además de los de inicio de bloque
+required_triggers = ("fixation", "happy_happy", "happy_sad", "sad_sad", "sad_happy", "correct_response",
+                     "incorrect_response", "no_response", "start", "stop")
+timing_phases = ("initial_blank", "fixation", "stimulus", "answer")
+answers = ("Happy", "Sad")
+# Nombres de tecla que acepta la especificación (el experimento los convierte a pygame.K_<nombre>)
+key_names = frozenset(string.ascii_lowercase + string.digits) | {"space", "return", "tab", "backspace"}
+
+
+class SpecError(ValueError):
+    """The experiment specification is invalid (the message lists every problem)"""
+
+
+def load(path=spec_file):
+    """Reads and validates a JSON (or TOML) experiment specification"""
+    path = Path(path)
+    if path.suffix == ".toml":
+        try:
+            import tomllib  # Python 3.11+, solo se importa para especificaciones en TOML
+        except ImportError:
+            raise SpecError("Las especificaciones TOML requieren Python 3.11 o posterior")
+        with open(path, "rb") as f:
+            spec = tomllib.load(f)
+    else:
+        with open(path, encoding="utf-8") as f:
+            spec = json.load(f)
+    validate(spec)
+    return spec
+
+
+def validate(spec):
+    """Raises SpecError with every problem found in the specification"""
+    problems = []
+    sections = ("subject", "timing_ms", "triggers", "keys", "answer_labels", "tasks", "blocks", "sequence", "slides")
+    missing = [section for section in sections if section not in spec]
+    if missing:
+        raise SpecError("Faltan secciones en la especificación: " + ", ".join(missing))
+
+    try:
+        pattern = re.compile(spec["subject"]["pattern"])
+        if not {"uid", "keys", "first"} <= pattern.groupindex.keys():
+            problems.append("subject.pattern debe tener los grupos uid, keys y first")
+    except (KeyError, TypeError, re.error) as e:
+        problems.append(f"subject.pattern inválido: {e}")
+
+    timing = spec["timing_ms"]
+    for phase in timing_phases:
+        if not isinstance(timing.get(phase), (int, float)) or timing[phase] <= 0:
+            problems.append(f"timing_ms.{phase} debe ser un número positivo")
+    iti = timing.get("iti")
+    if not (isinstance(iti, list) and len(iti) == 2 and all(isinstance(ms, int) for ms in iti) and 0 < iti[0] <= iti[1]):
+        problems.append("timing_ms.iti debe ser [mín, máx] en ms enteros")
+
+    triggers = spec["triggers"]
+    for name in required_triggers:
+        if name not in triggers:
+            problems.append(f"Falta el trigger {name}")
+    for name, code in triggers.items():
+        if not isinstance(code, int) or not 0 < code < 256:
+            problems.append(f"El trigger {name} debe ser un entero entre 1 y 255")
+
+    for assignment, mapping in spec["keys"].items():
+        if sorted(mapping.values()) != sorted(answers):
+            problems.append(f"keys.{assignment} debe asignar Happy y Sad a una tecla cada una")
+        for key in mapping:
+            if key not in key_names:
+                problems.append(f"keys.{assignment} usa una tecla desconocida: {key}")
+    for answer in answers:
+        if answer not in spec["answer_labels"]:
+            problems.append(f"Falta answer_labels.{answer}")
+
+    slides = spec["slides"]
+    tasks = spec["tasks"]
+    for code, task in tasks.items():
+        if task.get("answer") not in ("face", "word"):
+            problems.append(f"tasks.{code}.answer debe ser face o word")
+        if not task.get("name"):
+            problems.append(f"tasks.{code}.name está vacío")
+        if task.get("slide") not in slides:
+            problems.append(f"tasks.{code}.slide no es una diapositiva de slides")
+
+    numbers = [block.get("number") for block in spec["blocks"]]
+    if len(set(numbers)) != len(numbers) or not all(isinstance(number, int) for number in numbers):
+        problems.append("Los números de bloque deben ser enteros distintos")
+    for block in spec["blocks"]:
+        task = block.get("task")
+        if task in ("first", "second"):
+            if len(tasks) != 2:
+                problems.append(f"El bloque {block.get('number')} usa \"{task}\", que requiere exactamente dos tareas")
+        elif task not in tasks:
+            problems.append(f"El bloque {block.get('number')} tiene una tarea desconocida: {task}")
+        if block.get("trigger") not in triggers:
+            problems.append(f"El bloque {block.get('number')} tiene un trigger desconocido: {block.get('trigger')}")
+
+    for position, step in enumerate(spec["sequence"]):
+        kinds = [kind for kind in ("slide", "trigger") if kind in step] or (["block"] if "block" in step else [])
+        if len(kinds) != 1:
+            problems.append(f"sequence[{position}] debe tener slide, block o trigger (solo uno)")
+            continue
+        if "block" in step and step["block"] not in numbers:
+            problems.append(f"sequence[{position}] usa el bloque {step['block']}, que no está en blocks")
+        if kinds[0] == "trigger" and step["trigger"] not in triggers:
+            problems.append(f"sequence[{position}] usa un trigger desconocido: {step['trigger']}")
+        if "key" in step and step["key"] not in key_names:
+            problems.append(f"sequence[{position}] usa una tecla desconocida: {step['key']}")
+        if kinds[0] == "slide":
+            if step["slide"] == "intro" and "block" not in step:
+                problems.append(f"sequence[{position}]: la diapositiva intro requiere block")
+            elif step["slide"] != "intro" and step["slide"] not in slides:
+                problems.append(f"sequence[{position}] usa una diapositiva desconocida: {step['slide']}")
+
+    openings = spec.get("task_openings", [""])
+    if not openings or not all(isinstance(opening, str) for opening in openings):
+        problems.append("task_openings debe ser una lista de textos no vacía")
+    fields = {"block": 1, "v": "", "n": "", "opening": ""}
+    for name, lines in slides.items():
+        if not isinstance(lines, list) or not all(isinstance(line, str) for line in lines):
+            problems.append(f"slides.{name} debe ser una lista de textos")
+            continue
+        try:
+            [line.format(**fields) for line in lines]
+        except (KeyError, IndexError, ValueError) as e:
+            problems.append(f"slides.{name} tiene un campo inválido: {e}")
+
+    if problems:
+        raise SpecError("Especificación inválida:\n  " + "\n  ".join(problems))
+
+
+def parse_subject(spec, name):
+    """{uid, keys, first} of a participant ID, None if it does not match the specification"""
+    match = re.match(spec["subject"]["pattern"], name.strip())
+    if match is None or match["keys"] not in spec["keys"] or match["first"] not in spec["tasks"]:
+        return None
+    return {"uid": match["uid"], "keys": match["keys"], "first": match["first"]}
+
+
+def parse_data_file(spec, path):
+    """(date, {uid, keys, first}) from a result file name <fecha>_<ID>.csv; None for the parts that do not match"""
+    stem = Path(path).stem
+    date = stem[:len("2000-01-01_00-00-00")]
+    if not re.fullmatch(r"\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2}", date) or stem[len(date):len(date) + 1] != "_":
+        return None, None
+    return date, parse_subject(spec, stem[len(date) + 1:])
+
+
+def block_spec(spec, number):
+    return next(block for block in spec["blocks"] if block["number"] == number)
+
+
+def block_task(spec, number, first):
+    """Task code of a block for a participant whose first task is `first`"""
+    task = block_spec(spec, number)["task"]
+    if task == "first":
+        return first
+    if task == "second":
+        return next(code for code in spec["tasks"] if code != first)
+    return task
+
+
+def slide_text(spec, name, block=None, keys=None, first=None):
+    """Lines of a slide with its fields filled ("intro" = the slide of the block's task)"""
+    if name == "intro":
+        name = spec["tasks"][block_task(spec, block, first)]["slide"]
+    mapping = spec["keys"][keys or next(iter(spec["keys"]))]
+    labels = spec["answer_labels"]
+    numbers = [entry["number"] for entry in spec["blocks"]]
+    openings = spec.get("task_openings", [""])
+    position = numbers.index(block) if block in numbers else 0
+    fields = {"block": block, "v": labels[mapping["v"]], "n": labels[mapping["n"]],
+              "opening": openings[min(position, len(openings) - 1)]}
+    return [line.format(**fields) for line in spec["slides"][name]]
+
+
+def phase_frames(spec, frames):
+    """Frames of each fixed phase of a trial; frames(ms) is FrameScheduler.frames"""
+    timing = spec["timing_ms"]
+    return {"inicio": frames(timing["initial_blank"]), "fijacion": frames(timing["fixation"]),
+            "estimulo": frames(timing["stimulus"]), "respuesta": frames(timing["answer"])}
+
+
+class Step:
+    """One entry of the execution plan: a slide, a trigger or a block of trials, fully resolved"""
+
+    __slots__ = ("kind", "block", "text", "key", "no_foot", "trigger", "task", "trials", "keys", "frames")
+
+    def __init__(self, kind, block=None, text=None, key=None, no_foot=False, trigger=None, task=None, trials=None,
+                 keys=None, frames=None):
+        self.kind = kind
+        self.block = block
+        self.text = text
+        self.key = key
+        self.no_foot = no_foot
+        self.trigger = trigger
+        self.task = task
+        self.trials = trials
+        self.keys = keys
+        self.frames = frames
+
+
+def compile_plan(spec, subject, block_lists, prepare, frames, key_code, render=None):
+    """Execution plan (list of Step) of a participant
+
+    block_lists maps each block number to its (image, word) trials (an empty list skips the
+    block's steps, as in a resumed session); prepare(image_list, block,
+    task, answer, iti) returns its trials.Trial records, frames(ms) converts a duration to
+    frames and key_code(name) a key name ("space", "v") to its pygame code. render(text, key,
+    no_foot), when given, renders each slide before the session starts.
+    """
+    steps = []
+    triggers = spec["triggers"]
+    keys = {key_code(key): answer for key, answer in spec["keys"][subject["keys"]].items()}
+    durations = phase_frames(spec, frames)
+    for entry in spec["sequence"]:
+        block = entry.get("block")
+        if block is not None and block not in block_lists:
+            raise SpecError(f"No hay ensayos para el bloque {block} de la especificación")
+        if block is not None and not block_lists[block]:
+            continue
+        if "trigger" in entry:
+            steps.append(Step("trigger", trigger=triggers[entry["trigger"]]))
+        elif "slide" in entry:
+            text = slide_text(spec, entry["slide"], block, subject["keys"], subject["first"])
+            key = key_code(entry["key"]) if "key" in entry else None
+            no_foot = entry.get("no_foot", False)
+            if render is not None:
+                render(text, key, no_foot)
+            steps.append(Step("slide", block=block, text=text, key=key, no_foot=no_foot))
+        else:
+            task = spec["tasks"][block_task(spec, block, subject["first"])]
+            trials = prepare(block_lists[block], block, task["name"], task["answer"], tuple(spec["timing_ms"]["iti"]))
+            steps.append(Step("block", block=block, trigger=triggers[block_spec(spec, block)["trigger"]],
+                              task=task["name"], trials=trials, keys=keys, frames=durations))
+    return steps
+
+
+def describe(steps):
+    """One line per step of a compiled plan"""
+    lines = []
+    for position, step in enumerate(steps):
+        if step.kind == "trigger":
+            lines.append(f"{position:3d} trigger {step.trigger}")
+        elif step.kind == "slide":
+            first_line = step.text[0] if step.text else ""  # una diapositiva puede no tener texto
+            lines.append(f"{position:3d} diapositiva {first_line!r}" + (f" (bloque {step.block})" if step.block else ""))
+        else:
+            expected = {}
+            for trial in step.trials:
+                expected[trial.expected] = expected.get(trial.expected, 0) + 1
+            lines.append(f"{position:3d} bloque {step.block}: {step.task}, trigger {step.trigger}, "
+                         f"{len(step.trials)} ensayos, cuadros {step.frames}, respuestas esperadas {expected}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--spec", default=spec_file, help="especificación JSON o TOML (por defecto experiment.json)")
+    parser.add_argument("--id", help="ID de participante: compila y muestra su plan")
+    args = parser.parse_args(argv)
+
+    try:
+        spec = load(args.spec)
+    except SpecError as e:
+        print(e)
+        return 1
+    print(f"{args.spec}: {spec.get('name', 'experimento')}, {len(spec['blocks'])} bloques, {len(spec['sequence'])} pasos")
+    if args.id is None:
+        return 0
+
+    subject = parse_subject(spec, args.id)
+    if subject is None:
+        print(f"El ID {args.id} no cumple con subject.pattern (p. ej. {spec['subject'].get('example', '')})")
+        return 1
+    from headless import load_experiment
+    experiment = load_experiment(headless=True, discover=False)
+    experiment.debug_mode = False
+    experiment.use_vsync = False
+    experiment.use_spec(spec)
+    experiment.discover_stimuli()
+    experiment.init()
+    print(describe(experiment.compile_session(subject, experiment.experiment_blocks)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
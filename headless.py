@@ -0,0 +1,38 @@
+# coding=utf-8
+
+"""
+Carga "home version.py" como módulo (el nombre del archivo tiene un espacio y no se puede
+importar directamente), opcionalmente sin pantalla con el driver de video dummy de SDL.
+Lo usan los benchmarks y las herramientas offline que ejecutan el código real del experimento.
+"""
+import importlib.util, os, sys
+from pathlib import Path
+
+script_path = Path(__file__).parent.resolve()
+experiment_file = script_path/"home version.py"
+
+
+def load_experiment(headless=True, discover=True, name="stroop_experiment"):
+    """Imports the experiment script as a module (once) and returns it
+
+    The deferred imports (pygame, serial...) are loaded, and with discover=True the stimulus
+    lists and both blocks are built too.
+    """
+    if headless:
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    if name in sys.modules:
+        return sys.modules[name]
+
+    if str(script_path) not in sys.path:
+        sys.path.insert(0, str(script_path))
+    spec = importlib.util.spec_from_file_location(name, experiment_file)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    if headless:
+        module.FullScreenShow = False
+    module.load_modules()
+    if discover:
+        module.discover_stimuli()
+    return module
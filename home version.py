@@ -4,14 +4,25 @@
 """
 tested in Python 3.11
 """
-import csv, pygame, sys, os, serial
-from pygame.locals import FULLSCREEN, USEREVENT, KEYUP, K_SPACE, K_RETURN, K_ESCAPE, QUIT, Color, K_p, K_v, K_n
-from os.path import isfile, join
-from random import randint, shuffle
-from time import gmtime, strftime
+import csv, gc, sys, os
+from os.path import join
+from random import randint
+from threading import Thread
+from time import gmtime, strftime, perf_counter, perf_counter_ns
 
 from pathlib import Path
 
+import catalog, experiment_spec
+from results import ResultWriter, read_session, remaining_trials
+from telemetry import Telemetry, sidecar_path
+from trials import AllocationAudit, prepare_block, score
+
+# pygame, serial y los módulos que dependen de ellos se importan en load_modules()
+pygame_names = ("FULLSCREEN", "SCALED", "KEYUP", "K_SPACE", "K_RETURN", "K_ESCAPE", "QUIT", "Color", "K_p", "K_v", "K_n")
+
+# Tiempo de cada etapa del arranque (s)
+startup_times = {}
+
 script_path = Path(__file__).parent.resolve()
 
 debug_mode = True # Modo de depuración (True/False)
@@ -25,35 +36,71 @@ class TextRectException(Exception):
 
 # Configurations:
 FullScreenShow = True  # Pantalla completa automáticamente al iniciar el experimento
+use_vsync = True  # Sincronizar la presentación con el refresco de pantalla
+window_resolution = None  # Resolución cuando no es pantalla completa, None = automática
+dirty_rects = False  # Actualizar solo las regiones que cambian (cruz, cara, palabra) en lugar de la pantalla completa
 test_name = "Stroop Task"
+spec_file = script_path/"experiment.json"  # Estructura de la sesión (experiment_spec.py)
+spec = None  # Especificación cargada, se aplica a los ajustes de abajo en use_spec()
 date_name = strftime("%Y-%m-%d_%H-%M-%S", gmtime())
 
-# Image Loading
-happy_images_list = [script_path/"media"/"images"/"Happy"/ f for f in os.listdir(
-    script_path/"media"/"images"/"Happy") if isfile(join(script_path/"media"/"images"/"Happy", f))]
-sad_images_list = [script_path/"media"/"images"/"Sad"/ f for f in os.listdir(
-    script_path/"media"/"images"/"Sad") if isfile(join(script_path/"media"/"images"/"Sad", f))]
-
-shuffle(happy_images_list)
-shuffle(sad_images_list)
-
-first_experiment_block = [(img, "Happy") for img in happy_images_list[:60]] + [(img, "Sad") for img in happy_images_list[:60]] + \
-                         [(img, "Sad") for img in sad_images_list[:60]] + [(img, "Happy") for img in sad_images_list[:60]]
-
-shuffle(first_experiment_block)
-
-second_experiment_block = [(img, "Happy") for img in happy_images_list[:60]] + [(img, "Sad") for img in happy_images_list[:60]] + \
-                          [(img, "Sad") for img in sad_images_list[:60]] + [(img, "Happy") for img in sad_images_list[:60]]
-
-shuffle(second_experiment_block)
+# Image Loading: se llenan en discover_stimuli()
+happy_images_list = []
+sad_images_list = []
+experiment_blocks = {}  # Número de bloque (blocks de experiment.json) -> ensayos (imagen, palabra), se arma en use_plan()
+first_experiment_block = []  # Los dos primeros bloques (benchmarks y herramientas)
+second_experiment_block = []
+
+# Orden de los ensayos (sequence.py): se guarda en data/plans/<id>_<semilla>.json al ingresar el ID
+session_plan = None
+stimulus_catalog = None  # Atributos de cada imagen (catalog.py), se arma en discover_stimuli()
+face_codes = None  # Códigos del codebook (docs/codebook_faces.csv) de las caras a usar, p. ej. ("ha_c", "sa_c"); None = todas
+sequence_seed = None  # None = semilla al azar (queda registrada en el plan)
+faces_per_block = 60  # Caras de cada tipo por bloque, cada una con ambas palabras
+max_run = 3  # Máximo de ensayos seguidos congruentes/incongruentes o de la misma condición
+sequence_candidates = 5000  # Órdenes candidatos evaluados por bloque
 
 text_convertor = {"Happy": "Feliz", "Sad": "Triste"}
 
+# Textos ya renderizados (diapositivas, pies de página y palabras de los ensayos), se crea en load_modules()
+text_cache = None
+
 base_size = 350
 
+# Duraciones de las fases de cada ensayo (ms), se redondean a cuadros completos
+# Duraciones (ms) y triggers por defecto; experiment.json los reemplaza al cargarse
+initial_blank_time = 500
+fixation_time = 1000
+stimulus_time = 200
+answer_time = 1000
+iti_range = (1000, 1200)
+measure_events = False  # Reporta uso de CPU y latencia de despertar de las esperas por bloque
+gc_control = True  # Recolector de basura congelado y desactivado durante los bloques (se recolecta antes de cada uno)
+alloc_audit = False  # Reporta con tracemalloc la memoria asignada por ensayo (solo para verificar, agrega sobrecarga)
+answer_frames = None  # Cuadros de la ventana de respuesta, precalculado durante los bloques
+monitor_address = None  # Servidor de monitoreo (monitor.py) "host:puerto" o "local" (en este proceso); None = sin monitoreo
+monitor_station = None  # Nombre de esta estación en el monitor, None = nombre del equipo
+monitor_publisher = None  # Se crea en init_monitor()
+io_split = False  # Resultados y consola en un proceso aparte (iochannel.py): la presentación no hace E/S bloqueante
+
+# Telemetría: instantes de cada fase, trigger y tecla, se vuelca junto al archivo de datos al final de cada bloque
+telemetry = Telemetry(capacity=16384)
+
+# Stimulus cache: imágenes ya cargadas, escaladas y en escala de grises (path -> Surface)
+stimulus_cache = {}
+stimulus_cache_budget = 256 * 1024 * 1024  # Memoria máxima para el cache de estímulos (bytes)
+
+# Cuadros compuestos cara + palabra ((imagen, palabra) -> (Surface, Rect)), compartidos entre bloques
+trial_frames = {}
+trial_frames_budget = 256 * 1024 * 1024  # Memoria máxima para los cuadros compuestos (bytes)
+word_color = 'blue'
+
 # Port address and triggers
+trigger_port = "COM3"  # Puerto serial; "loopback" o "pty" (trigger_devices.py) para probar sin el equipo de EEG
+trigger_device = None  # Dispositivo virtual receptor cuando trigger_port es virtual
 lpt_address = 0xD100
 trigger_latency = 5
+trigger_dispatcher = None  # Hilo de envío de triggers, se crea en init_triggers()
 start_trigger = 254
 stop_trigger = 255
 
@@ -88,84 +135,132 @@ trigger_helper = {
     "neutral_stimulus": 30
 }
 
+# Startup
+def load_spec():
+    """Reads experiment.json (once) and applies it to the settings"""
+    if spec is None:
+        use_spec(experiment_spec.load(spec_file))
+    return spec
+
+
+def use_spec(new_spec):
+    """Takes the name, phase durations and trigger codes from an experiment specification (see experiment_spec.py)"""
+    global spec, test_name, initial_blank_time, fixation_time, stimulus_time, answer_time, iti_range, trigger_helper, \
+        start_trigger, stop_trigger
+    spec = new_spec
+    timing = spec["timing_ms"]
+    test_name = spec.get("name", test_name)
+    initial_blank_time, fixation_time, stimulus_time, answer_time = (timing[phase] for phase in experiment_spec.timing_phases)
+    iti_range = tuple(timing["iti"])
+    trigger_helper = {name: code for name, code in spec["triggers"].items() if name not in ("start", "stop")}
+    start_trigger, stop_trigger = spec["triggers"]["start"], spec["triggers"]["stop"]
+
+
+def load_modules():
+    """Imports pygame, serial and the modules built on them (deferred so the ID prompt shows at once)"""
+    global pygame, serial, trigger_devices, iochannel, atlas, stimuli, sequence, FrameScheduler, EventDispatcher, \
+        format_measurement, ResponseCapture, TextCache, TriggerDispatcher, text_cache
+    load_spec()
+    if text_cache is not None:
+        return
+
+    t0 = perf_counter()
+    import pygame, pygame.locals
+    globals().update({name: getattr(pygame.locals, name) for name in pygame_names})
+    startup_times["import pygame"] = perf_counter() - t0
+
+    t0 = perf_counter()
+    import serial, trigger_devices, iochannel
+    startup_times["import serial"] = perf_counter() - t0
+
+    t0 = perf_counter()
+    import atlas, stimuli, sequence  # numpy
+    from scheduler import FrameScheduler
+    from events import EventDispatcher, format_measurement
+    from responses import ResponseCapture
+    from textcache import TextCache
+    from triggers import TriggerDispatcher
+    text_cache = TextCache()
+    startup_times["import módulos del experimento"] = perf_counter() - t0
+
+
+def discover_stimuli():
+    """Lists the stimuli (from the cached manifest when the folders did not change) and builds both blocks"""
+    global happy_images_list, sad_images_list, stimulus_catalog
+    t0 = perf_counter()
+    stimulus_catalog = catalog.load_catalog([script_path/"media"/"images"/"Happy", script_path/"media"/"images"/"Sad"])
+    happy_images_list = stimulus_catalog.select("Happy", face_codes)
+    sad_images_list = stimulus_catalog.select("Sad", face_codes)
+    startup_times["descubrir estímulos"] = perf_counter() - t0
+
+    # Cada cara (feliz y triste) aparece con ambas palabras: HH, HS, SS y SH quedan balanceadas
+    t0 = perf_counter()
+    use_plan(sequence.make_plan(happy_images_list, sad_images_list, seed=sequence_seed, blocks=len(load_spec()["blocks"]),
+                                faces=faces_per_block, max_run=max_run, candidates=sequence_candidates))
+    startup_times["secuencia"] = perf_counter() - t0
+
+
+def use_plan(plan):
+    """Takes the block lists from a sequence plan (see sequence.py), one per block of the specification"""
+    global session_plan, experiment_blocks, first_experiment_block, second_experiment_block
+    session_plan = plan
+    experiment_blocks = {block["number"]: plan_block["trials"] for block, plan_block in zip(load_spec()["blocks"], plan["blocks"])}
+    first_experiment_block, second_experiment_block = ([block["trials"] for block in plan["blocks"]] + [[], []])[:2]
+    print(f"Secuencia: semilla {plan['seed']}, " + ", ".join(
+        f"{block['stats']['violations']} violaciones" for block in plan["blocks"] if "stats" in block)) if debug_mode else None
+
+
+def resume_lists(plan, session):
+    """Trials left in each block of a saved plan ({block number: trials}), None if the recorded rows do not belong to that plan"""
+    if len(plan["blocks"]) != len(load_spec()["blocks"]):
+        return None
+    block_lists = {}
+    for block, plan_block in zip(spec["blocks"], plan["blocks"]):
+        rows = session["blocks"].get(block["number"], [])
+        remaining = remaining_trials(plan_block["trials"], rows, image_id)
+        if len(remaining) != len(plan_block["trials"]) - len(rows):
+            return None
+        block_lists[block["number"]] = remaining
+    return block_lists
+
+
+def prepare_startup(errors):
+    """Background part of the startup: runs while the technician types the participant ID"""
+    try:
+        load_modules()
+        discover_stimuli()
+    except BaseException as e:
+        errors.append(e)
+
+
+def startup_report():
+    total = sum(startup_times.values())
+    lines = [f"Arranque ({total:.2f} s):"]
+    lines += [f"  {name}: {seconds * 1000:.0f} ms" for name, seconds in startup_times.items()]
+    return "\n".join(lines)
+
+
 # Onscreen instructions
 def select_slide(slide_name, variables=None):
-
+    """Lines of a slide, from the texts of the experiment specification"""
     if variables is None:
         variables = {"blockNumber": 0, "practice": True, "happyV": True, "blockType": "C"}
 
-    basic_slides = {
-        'welcome': [
-            u"Bienvenido/a, a este experimento!!!",
-            " ",
-            u"Se te indicará paso a paso que hacer."
-        ],
-        'practice_1': [
-            u"Empezaremos con una práctica para familiarizarnos con la tarea.",
-            " ",
-            u"Luego de ver un rostro deberás categorizar su expresión emocional lo más rápido y preciso posible.",
-            " ",
-        ],
-        'practice_2': [
-            u"Ahora haremos una segunda práctica.",
-            " ",
-            u"Recuerda que luego de ver un rostro deberás categorizar su expresión emocional lo más rápido y preciso posible.",
-            " ",
-        ],
-        'face_block': [
-            u"Ahora comenzaremos con el experimento.",
-            " ",
-            u"En esta prueba vamos a ver una serie de fotografías de rostros de personas en la pantalla.", 
-            u"Notará que sobre cada rostro hay una palabra escrita en color rojo.",
-            u"" + ("Esta vez s" if variables["blockNumber"] == 2 else  "S") + "u tarea principal es identificar la emoción del rostro (si la persona está triste o feliz),",
-            u"ignorando por completo la palabra que está escrita encima. No intente leer la palabra, solo mire la cara.", 
-            u"Debe responder lo más rápido posible, siguiendo su primera impresión, pero intentando no cometer errores.",
-            u"No se detenga a analizar demasiado cada imagen; confíe en lo que perciba de inmediato.",
-            " ",
-            u"Para responder, utilizaremos únicamente su mano derecha sobre el teclado. Por favor, coloque sus dedos así:",
-            " ",
-            u"El dedo índice sobre la tecla [V] para indicar " + ("FELIZ" if variables["happyV"] else "TRISTE") + ".",
-            u"El dedo medio sobre la tecla [N] para indicar " + ("TRISTE" if variables["happyV"] else "FELIZ") + ".",
-        ],
-        'word_block': [
-            u"Ahora comenzaremos con el experimento.",
-            " ",
-            u"En esta prueba vamos a ver una serie de fotografías de rostros de personas en la pantalla.", 
-            u"Notará que sobre cada rostro hay una palabra escrita en color rojo.",
-            u"" + ("Esta vez s" if variables["blockNumber"] == 2 else  "S") + "u tarea principal es responder usando la emoción que aparece escrita en la palabra, ignorando por completo la emoción",
-            u"que expresa el rostro (si la persona está triste o feliz). No intente descifrar la emoción en el rostro, sólo lea la palabra.", 
-            u"Debe responder lo más rápido posible, siguiendo su primera impresión, pero intentando no cometer errores.",
-            u"No se detenga a analizar demasiado cada imagen; confíe en lo que perciba de inmediato.",
-            " ",
-            u"Para responder, utilizaremos únicamente su mano derecha sobre el teclado. Por favor, coloque sus dedos así:",
-            " ",
-            u"El dedo índice sobre la tecla [V] para indicar " + ("FELIZ" if variables["happyV"] else "TRISTE") + ".",
-            u"El dedo medio sobre la tecla [N] para indicar " + ("TRISTE" if variables["happyV"] else "FELIZ") + ".",
-        ],
-        'break': [
-            u"Fin del bloque " + variables["blockNumber"] + ".",
-            " ",
-            u"Tómate de 2 a 3 minutos para descansar.",
-            " ",
-            u"Cuando estés lista/o para continuar presiona la barra espaciadora."
-        ],
-        'farewell': [
-            u"La tarea ha finalizado.",
-            "",
-            u"Muchas gracias por su colaboración!!"
-        ]
-    }
-
-    return (basic_slides[slide_name])
+    keys = next(assignment for assignment, mapping in load_spec()["keys"].items()
+                if (mapping["v"] == "Happy") == variables["happyV"])
+    return experiment_spec.slide_text(spec, slide_name, variables["blockNumber"], keys)
 
 
 # EEG Functions
 def init_lpt(address):
     """Creates and tests a parallell port"""
+    global io
     try:
-        from ctypes import windll
-        global io
-        io = windll.dlportio  # requires dlportio.dll !!!
+        if trigger_port in trigger_devices.virtual_ports:
+            io = trigger_devices.VirtualLpt()
+        else:
+            from ctypes import windll
+            io = windll.dlportio  # requires dlportio.dll !!!
         print('Parallel port opened')
     except:
         pass
@@ -181,8 +276,13 @@ def init_lpt(address):
 
 def send_trigger(trigger, address, latency):
     """Sends a trigger to the parallell port"""
+    telemetry.record("trigger_encolado", trigger)
+    if trigger_dispatcher is not None:
+        trigger_dispatcher.send(trigger)  # pulso y vuelta a cero en el hilo de triggers
+        return
     try:
         io.DlPortWritePortUchar(address, trigger)  # Send trigger
+        telemetry.record("trigger_escrito", trigger)
         pygame.time.delay(latency)  # Keep trigger pulse for some ms
         io.DlPortWritePortUchar(address, 0)  # Get back to zero after some ms
         print('Trigger ' + str(trigger) + ' sent')
@@ -191,9 +291,15 @@ def send_trigger(trigger, address, latency):
         print('Failed to send trigger ' + str(trigger))
 
 
-def init_com(address="COM3"):
-    """Creates and tests a serial port"""
-    global ser
+def init_com(address=None):
+    """Creates and tests a serial port (trigger_port by default, which can be a virtual device)"""
+    global ser, trigger_device
+    address = trigger_port if address is None else address
+    if address in trigger_devices.virtual_ports:
+        trigger_device = trigger_devices.open_virtual(address)
+        ser = trigger_device.port
+        print(f'Virtual serial port opened ({address})')
+        return
     try:
         ser = serial.Serial()
         ser.port = address
@@ -207,27 +313,76 @@ def init_com(address="COM3"):
 
 def send_triggert(trigger):
     """Sends a trigger to the serial port"""
+    telemetry.record("trigger_encolado", trigger)
+    if trigger_dispatcher is not None:
+        trigger_dispatcher.send(trigger)
+        return
     try:
         ser.write((trigger).to_bytes(1, 'little'))
+        telemetry.record("trigger_escrito", trigger)
         print('Trigger ' + str(trigger) + ' sent')
     except:
         pass
         print('Failed to send trigger ' + str(trigger))
 
 
-def sleepy_trigger(trigger, latency=100):
+def sleepy_trigger(trigger, address=lpt_address, latency=trigger_latency):
+    """Sends a trigger without blocking the presentation loop (pulse width = latency)"""
+    if trigger_dispatcher is not None:
+        telemetry.record("trigger_encolado", trigger)
+        trigger_dispatcher.send(trigger)
+        return
     send_triggert(trigger)
     pygame.time.wait(latency)
 
 
+def init_triggers():
+    """Starts the background trigger dispatcher over the ports that could be opened"""
+    global trigger_dispatcher
+    serial_port = ser if 'ser' in globals() and ser.is_open else None
+    lpt = io if 'io' in globals() else None
+    trigger_dispatcher = TriggerDispatcher(serial_port, lpt, lpt_address, pulse_ms=trigger_latency,
+                                           names={**trigger_helper, "start": start_trigger, "stop": stop_trigger},
+                                           verbose=debug_mode, telemetry=telemetry)
+
+
+def init_monitor():
+    """Starts publishing block and trial results to the monitor server when monitor_address is set"""
+    global monitor_publisher
+    if monitor_address is None:
+        return
+    import monitor  # asyncio: solo se importa con el monitoreo activo
+    try:
+        if monitor_address == "local":
+            monitor_publisher = monitor.start_local(station=monitor_station)
+            print(f"Monitor en http://localhost:{monitor.http_port}/")
+        else:
+            host, _, port = monitor_address.partition(":")
+            monitor_publisher = monitor.Publisher(host, int(port) if port else monitor.udp_port, monitor_station)
+    except OSError as e:
+        print(f"No se pudo iniciar el monitoreo: {e}")
+
+
 def close_com():
-    """Closes the serial port"""
+    """Closes the serial port (and the monitor publisher, after the final status)"""
+    global trigger_dispatcher, monitor_publisher
+    if monitor_publisher is not None:
+        monitor_publisher.publish("sesion", status="finalizada")
+        monitor_publisher.close()  # en modo local también detiene el servidor
+        monitor_publisher = None
+    if trigger_dispatcher is not None:
+        trigger_dispatcher.close()  # espera a que se escriban los triggers pendientes
+        print(trigger_dispatcher.summary()) if debug_mode else None
+        trigger_dispatcher = None
     try:
         ser.close()
         print('Serial port closed')
     except:
         pass
         print('The serial port couldn\'t be closed')
+    if trigger_device is not None:
+        trigger_device.close()
+        print(f"Dispositivo virtual: {len(trigger_device.received)} bytes recibidos") if debug_mode else None
 
 
 # Text Functions
@@ -241,8 +396,38 @@ def setfonts():
     charnext = pygame.font.Font(script_path/font, 24)
 
 
+def footer_text(key=None, no_foot=False):
+    """Footer shown under a paragraph"""
+    if no_foot:
+        return ""
+    if key == K_RETURN:
+        return u"Para continuar presione la tecla ENTER..."
+    if key != None:
+        return u"Para continuar presione la tecla Espacio..."
+    return u"Responda con la fila superior de teclas de numéricas"
+
+
+def preload_paragraph(text, key=None, no_foot=False, color=None):
+    """Renders a paragraph into the text cache without showing it"""
+    if isinstance(text, str):
+        text = [text]
+    for line in text:
+        text_cache.render(char, line, char_color if color is None else color)
+    text_cache.render(charnext, footer_text(key, no_foot), charnext_color)
+
+
 def paragraph(text, key=None, no_foot=False, color=None, limit_time=0, row=None, is_clean=True):
     """Organizes a text into a paragraph"""
+    print(text) if debug_mode else None
+    draw_paragraph(text, key, no_foot, color, row, is_clean)
+    pygame.display.flip()
+
+    if key != None or limit_time != 0:
+        wait(key, limit_time)
+
+
+def draw_paragraph(text, key=None, no_foot=False, color=None, row=None, is_clean=True):
+    """Draws a paragraph and its footer on the back buffer (no flip, also used by replay.py)"""
     if is_clean:
         screen.fill(background)
 
@@ -256,35 +441,21 @@ def paragraph(text, key=None, no_foot=False, color=None, limit_time=0, row=None,
     if color == None:
         color = char_color    
 
-    print(text) if debug_mode else None
     for line in text:
-        phrase = char.render(line, True, color)
+        phrase = text_cache.render(char, line, color)
         phrasebox = phrase.get_rect(centerx=center[0], top=row)
         screen.blit(phrase, phrasebox)
         row += 40
-    if key != None:
-        if key == K_SPACE:
-            foot = u"Para continuar presione la tecla Espacio..."
-        elif key == K_RETURN:
-            foot = u"Para continuar presione la tecla ENTER..."
-    else:
-        foot = u"Responda con la fila superior de teclas de numéricas"
-    if no_foot:
-        foot = ""
-    nextpage = charnext.render(foot, True, charnext_color)
+    nextpage = text_cache.render(charnext, footer_text(key, no_foot), charnext_color)
     nextbox = nextpage.get_rect(left=15, bottom=resolution[1] - 15)
     screen.blit(nextpage, nextbox)
-    pygame.display.flip()
-
-    if key != None or limit_time != 0:
-        wait(key, limit_time)
 
 
 # Program Functions
 def init():
     """Init display and others"""
     setfonts()
-    global screen, resolution, center, background, char_color, charnext_color, fix, fixbox
+    global screen, resolution, center, background, char_color, charnext_color, fix, fixbox, scheduler, events
     pygame.init()  # soluciona el error de inicializacion de pygame.time
     pygame.display.init()
     pygame.display.set_caption(test_name)
@@ -292,13 +463,37 @@ def init():
     if FullScreenShow:
         resolution = (pygame.display.Info().current_w,
                       pygame.display.Info().current_h)
-        screen = pygame.display.set_mode(resolution, FULLSCREEN)
+        flags = FULLSCREEN
+    elif window_resolution is not None:
+        resolution = window_resolution
+        flags = 0
     else:
         try:
             resolution = pygame.display.list_modes()[3]
         except:
             resolution = (1280, 720)
-        screen = pygame.display.set_mode(resolution)
+        flags = 0
+
+    # Con vsync cada flip espera el refresco de pantalla (en pygame 2 requiere SCALED u OPENGL).
+    # Con SCALED, display.update(rects) presenta la pantalla completa en el refresco: en el modo de
+    # rectángulos sucios solo se redibujan las regiones que cambian, pero la presentación sigue sincronizada.
+    vsync = False
+    if use_vsync:
+        try:
+            screen = pygame.display.set_mode(resolution, flags | SCALED, vsync=1)
+            vsync = True
+        except pygame.error as e:
+            print(f"No se pudo activar vsync: {e}") if debug_mode else None
+    if not vsync:
+        screen = pygame.display.set_mode(resolution, flags)
+    events = EventDispatcher()
+    events.bind(QUIT, lambda event: pygame_exit())
+    events.bind(KEYUP, lambda event: pygame_exit(), key=K_ESCAPE)
+    scheduler = FrameScheduler(vsync=vsync, partial_updates=dirty_rects)
+    scheduler.calibrate()
+    print(f"Refresco de pantalla: {scheduler.refresh_rate:.2f} Hz") if debug_mode else None
+    if dirty_rects and not scheduler.vsync:
+        print("Aviso: rectángulos sucios sin vsync, la presentación no está sincronizada con el refresco de pantalla")
     center = (int(resolution[0] / 2), int(resolution[1] / 2))
     background = Color('white')
     char_color = Color('black')
@@ -323,10 +518,7 @@ def ends():
     dotbox = dot.get_rect(left=15, bottom=resolution[1] - 15)
     screen.blit(dot, dotbox)
     pygame.display.flip()
-    while True:
-        for evento in pygame.event.get():
-            if evento.type == KEYUP and evento.key == K_ESCAPE:
-                pygame_exit()
+    events.wait_until()  # ESC termina el programa
 
 
 def pygame_exit():
@@ -337,24 +529,12 @@ def pygame_exit():
 def wait(key, limit_time):
     """Hold a bit"""
 
-    TIME_OUT_WAIT = USEREVENT + 1
-    if limit_time != 0:
-        pygame.time.set_timer(TIME_OUT_WAIT, limit_time, loops=1)
-
     tw = pygame.time.get_ticks()
+    deadline = perf_counter_ns() + limit_time * 1_000_000 if limit_time != 0 else None
+
+    with events.bound({(KEYUP, key): lambda event: True} if key is not None else {}):
+        events.wait_until(deadline)
 
-    switch = True
-    while switch:
-        for event in pygame.event.get():
-            if event.type == QUIT or (event.type == KEYUP and event.key == K_ESCAPE):
-                pygame_exit()
-            elif event.type == KEYUP:
-                if event.key == key:
-                    switch = False
-            elif event.type == TIME_OUT_WAIT and limit_time != 0:
-                switch = False
-
-    pygame.time.set_timer(TIME_OUT_WAIT, 0)
     pygame.event.clear()                    # CLEAR EVENTS
 
     return (pygame.time.get_ticks() - tw)
@@ -365,294 +545,504 @@ def image_in_center(picture, xdesv=0, ydesv=0):
     return [x - picture.get_size()[count]/2 for count, x in enumerate(center)]
 
 
-def show_image(image, scale, grayscale=False):
-    screen.fill(background)
+def prepare_image(image, scale, grayscale=False):
+    """Loads, scales and converts an image into a Surface ready to blit"""
     try:
-        picture = pygame.image.load(image)
+        picture = stimuli.load_image(image, scale, grayscale)
     except pygame.error as e:
         print(f"Error al cargar imagen {image}: {e}") if debug_mode else None
-        return
-    
-    image_real_size = picture.get_size()
-    percentage = scale / image_real_size[0]
-    picture = pygame.transform.scale(picture, [int(scale), int(image_real_size[1]*percentage)])
-
-    # Convertir a blanco y negro si se requiere
-    if grayscale:
-        width, height = picture.get_size()
-        for x in range(width):
-            for y in range(height):
-                r, g, b, a = picture.get_at((x, y))
-                gray = int(0.299 * r + 0.587 * g + 0.114 * b)
-                picture.set_at((x, y), (gray, gray, gray, a))
+        return None
+
+    # Se convierte al formato de la pantalla para que el blit no tenga que hacerlo en cada ensayo
+    if picture.get_flags() & pygame.SRCALPHA:
+        return picture.convert_alpha()
+    return picture.convert()
+
+
+def load_stimuli(image_lists, scale, grayscale=False, budget=stimulus_cache_budget):
+    """Preloads every image of the given blocks into the stimulus cache (requires init())"""
+    t0 = perf_counter()
+    used = sum(picture.get_pitch() * picture.get_height() for picture in stimulus_cache.values())
+    skipped = 0
+    from_atlas = 0
+
+    # Si existe un atlas compilado (python atlas.py) se usa en lugar de decodificar las imágenes
+    try:
+        stimulus_atlas = atlas.Atlas()
+        if not stimulus_atlas.matches(scale, grayscale):
+            stimulus_atlas.close()
+            stimulus_atlas = None
+    except (OSError, ValueError):
+        stimulus_atlas = None
+
+    # Las imágenes se repiten dentro y entre bloques, se cargan una sola vez
+    images = dict.fromkeys(image for image_list in image_lists for image, _ in image_list)
+    for image in images:
+        if image in stimulus_cache:
+            continue
+        if used >= budget:
+            skipped += 1
+            continue
+        if stimulus_atlas is not None and stimulus_atlas.is_fresh(image):
+            picture = stimulus_atlas.surface(image).convert()
+            from_atlas += 1
+        else:
+            picture = prepare_image(image, scale, grayscale)
+        if picture is None:
+            continue
+        size = picture.get_pitch() * picture.get_height()
+        if used + size > budget:
+            skipped += 1
+            continue
+        stimulus_cache[image] = picture
+        used += size
+
+    if stimulus_atlas is not None:
+        stimulus_atlas.close()
+
+    elapsed = perf_counter() - t0
+    print(f"Estímulos cargados: {len(stimulus_cache)} imágenes ({from_atlas} desde atlas), {used / 2**20:.1f} MB en {elapsed:.2f} s")
+    if skipped:
+        print(f"Presupuesto de memoria excedido: {skipped} imágenes se cargarán desde disco en cada ensayo")
+    return elapsed
+
+
+def show_image(image, scale, grayscale=False):
+    screen.fill(background)
+    picture = stimulus_cache.get(image)
+    if picture is None:
+        picture = prepare_image(image, scale, grayscale)
+        if picture is None:
+            return
 
     screen.blit(picture, image_in_center(picture))
     
     pygame.display.flip()
 
 
-def wait_answer(image, testing = False, VKeyboardSelection = "F", NKeyboardSelection = "T", type_of_answer = "image"):
-    tw = pygame.time.get_ticks()
-    done = False
-    selected_answer = None
-    is_correct = None
-
-    next_image = USEREVENT + 4
-    pygame.time.set_timer(next_image, 1000, loops=1)
-
-    while not done:
-        for event in pygame.event.get():
-
-            if event.type == KEYUP and event.key == K_ESCAPE and debug_mode:
-                pygame_exit()
-
-            elif event.type == KEYUP and event.key == K_v:
-                selected_answer = "Happy" if VKeyboardSelection == "F" else "Sad"
-                done = True
-            
-            elif event.type == KEYUP and event.key == K_n:
-                selected_answer = "Sad" if NKeyboardSelection == "T" else "Happy"
-                done = True
-
-            elif event.type == next_image:
-                selected_answer = "Missed"
-                done = True
-                break
-
-    pygame.time.set_timer(next_image, 0)
-    rt = pygame.time.get_ticks() - tw
-
-    # Se obtiene el path relativo de la imagen
-    relative_path = Path(image[0]).relative_to(script_path)
-
-    # Se divide el path relativo para obtener las carpetas que contienen la imagen
-    if (len(relative_path.parts) >= 3 and not testing):
-        image_type = relative_path.parts[2]
-        image_text = image[1]
-
-        if type_of_answer == "image":
-            print(image_type) if debug_mode else None
-            is_correct = selected_answer == image_type
-        elif type_of_answer == "word":
-            print(image_text) if debug_mode else None
-            is_correct = selected_answer == image_text
-            
-        print(selected_answer) if debug_mode else None
-        print(is_correct) if debug_mode else None
-
-        #print(252 + (0 if image_type == "B" else 1)) if debug_mode else None
-        # sleepy_trigger(252 + (0 if image_type == "B" else 1) , lpt_address, trigger_latency) # user answer
-        
-    pygame.event.clear()                    # CLEAR EVENTS
-    return ({"rt": rt, "is_correct": is_correct, "selected_answer": selected_answer})
+def compose_trial_frame(image, word, scale, grayscale=False):
+    """Composites a face and its Stroop word into one Surface, returns it with its screen Rect"""
+    picture = stimulus_cache.get(image)
+    if picture is None:
+        picture = prepare_image(image, scale, grayscale)
+        if picture is None:
+            return None
+    picturebox = picture.get_rect(topleft=image_in_center(picture))
+
+    # Misma posición que usaba paragraph() para una sola línea
+    phrase = text_cache.render(char, text_convertor[word], word_color)
+    phrasebox = phrase.get_rect(centerx=center[0], top=center[1] - 20)
+
+    framebox = picturebox.union(phrasebox)
+    frame = pygame.Surface(framebox.size).convert()
+    frame.fill(background)
+    frame.blit(picture, picturebox.move(-framebox.left, -framebox.top))
+    frame.blit(phrase, phrasebox.move(-framebox.left, -framebox.top))
+    return frame, framebox
+
+
+def build_trial_frames(image_lists, scale, grayscale=False, budget=trial_frames_budget):
+    """Builds the composite frame of every (image, word) pair before the blocks start (requires init())"""
+    t0 = perf_counter()
+    used = sum(frame.get_pitch() * frame.get_height() for frame, _ in trial_frames.values())
+    skipped = 0
+
+    # Los mismos pares se repiten entre bloques, se construyen una sola vez
+    for pair in dict.fromkeys(pair for image_list in image_lists for pair in image_list):
+        if pair in trial_frames:
+            continue
+        composed = compose_trial_frame(pair[0], pair[1], scale, grayscale)
+        if composed is None:
+            continue
+        size = composed[0].get_pitch() * composed[0].get_height()
+        if used + size > budget:
+            skipped += 1
+            continue
+        trial_frames[pair] = composed
+        used += size
+
+    elapsed = perf_counter() - t0
+    print(f"Cuadros compuestos: {len(trial_frames)} pares, {used / 2**20:.1f} MB en {elapsed:.2f} s")
+    if skipped:
+        print(f"Presupuesto de memoria excedido: {skipped} pares se compondrán durante el ensayo")
+    return elapsed
+
+
+def trial_frame(image, word, scale, grayscale=False):
+    """Composite (Surface, Rect) of a trial, built now if it was not prepared before the block"""
+    composed = trial_frames.get((image, word))
+    if composed is None:
+        composed = compose_trial_frame(image, word, scale, grayscale)
+    return [composed] if composed is not None else []
+
+
+# Regiones dibujadas sobre el fondo en la fase actual (modo de rectángulos sucios)
+drawn_rects = []
 
-def show_images(image_list, practice=False, uid=None, dfile=None, block=None, VKeyboardSelection="F", NKeyboardSelection="T"):
-    phase_change = USEREVENT + 2
-    pygame.time.set_timer(phase_change, 500, loops=1)
 
-    done = False
-    count = 0
+def redraw(items):
+    """Replaces what is on screen by the (Surface, Rect) items
 
+    Returns the rects that changed for the scheduler: in dirty rectangle mode only the regions
+    drawn by the previous phase are cleared; otherwise the whole screen is redrawn (None).
+    """
+    global drawn_rects
+    if not dirty_rects:
+        screen.fill(background)
+        for surface, rect in items:
+            screen.blit(surface, rect)
+        return None
+
+    changed = [screen.fill(background, rect) for rect in drawn_rects]
+    drawn_rects = [screen.blit(surface, rect) for surface, rect in items]
+    return changed + drawn_rects
+
+
+def clear_screen():
+    """Clears the whole screen (e.g. after a slide), returns None so the next present is a full flip"""
+    global drawn_rects
     screen.fill(background)
-    pygame.display.flip()
+    drawn_rects = []
+    return None
+
+
+def image_id(image):
+    """IdImagen: file name without extension (looked up in the stimulus catalog)"""
+    if stimulus_catalog is not None and image in stimulus_catalog:
+        return stimulus_catalog.id(image)
+    return Path(image).name.split('.')[0]
+
+
+def image_type(image):
+    """TipoImagen: folder that contains the image (Happy/Sad, looked up in the stimulus catalog)"""
+    if stimulus_catalog is not None and image in stimulus_catalog:
+        return stimulus_catalog.emotion(image)
+    return Path(image).relative_to(script_path).parts[2]
+
+
+def response_keys(VKeyboardSelection="F", NKeyboardSelection="T"):
+    """Maps the response keys to the answer they represent"""
+    return {K_v: "Happy" if VKeyboardSelection == "F" else "Sad",
+            K_n: "Sad" if NKeyboardSelection == "T" else "Happy"}
+
+
+def key_code(name):
+    """pygame code of a key named in the experiment specification ("space", "return", "v")"""
+    return getattr(pygame, "K_" + name, None) or getattr(pygame, "K_" + name.upper())
+
+
+def prepare_trials(image_list, block, task=None, answer=None, iti=None):
+    """Trial records of a block (trials.prepare_block) with the composed frames that are in memory"""
+    low, high = iti_range if iti is None else iti
+    # Los cuadros que no entraron en el presupuesto de memoria se siguen componiendo durante el ensayo
+    return prepare_block(image_list, block, trigger_helper, image_id, image_type,
+                         frame=lambda image, word: trial_frame(image, word, base_size, grayscale=True) if (image, word) in trial_frames else None,
+                         iti_frames=lambda: scheduler.frames(randint(low, high)), task=task, answer=answer)
+
+
+def block_step(image_list, block, VKeyboardSelection="F", NKeyboardSelection="T"):
+    """Execution step of a block run outside a compiled plan (benchmarks, tools)"""
+    return experiment_spec.Step("block", block=block, trials=prepare_trials(image_list, block),
+                                keys=response_keys(VKeyboardSelection, NKeyboardSelection),
+                                frames=experiment_spec.phase_frames(load_spec(), scheduler.frames))
 
+
+def wait_answer(trial, capture, testing=False):
+    """Response window of a precomputed trial (trials.py): the answer is stored in it and the trial returned
+
+    TReaccion keeps its original reference: ms from the start of the response window (0 for a key
+    pressed during the stimulus; without a response, the length of the window). The times from the
+    stimulus onset (capture.onset_ns) go only to TReaccionUs and TSoltarUs.
+    """
+    # La respuesta pudo darse durante el estímulo, en ese caso la ventana termina de inmediato
+    tw = scheduler.start("respuesta", answer_frames if answer_frames else scheduler.frames(answer_time))
+    telemetry.record("respuesta", t=tw)
+    with events.bound(listener=capture):
+        scheduler.hold(events, until=capture.pressed)
+    if capture.pressed():
+        trial.selected_answer = capture.answer
+        trial.rt = max(0, capture.press_ns - tw) // 1_000_000
+    else:
+        trial.selected_answer = "Missed"
+        trial.rt = (perf_counter_ns() - tw) // 1_000_000
+    trial.rt_us = capture.rt_us()
+    trial.is_correct = None if testing else score(trial.selected_answer, trial.expected)
+    print(trial.expected, trial.selected_answer, trial.is_correct) if debug_mode else None
+    return trial
+
+
+def show_images(image_list, practice=False, uid=None, dfile=None, block=None, VKeyboardSelection="F", NKeyboardSelection="T",
+                step=None):
+    """Runs a block (a step of the compiled plan, or image_list), returns its trial records (trials.Trial) up to where it stopped"""
+    global answer_frames
     answers_list = []
 
-    actual_phase = 1
-
-    while not done:
-        for event in pygame.event.get():
-            if event.type == KEYUP and event.key == K_ESCAPE and debug_mode:
-                pygame_exit()
-
-            elif event.type == KEYUP and event.key == K_p and debug_mode:
-                done = True
-
-            elif event.type == phase_change:
-                if actual_phase == 1:
-                    screen.fill(background)
-                    screen.blit(fix, fixbox)
-                    pygame.display.update(fixbox)
-                    pygame.display.flip()
-                    sleepy_trigger(1, lpt_address, trigger_latency) # fixation
-                    pygame.time.set_timer(phase_change, 1000, loops=1)
-                    actual_phase = 2
-                elif actual_phase == 2:
-                    show_image(image_list[count][0], base_size, grayscale=True)
-                    paragraph(text_convertor[image_list[count][1]], key=None, no_foot=True, color=Color('blue'), limit_time=0, row=None, is_clean=False)
-
-                    # Se verifica tipo de cara y palabra para enviar el trigger correspondiente
-                    relative_path = Path(image_list[count][0]).relative_to(script_path)
-                    image_type = relative_path.parts[2]  # Obtener la carpeta que contiene la imagen
-                    word_type = image_list[count][1]
-
-                    sleepy_trigger(
-                        trigger_helper[
-                            f"{'happy' if image_type == 'Happy' else 'sad'}_{'happy' if word_type == 'Happy' else 'sad'}"
-                        ],
-                        lpt_address,
-                        trigger_latency
-                    )  # Exposure image trigger first
-
-                    # sleepy_trigger(int(image_list[count].split('\\')[3].split("_")[0]), lpt_address, trigger_latency) # image ID
-                    pygame.time.set_timer(phase_change, 200, loops=1)
-                    actual_phase = 3
-                elif actual_phase == 3:
-                    answer = wait_answer(image_list[count], practice, VKeyboardSelection=VKeyboardSelection, NKeyboardSelection=NKeyboardSelection, type_of_answer = ("image" if block == 1 else "word"))
-                    answers_list.append([image_list[count], answer])
-
-                    # Lanzamiento de trigger según la respuesta
-                    if answer['selected_answer'] == "Missed":
-                        sleepy_trigger(trigger_helper["no_response"], lpt_address, trigger_latency)
-                    elif answer['is_correct']:
-                        sleepy_trigger(trigger_helper["correct_response"], lpt_address, trigger_latency)
-                    else:
-                        sleepy_trigger(trigger_helper["incorrect_response"], lpt_address, trigger_latency)
-
-                    count += 1
-                    if count >= len(image_list):
-                        done = True
-                    
-                    screen.fill(background)
-                    pygame.display.flip()
-                    pygame.time.set_timer(phase_change, randint(1000, 1200), loops=1)
-                    actual_phase = 1
-
-    pygame.time.set_timer(phase_change, 0)
+    # Todo lo de cada ensayo se calcula antes del bloque: el ciclo no arma rutas, textos ni diccionarios
+    if step is None:
+        step = block_step(image_list, block, VKeyboardSelection, NKeyboardSelection)
+    trials = step.trials
+    keys = step.keys
+    blank_frames = step.frames["inicio"]
+    fixation_frames = step.frames["fijacion"]
+    stimulus_frames = step.frames["estimulo"]
+    answer_frames = step.frames["respuesta"]
+    fixation_items = [(fix, fixbox)]
+    fixation_code = trigger_helper["fixation"]
+    answer_codes = {None: trigger_helper["no_response"], True: trigger_helper["correct_response"],
+                    False: trigger_helper["incorrect_response"]}
+
+    # ESC y P solo funcionan en modo de depuración durante los bloques
+    block_bindings = {
+        (KEYUP, K_ESCAPE): lambda event: debug_mode and pygame_exit(),
+        (KEYUP, K_p): lambda event: debug_mode,
+    }
 
-    pygame.event.clear()                    # CLEAR EVENTS
+    if measure_events:
+        events.start_measure()
+    text_misses = text_cache.misses
+
+    audit = AllocationAudit(len(trials)) if alloc_audit else None
+    if gc_control:
+        # Lo creado hasta aquí no se vuelve a revisar y no hay recolecciones durante el bloque
+        gc.collect()
+        gc.freeze()
+        gc.disable()
+    if audit is not None:
+        audit.start()
+    dropped_frames = scheduler.dropped_frames
+    if monitor_publisher is not None:
+        monitor_publisher.publish("bloque", uid=uid, block=block, task=trials[0].task if trials else None,
+                                  trials=len(trials))
 
-    # acá se almacenará la answers_list en el archivo dfile
+    try:
+        with events.bound(block_bindings):
+            scheduler.reset()
+            telemetry.clear()
+            if step is not None and step.trigger is not None:
+                # Después de limpiar la telemetría, para que el trigger del bloque quede registrado
+                sleepy_trigger(step.trigger, lpt_address, trigger_latency)  # block number
+            telemetry.record("inicio", t=scheduler.present("inicio", blank_frames, clear_screen()))
+
+            for trial in trials:
+                if scheduler.hold(events):
+                    break
+                if audit is not None:
+                    audit.begin_trial()
+
+                # Fase 1: cruz de fijación
+                telemetry.trial = trial.index
+                telemetry.record("fijacion", t=scheduler.present("fijacion", fixation_frames, redraw(fixation_items)))
+                sleepy_trigger(fixation_code, lpt_address, trigger_latency) # fixation
+                if scheduler.hold(events):
+                    break
+
+                # Fase 2: cara + palabra, las respuestas se registran desde el flip del estímulo
+                onset = scheduler.present("estimulo", stimulus_frames, redraw(trial.frame or trial_frame(trial.image, trial.word, base_size, grayscale=True)))
+                telemetry.record("estimulo", t=onset)
+                capture = ResponseCapture(onset, keys)
+
+                # Trigger de la condición cara x palabra (precalculado)
+                sleepy_trigger(trial.trigger, lpt_address, trigger_latency)  # Exposure image trigger first
+
+                # sleepy_trigger(int(image_list[count].split('\\')[3].split("_")[0]), lpt_address, trigger_latency) # image ID
+                with events.bound(listener=capture):
+                    stopped = scheduler.hold(events)
+                if stopped:
+                    break
+
+                # Fase 3: respuesta
+                wait_answer(trial, capture, practice)
+                answers_list.append(trial)
+
+                # Lanzamiento de trigger según la respuesta
+                sleepy_trigger(answer_codes[None if trial.selected_answer == "Missed" else bool(trial.is_correct)],
+                               lpt_address, trigger_latency)
+
+                # Intervalo entre ensayos, se sigue escuchando para registrar cuándo se suelta la tecla
+                telemetry.record("iti", t=scheduler.present("iti", trial.iti_frames, redraw([])))
+                with events.bound(listener=capture):
+                    stopped = scheduler.hold(events)
+                trial.release_us = capture.release_us()
+                if capture.press_ns is not None:
+                    telemetry.record("tecla_presionada", capture.key, capture.press_ns)
+                if capture.release_ns is not None:
+                    telemetry.record("tecla_soltada", capture.key, capture.release_ns)
+
+                # Cada ensayo se guarda apenas termina (el hilo de resultados escribe y sincroniza)
+                if dfile is not None:
+                    dfile.write(trial.row(uid, block))
+                if monitor_publisher is not None:
+                    monitor_publisher.publish("ensayo", block=block, trial=trial.index, face=trial.image_type,
+                                              word=trial.word, answer=trial.selected_answer, correct=trial.is_correct,
+                                              rt_ms=trial.rt_us / 1000 if trial.rt_us is not None else None,
+                                              dropped_frames=scheduler.dropped_frames - dropped_frames)
+                if audit is not None:
+                    audit.end_trial(trial.index)
+                if stopped:
+                    break
+    finally:
+        if gc_control:
+            gc.enable()
+            gc.unfreeze()
+        answer_frames = None
+
+    telemetry.trial = -1
+    telemetry.record("fin", t=scheduler.present("fin", 1, redraw([])))
+    if monitor_publisher is not None:
+        monitor_publisher.publish("fin", block=block, dropped_frames=scheduler.dropped_frames - dropped_frames)
+    if audit is not None:
+        print(audit.stop())
+    print(scheduler.report()) if debug_mode else None
+    if dfile is not None and trigger_dispatcher is not None:
+        trigger_dispatcher.flush(1.0)  # el último trigger también queda en la telemetría
     if dfile is not None:
-        for answer in answers_list:
-            # Unir la lista con guiones en lugar de comas
-            dfile.write("%s,%s,%s,%s,%s,%s,%s,%s,%s\n" % (uid,
-                                                    (Path(answer[0][0]).relative_to(script_path)).parts[-1].split('.')[0],
-                                                    block,
-                                                    answer[1]['rt'],
-                                                    (Path(answer[0][0]).relative_to(script_path)).parts[2],
-                                                    answer[0][1],
-                                                    "Cara" if block == 1 else "Palabra",
-                                                    answer[1]['selected_answer'],
-                                                    int(answer[1]['is_correct']) if answer[1]['is_correct'] is not None else ""
-                                                 ))
-            #("Sujeto", "IdImagen", "Bloque", "TReaccion", "TipoImagen", "Palabra", "TipoRespuesta", "Respuesta", "Acierto"))
-        dfile.flush()
-    else:
+        telemetry.dump(sidecar_path(dfile.path, block))
+    print(telemetry.summary()) if debug_mode else None
+    print(f"Textos renderizados durante el bloque: {text_cache.misses - text_misses} ({text_cache.stats()})") if debug_mode else None
+    if measure_events:
+        print(format_measurement(f"Bloque {block}", events.stop_measure()))
+
+    pygame.event.clear()                    # CLEAR EVENTS
+
+    if dfile is None:
         print("Error al cargar el archivo de datos")
 
+    return answers_list
 
-def fixation_image_list(fixation_time, fixation=True):
 
-    fixation_event = USEREVENT + 3
-    pygame.time.set_timer(fixation_event, fixation_time, loops=1)
-    done = False
+def fixation_image_list(fixation_time, fixation=True):
 
-    screen.fill(background)
-    pygame.display.flip()
+    scheduler.resync()
+    clear_screen()
     if fixation:
-        screen.blit(fix, fixbox)
-        pygame.display.update(fixbox)
-    pygame.display.flip()
+        redraw([(fix, fixbox)])
+        # if fixation:
+            # sleepy_trigger(244, lpt_address, trigger_latency) # fixation
+    scheduler.present("fijacion" if fixation else "blanco", scheduler.frames(fixation_time))
+    with events.bound({(KEYUP, K_p): lambda event: True}):
+        scheduler.hold(events)
 
-    tw = pygame.time.get_ticks()
+    pygame.event.clear()                    # CLEAR EVENTS
 
-    while not done:
-        for event in pygame.event.get():
-            if event.type == KEYUP and event.key == K_ESCAPE:
-                pygame_exit()
-            elif event.type == KEYUP and event.key == K_p:
-                done = True
+def compile_session(subject, block_lists, render=True):
+    """Execution plan of the session (experiment_spec.compile_plan) with this script's trials, frames and text cache"""
+    return experiment_spec.compile_plan(load_spec(), subject, block_lists, prepare_trials, scheduler.frames, key_code,
+                                        render=preload_paragraph if render else None)
 
-            elif event.type == fixation_event:  # and pygame.time.get_ticks() - tw >= fixation_time
-                # if fixation:
-                    # sleepy_trigger(244, lpt_address, trigger_latency) # fixation
-                done = True
-                break
 
-    pygame.time.set_timer(fixation_event, 0)
-    pygame.event.clear()                    # CLEAR EVENTS
+def run_plan(steps, uid, dfile):
+    """Walks the compiled execution plan: slides, triggers and blocks, in order"""
+    for step in steps:
+        if step.kind == "slide":
+            paragraph(step.text, key=step.key, no_foot=step.no_foot)
+        elif step.kind == "trigger":
+            send_triggert(step.trigger)
+        else:
+            show_images(None, uid=uid, dfile=dfile, block=step.block, step=step)
+
 
 # Main Function
 def main():
     """Game's main loop"""
+    load_spec()
 
-    init_com()
+    # Los imports pesados y la lista de estímulos se preparan mientras se ingresa el ID
+    startup_errors = []
+    startup = Thread(target=prepare_startup, args=(startup_errors,), daemon=True)
+    startup.start()
 
     # Si no existe la carpeta data se crea
     if not os.path.exists(script_path/'data/'):
         os.makedirs(script_path/'data/')
 
-    # Username = id_keyboardSelection_firstBlock
+    # Username = id_keyboardSelection_firstBlock (formato en subject.pattern de experiment.json)
     # keyboardSelection = V is F or T (feliz o triste), firstBlock = C or P (cara o palabra, que es lo que la persona debe identificar en el primer bloque)
     # example: 4321_F_C sería un usuario con id 4321 el cual al presionar la V representa Feliz, el primer bloque es Cara y el segundo es Palabra
     # example: 4321_T_P sería un usuario con id 4321 el cual al presionar la V representa Triste, el primer bloque es Palabra y el segundo es Cara
 
-    correct_sub_name = False
+    subject = None
     first_round = True
 
-    while not correct_sub_name:
+    while subject is None:
         os.system('cls')
         if not first_round:
             print("ID ingresado no cumple con las condiciones, contacte con el encargado...")
 
         first_round = False
         subj_name = input(
-            "Ingrese el ID del participante y presione ENTER para iniciar: ")
-        
-        print(len(subj_name.split("_")))
-        if not subj_name or subj_name.strip() == "" or len(subj_name.split("_")) != 3:
-            continue
+            "Ingrese el ID del participante y presione ENTER para iniciar: ").strip()
+        subject = experiment_spec.parse_subject(spec, subj_name)
 
-        uid = subj_name.split("_")[0].strip()
-        VKeyboardSelection = subj_name.split("_")[1].strip()
-        NKeyboardSelection = "T" if VKeyboardSelection == "F" else "F"
-        firstBlock = subj_name.split("_")[2].strip()
-        secondBlock = "C" if firstBlock == "P" else "P"
+    uid = subject["uid"]
+    print(subject) if debug_mode else None
 
-        print(uid) if debug_mode else None
-        print(VKeyboardSelection) if debug_mode else None
-        print(firstBlock) if debug_mode else None
 
-        if VKeyboardSelection in ["F", "T"] and firstBlock in ["C", "P"]:
-            correct_sub_name = True
-    
-    print("Tecla Feliz: " + ("V" if subj_name.split("_")[1].strip() == "F" else "N")) if debug_mode else None
-    print("Tecla Triste: " + ("V" if subj_name.split("_")[1].strip() == "T" else "N")) if debug_mode else None
-    print("Primer bloque: " + ("Cara" if firstBlock == "C" else "Palabra")) if debug_mode else None
-    print("Segundo bloque: " + ("Palabra" if secondBlock == "P" else "Cara")) if debug_mode else None
-    
-    csv_name = date_name + '_' + subj_name + '.csv'
-    dfile = open(script_path/"data"/csv_name, 'w')
-    dfile.write("%s,%s,%s,%s,%s,%s,%s,%s,%s\n" % ("Sujeto", "IdImagen", "Bloque", "TReaccion", "TipoImagen", "Palabra", "TipoRespuesta", "Respuesta", "Acierto"))
-    dfile.flush()
-
-    init()
+    t0 = perf_counter()
+    startup.join()
+    if startup_errors:
+        raise startup_errors[0]
+    startup_times["espera tras el ID"] = perf_counter() - t0
 
-    send_triggert(start_trigger)
-
-    paragraph(select_slide('welcome'), key = K_SPACE)
-
-    # ------------------------ first block ------------------------
-
-    paragraph(select_slide('word_block' if firstBlock == "P" else 'face_block', variables= {"blockType": firstBlock, "happyV": True if VKeyboardSelection == "F" else False, "blockNumber": 1}), key = K_SPACE)
+    init_com()
+    init_triggers()
+    init_monitor()
 
-    sleepy_trigger(51, lpt_address, trigger_latency) # block number
-    show_images(first_experiment_block, practice = False, uid=uid, dfile=dfile, block=1, VKeyboardSelection=VKeyboardSelection, NKeyboardSelection=NKeyboardSelection)
-    
-    paragraph(select_slide('break', variables={"blockNumber": 1, "practice": False, "happyV": True, "blockType": "C"}), key = K_SPACE, no_foot = True)
+    for key, answer in spec["keys"][subject["keys"]].items():
+        print(f"Tecla {key.upper()}: {text_convertor[answer]}") if debug_mode else None
+    for block in spec["blocks"]:
+        print(f"Bloque {block['number']}: " + spec["tasks"][experiment_spec.block_task(spec, block["number"], subject["first"])]["name"]) if debug_mode else None
 
-    # ------------------------ second block ------------------------
+    # Si hay una sesión incompleta del mismo participante se ofrece reanudarla (con su mismo plan)
+    resumed = False
+    csv_name = date_name + '_' + subj_name + '.csv'
+    previous = sorted(f for f in (script_path/'data').glob('*.csv') if f.name[len(date_name) + 1:-4] == subj_name)
+    if previous:
+        session = read_session(previous[-1])
+        done = len(session["rows"])
+        if 0 < done < sum(len(trials) for trials in experiment_blocks.values()):
+            answer = input(f"Sesión incompleta encontrada ({previous[-1].name}, {done} ensayos). ¿Reanudar? (s/n): ")
+            if answer.strip().lower() == "s":
+                # Solo se reanuda con el plan guardado de la sesión: con otro orden los ensayos restantes serían otros
+                plan_file = sequence.latest_plan(uid)
+                plan = sequence.load_plan(plan_file) if plan_file is not None else None
+                block_lists = resume_lists(plan, session) if plan is not None else None
+                if block_lists is None:
+                    print("No hay un plan guardado que corresponda a los ensayos registrados: no se puede reanudar. "
+                          "Se inicia una sesión nueva en otro archivo.")
+                    input("Presione ENTER para continuar...")
+                else:
+                    resumed = True
+                    csv_name = previous[-1].name
+                    use_plan(plan)
+    if not resumed:
+        block_lists = experiment_blocks
+        session_plan["uid"] = uid
+        plan_file = sequence.save_plan(session_plan)  # siempre: es lo que permite reproducir o reanudar la sesión
+        print(f"Plan guardado en {plan_file}") if debug_mode else None
+
+    if io_split:
+        # Desde aquí los print y las filas pasan por memoria compartida al proceso de E/S
+        _, dfile, sys.stdout = iochannel.start(script_path/"data"/csv_name)
+    else:
+        dfile = ResultWriter(script_path/"data"/csv_name)
 
-    paragraph(select_slide('word_block' if secondBlock == "P" else 'face_block', variables= {"blockType": secondBlock, "happyV": True if VKeyboardSelection == "F" else False, "blockNumber": 2}), key = K_SPACE, no_foot = True)
+    t0 = perf_counter()
+    init()
+    startup_times["pantalla"] = perf_counter() - t0
 
-    sleepy_trigger(52, lpt_address, trigger_latency) # block number
-    show_images(second_experiment_block, practice = False, uid=uid, dfile=dfile, block=2, VKeyboardSelection=VKeyboardSelection, NKeyboardSelection=NKeyboardSelection)
+    # Se cargan todas las imágenes antes de la bienvenida para no leer disco durante los ensayos
+    startup_times["cargar estímulos"] = load_stimuli(list(experiment_blocks.values()), base_size, grayscale=True)
+    startup_times["cuadros compuestos"] = build_trial_frames(list(experiment_blocks.values()), base_size, grayscale=True)
+    t0 = perf_counter()
 
-    paragraph(select_slide('break', variables={"blockNumber": 2, "practice": False, "happyV": True, "blockType": "C"}), key = K_SPACE, no_foot = True)
+    # Plan de ejecución: diapositivas (renderizadas), triggers, duraciones en cuadros y ensayos con su
+    # respuesta esperada quedan resueltos antes de la primera diapositiva
+    steps = compile_session(subject, block_lists)
+    preload_paragraph("", key=K_SPACE, no_foot=True)
+    startup_times["plan de ejecución"] = perf_counter() - t0
+    print(startup_report()) if debug_mode else None
 
-    paragraph(select_slide('farewell'), key = K_SPACE, no_foot = True)
-    send_triggert(stop_trigger)
+    run_plan(steps, uid, dfile)
     dfile.close()
 
     close_com()
@@ -0,0 +1,282 @@
+# coding=utf-8
+
+"""
+Canal de E/S en memoria compartida entre el proceso de presentación y un proceso acompañante.
+
+Con io_split el ciclo de presentación no escribe en disco ni en la consola: solo copia
+registros de tamaño fijo a un buffer circular en memoria compartida (sin llamadas al sistema
+ni bloqueos mientras haya lugar). El proceso acompañante los vacía en el archivo de resultados
+(ResultWriter) y en la consola, donde una consola lenta de Windows ya no puede retrasar un flip.
+
+Registro: tipo (1 byte), largo (2 bytes) y contenido (hasta slot_size - 3 bytes, UTF-8).
+Una fila más larga se parte en registros ROW_PART seguidos de un ROW final, que el acompañante
+vuelve a unir antes de decodificar; nunca se trunca. El buffer tiene un solo productor a la vez (un lock entre los hilos del proceso de
+presentación) y un solo consumidor (el acompañante).
+
+Si el buffer está lleno y el acompañante terminó, o no lo vacía durante full_timeout, el
+productor deja de esperar y le pide al acompañante que termine: este vacía las filas que quedan
+en el buffer a su archivo, lo cierra (sincronizado) y sale; recién entonces (o tras stop_timeout,
+si no responde) el proceso de presentación sigue escribiendo resultados y consola sin el canal.
+"""
+import atexit, multiprocessing, os, struct, sys, threading
+from multiprocessing import shared_memory
+from time import monotonic, sleep
+
+from results import ResultWriter
+
+slot_size = 256
+header = struct.Struct("<qq")  # escritos, leídos
+record = struct.Struct("<BH")
+payload_size = slot_size - record.size  # contenido máximo de un registro
+
+# Tipos de registro
+TEXT, ROW, FLUSH, CLOSE, ROW_PART = range(5)
+
+# Separador de valores de una fila (no aparece en los datos)
+field_separator = "\x1f"
+
+# Espera máxima con el buffer lleno antes de dar por caído al acompañante (s)
+full_timeout = 2.0
+# Espera máxima para que el acompañante guarde sus filas y termine antes de detenerlo (s)
+stop_timeout = 5.0
+
+
+class ChannelBroken(OSError):
+    """The consumer of the ring died or stopped draining it"""
+
+
+class SharedRing:
+    """Single-producer single-consumer ring of fixed-size records in shared memory"""
+
+    def __init__(self, name=None, slots=4096):
+        if name is None:
+            self.memory = shared_memory.SharedMemory(create=True, size=header.size + slots * slot_size)
+            header.pack_into(self.memory.buf, 0, 0, 0)
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)  # lo libera el proceso que lo creó
+        self.name = self.memory.name
+        self.slots = (self.memory.size - header.size) // slot_size
+        self.lock = threading.Lock()
+        self.waits = 0  # veces que el productor encontró el buffer lleno
+        self.alive = None  # función que indica si el consumidor sigue vivo (la asigna start())
+        self.broken = False
+
+    def put(self, kind, payload=b""):
+        """Copies a record into the ring (waits only if the ring is full); the payload must fit in one record"""
+        if len(payload) > payload_size:
+            raise ValueError(f"Registro de {len(payload)} bytes, el máximo es {payload_size} (use put_parts)")
+        with self.lock:
+            self.store(kind, payload)
+
+    def put_parts(self, kind, part_kind, payload):
+        """Copies a payload of any length as part_kind records plus a final kind record, with no other record in between"""
+        parts = [payload[start:start + payload_size] for start in range(0, len(payload), payload_size)] or [b""]
+        with self.lock:
+            for part in parts[:-1]:
+                self.store(part_kind, part)
+            self.store(kind, parts[-1])
+
+    def store(self, kind, payload):
+        """Writes one record (the caller holds the lock); ChannelBroken if the ring stays full with no consumer"""
+        if self.broken:
+            raise ChannelBroken("El proceso de E/S no está disponible")
+        deadline = None
+        while True:
+            written, read = header.unpack_from(self.memory.buf, 0)
+            if written - read < self.slots:
+                break
+            self.waits += 1
+            if deadline is None:
+                deadline = monotonic() + full_timeout
+            elif (self.alive is not None and not self.alive()) or monotonic() > deadline:
+                self.broken = True
+                raise ChannelBroken("El proceso de E/S dejó de vaciar el buffer")
+            sleep(0)
+        offset = header.size + (written % self.slots) * slot_size
+        record.pack_into(self.memory.buf, offset, kind, len(payload))
+        start = offset + record.size
+        self.memory.buf[start:start + len(payload)] = payload
+        struct.pack_into("<q", self.memory.buf, 0, written + 1)  # publica el registro al final
+
+    def get(self):
+        """Next (kind, payload) or None when the ring is empty"""
+        written, read = header.unpack_from(self.memory.buf, 0)
+        if read == written:
+            return None
+        offset = header.size + (read % self.slots) * slot_size
+        kind, length = record.unpack_from(self.memory.buf, offset)
+        start = offset + record.size
+        payload = bytes(self.memory.buf[start:start + length])
+        struct.pack_into("<q", self.memory.buf, 8, read + 1)
+        return kind, payload
+
+    def close(self, unlink=False):
+        self.memory.close()
+        if unlink:
+            self.memory.unlink()
+
+
+class ChannelConsole:
+    """File-like stdout replacement that sends the text through the ring"""
+
+    def __init__(self, ring):
+        self.ring = ring
+
+    def write(self, text):
+        # El acompañante une los registros de texto y solo decodifica líneas completas
+        try:
+            self.ring.put_parts(TEXT, TEXT, text.encode("utf-8"))
+        except ChannelBroken:
+            sys.__stdout__.write(text)
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+class ChannelResultWriter:
+    """ResultWriter stand-in for the presentation process: rows go through the ring"""
+
+    def __init__(self, ring, process, done, path=None, stop=None):
+        self.path = path
+        self.ring = ring
+        self.process = process
+        self.done = done  # el acompañante lo activa tras cada FLUSH y al cerrar
+        self.stop = stop  # pide al acompañante que vacíe el buffer y termine (sin pasar por el buffer lleno)
+        self.direct = None  # ResultWriter propio cuando el acompañante dejó de responder
+        atexit.register(self.close)  # también al salir con sys.exit() (ESC)
+
+    def write(self, row):
+        if self.direct is None:
+            try:
+                self.ring.put_parts(ROW, ROW_PART, field_separator.join("" if value is None else str(value) for value in row).encode("utf-8"))
+                return
+            except ChannelBroken:
+                self.fall_back()
+        if self.path is not None:
+            self.direct.write(row)
+
+    def fall_back(self):
+        """Stops the companion, writes the rows left in the ring and continues without the channel"""
+        if self.process.is_alive() and self.stop is not None:
+            # Las filas que el acompañante ya tomó están en su ResultWriter: que las guarde y cierre
+            self.stop.set()
+            self.process.join(stop_timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(1.0)
+        if isinstance(sys.stdout, ChannelConsole) and sys.stdout.ring is self.ring:
+            sys.stdout = sys.__stdout__
+        self.ring.broken = True
+        print("El proceso de E/S dejó de responder: los resultados se escriben directamente")
+        self.direct = ResultWriter(self.path) if self.path is not None else None
+        row = bytearray()
+        while (item := self.ring.get()) is not None:
+            kind, payload = item
+            if kind in (ROW_PART, ROW):
+                row += payload
+            if kind == ROW:
+                if self.direct is not None:
+                    self.direct.write(row.decode("utf-8").split(field_separator))
+                row.clear()
+
+    def flush(self, timeout=5.0):
+        """Blocks until the companion wrote every queued row to disk"""
+        if self.direct is None and not self.ring.broken:
+            self.done.clear()
+            try:
+                self.ring.put(FLUSH)
+                return self.done.wait(timeout)
+            except ChannelBroken:
+                self.fall_back()
+        if self.direct is not None:
+            self.direct.flush()
+        return True
+
+    def close(self, timeout=5.0):
+        if self.process is None:
+            return
+        if isinstance(sys.stdout, ChannelConsole) and sys.stdout.ring is self.ring:
+            sys.stdout = sys.__stdout__
+        if self.direct is None and not self.ring.broken:
+            try:
+                self.ring.put(CLOSE)
+                self.process.join(timeout)
+            except ChannelBroken:
+                self.fall_back()
+        if self.direct is not None:
+            self.direct.close()
+        self.process = None
+        self.ring.close(unlink=True)
+        atexit.unregister(self.close)
+
+
+def companion(name, data_path, done, console_path=None, console_delay=0.0, poll=0.002, stop=None):
+    """Companion process: drains the ring into the result file and the console
+
+    console_path sends the console text to a file instead of stdout; console_delay adds a
+    pause after each console write (to emulate a slow console). When stop is set the rest of
+    the ring goes to the result file, which is closed before any pending console text is written.
+    """
+    ring = SharedRing(name)
+    dfile = ResultWriter(data_path) if data_path is not None else None
+    if console_path is not None:
+        sys.stdout = open(console_path, "w", encoding="utf-8")
+    text = bytearray()
+    row = bytearray()  # partes de una fila larga
+    while True:
+        stopping = stop is not None and stop.is_set()
+        item = ring.get()
+        if item is None:
+            if stopping:
+                break
+            sleep(poll)
+            continue
+        kind, payload = item
+        if kind == TEXT:
+            text += payload
+            if b"\n" in text and not stopping:  # solo líneas completas (un texto largo puede venir en varios registros)
+                lines, _, rest = bytes(text).rpartition(b"\n")
+                sys.stdout.write(lines.decode("utf-8", "replace") + "\n")
+                sys.stdout.flush()
+                text = bytearray(rest)
+                if console_delay:
+                    sleep(console_delay)
+        elif kind == ROW_PART:
+            row += payload
+        elif kind == ROW:
+            row += payload
+            if dfile is not None:
+                dfile.write(row.decode("utf-8").split(field_separator))
+            row.clear()
+        elif kind == FLUSH:
+            if dfile is not None:
+                dfile.flush()
+            done.set()
+        elif kind == CLOSE:
+            break
+    if dfile is not None:
+        dfile.close()
+    done.set()
+    if text:
+        sys.stdout.write(text.decode("utf-8", "replace"))
+        sys.stdout.flush()
+    ring.close()
+
+
+def start(data_path, slots=4096, console_path=None, console_delay=0.0):
+    """Starts the companion process, returns (ring, ChannelResultWriter, ChannelConsole)
+
+    Assigning the console to sys.stdout routes every print through the companion; closing the
+    writer restores the real stdout.
+    """
+    ring = SharedRing(slots=slots)
+    done = multiprocessing.Event()
+    stop = multiprocessing.Event()
+    process = multiprocessing.Process(target=companion, name="io",
+                                      args=(ring.name, None if data_path is None else os.fspath(data_path),
+                                            done, console_path, console_delay),
+                                      kwargs={"stop": stop}, daemon=True)
+    process.start()
+    ring.alive = process.is_alive
+    return ring, ChannelResultWriter(ring, process, done, data_path, stop), ChannelConsole(ring)
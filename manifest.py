@@ -0,0 +1,57 @@
+# coding=utf-8
+
+"""
+Manifiesto de estímulos.
+
+Guarda la lista de archivos de cada carpeta de imágenes junto con la fecha de modificación de
+la carpeta (media/manifest.json). Mientras la carpeta no cambie (agregar, borrar o renombrar
+archivos cambia su mtime) la lista se lee del manifiesto en lugar de recorrer la carpeta, lo
+que en el recurso compartido de red del laboratorio evita varios segundos de espera.
+Solo usa la biblioteca estándar para poder cargarse antes que pygame.
+"""
+import json, os
+from pathlib import Path
+
+script_path = Path(__file__).parent.resolve()
+
+manifest_file = script_path/"media"/"manifest.json"
+
+
+def scan_folder(folder):
+    """Names of the files in a folder"""
+    with os.scandir(folder) as entries:
+        return sorted(entry.name for entry in entries if entry.is_file())
+
+
+def load_manifest(folders, manifest_path=manifest_file):
+    """Returns {folder name: [file paths]} using the cached manifest when the folders did not change
+
+    Folders whose mtime differs from the manifest are scanned again and the manifest rewritten.
+    """
+    try:
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+
+    changed = False
+    images = {}
+    for folder in folders:
+        folder = Path(folder)
+        mtime = os.stat(folder).st_mtime_ns
+        entry = manifest.get(folder.name)
+        if entry is None or entry.get("mtime_ns") != mtime:
+            entry = {"mtime_ns": mtime, "files": scan_folder(folder)}
+            manifest[folder.name] = entry
+            changed = True
+        images[folder.name] = [folder/name for name in entry["files"]]
+
+    if changed:
+        try:
+            tmp_path = Path(str(manifest_path) + ".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(manifest, f, indent=1)
+            os.replace(tmp_path, manifest_path)
+        except OSError:
+            pass  # sin permiso de escritura en media/ se sigue sin cache
+    return images
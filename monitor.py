@@ -0,0 +1,400 @@
+# coding=utf-8
+
+"""
+Monitoreo en vivo de las sesiones desde la sala de control.
+
+Cada estación (PC del experimento) publica el inicio de cada bloque, el resultado de cada
+ensayo y el cierre de la sesión con un Publisher: el ciclo de presentación solo agrega una tupla a una cola (nunca
+bloquea) y un hilo de fondo la codifica y la envía como datagrama UDP. Si el servidor no está
+o la red falla, los mensajes se descartan sin afectar al experimento.
+
+El servidor (asyncio) recibe los datagramas de varias estaciones, lleva por cada una la
+precisión, las omisiones, el TR y los cuadros perdidos, y los sirve por HTTP:
+
+- /          página con una tabla que se actualiza sola
+- /state     estado de todas las estaciones (JSON)
+- /events    flujo Server-Sent Events: el estado inicial y cada actualización
+
+El servidor puede correr en la PC de control (python monitor.py serve) o dentro del proceso
+del experimento en un hilo propio (monitor_address = "local" en "home version.py"). No tiene
+autenticación: por defecto solo escucha en 127.0.0.1, y para recibir estaciones de la red hay
+que indicarlo con --host (solo en una red de laboratorio aislada).
+
+Uso:
+    python monitor.py serve --http 8765 --udp 8766
+    python monitor.py serve --host 0.0.0.0                     # estaciones de otras PCs
+    python monitor.py client http://127.0.0.1:8765/events      # cliente de prueba (texto)
+    python monitor.py fake --stations 3 --trials 40            # estaciones simuladas
+"""
+import argparse, asyncio, json, queue, random, socket, sys, threading
+from collections import deque
+from time import perf_counter_ns, sleep, time
+
+http_port = 8765
+udp_port = 8766
+
+# Sin mensajes de una estación durante este tiempo se la muestra como inactiva (s)
+stale_after = 15
+
+# Cantidad de TR recientes para la mediana
+recent_rts = 50
+
+
+class Publisher:
+    """Sends session events to a monitor server without ever blocking the caller"""
+
+    def __init__(self, host="127.0.0.1", port=udp_port, station=None):
+        self.address = (host, port)
+        self.station = station or socket.gethostname()
+        self.queue = queue.SimpleQueue()
+        self.sent = 0
+        self.dropped = 0
+        self.server = None  # (MonitorServer, hilo) de start_local: se detiene al cerrar
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.setblocking(False)
+        self.thread = threading.Thread(target=self.run, name="monitor", daemon=True)
+        self.thread.start()
+
+    def publish(self, kind, **fields):
+        """Queues an event (a single put, it does not wait for the network)"""
+        self.queue.put((kind, time(), fields))
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            kind, t, fields = item
+            message = json.dumps({"station": self.station, "kind": kind, "time": t, **fields}).encode("utf-8")
+            try:
+                self.socket.sendto(message, self.address)
+                self.sent += 1
+            except OSError:
+                self.dropped += 1  # sin servidor o buffer lleno: el monitoreo no frena el experimento
+
+    def close(self):
+        """Sends what is queued, closes the socket and stops the local server if there is one"""
+        if self.socket.fileno() == -1:
+            return
+        self.queue.put(None)
+        self.thread.join(1.0)
+        self.socket.close()
+        if self.server is not None:
+            server, thread = self.server
+            server.stop()
+            thread.join(5.0)
+            self.server = None
+
+
+class Station:
+    """Running summary of one station"""
+
+    def __init__(self, name):
+        self.name = name
+        self.uid = None
+        self.block = None
+        self.task = None
+        self.block_trials = 0
+        self.trials = 0
+        self.answered = 0
+        self.correct = 0
+        self.scored = 0  # respondidos con acierto/error (la práctica no se puntúa)
+        self.rt_sum = 0.0
+        self.rt_count = 0
+        self.rts = deque(maxlen=recent_rts)
+        self.dropped_frames = 0
+        self.last_seen = 0.0
+        self.last_trial = None
+        self.finished = False  # la estación publicó el cierre de la sesión
+
+    def update(self, message):
+        kind = message["kind"]
+        self.last_seen = message["time"]
+        if kind == "sesion":
+            self.finished = message.get("status") == "finalizada"
+        elif kind == "bloque":
+            self.finished = False
+            self.uid = message.get("uid", self.uid)
+            self.block = message.get("block")
+            self.task = message.get("task")
+            self.block_trials = message.get("trials", 0)
+            self.trials = self.answered = self.correct = self.scored = 0
+            self.rt_sum = 0.0
+            self.rt_count = 0
+            self.rts.clear()
+            self.dropped_frames = 0
+        elif kind == "ensayo":
+            self.trials += 1
+            if message.get("answer") != "Missed":
+                self.answered += 1
+                if message.get("rt_ms") is not None:
+                    self.rt_sum += message["rt_ms"]
+                    self.rt_count += 1
+                    self.rts.append(message["rt_ms"])
+            if message.get("correct") is not None:
+                self.scored += 1
+                self.correct += bool(message["correct"])
+            self.dropped_frames = message.get("dropped_frames", self.dropped_frames)
+            self.last_trial = {key: message.get(key) for key in ("trial", "face", "word", "answer", "correct", "rt_ms")}
+        elif kind == "fin":
+            self.dropped_frames = message.get("dropped_frames", self.dropped_frames)
+
+    def state(self, now=None):
+        now = time() if now is None else now
+        rts = sorted(self.rts)
+        return {
+            "station": self.name,
+            "uid": self.uid,
+            "block": self.block,
+            "task": self.task,
+            "trials": self.trials,
+            "block_trials": self.block_trials,
+            "accuracy": self.correct / self.scored if self.scored else None,
+            "miss_rate": 1 - self.answered / self.trials if self.trials else None,
+            "mean_rt_ms": self.rt_sum / self.rt_count if self.rt_count else None,
+            "median_rt_ms": rts[len(rts) // 2] if rts else None,  # de los últimos recent_rts
+            "dropped_frames": self.dropped_frames,
+            "last_trial": self.last_trial,
+            "active": now - self.last_seen < stale_after and not self.finished,
+            "finished": self.finished,
+            "last_seen": self.last_seen,
+        }
+
+
+class MonitorServer:
+    """Collects station datagrams and serves the live state over HTTP / Server-Sent Events"""
+
+    def __init__(self, host="127.0.0.1", http=http_port, udp=udp_port):
+        self.host = host
+        self.http = http
+        self.udp = udp
+        self.stations = {}
+        self.clients = set()  # una cola por cliente SSE
+        self.received = 0
+        self.invalid = 0
+        self.loop = None
+        self.stopping = None  # asyncio.Event, lo activa stop()
+
+    # Recepción UDP
+    def datagram_received(self, data, address):
+        try:
+            message = json.loads(data)
+            station = self.stations.setdefault(message["station"], Station(message["station"]))
+            station.update(message)
+        except (ValueError, KeyError, TypeError):
+            self.invalid += 1
+            return
+        self.received += 1
+        self.broadcast(station.state())
+
+    def broadcast(self, state):
+        data = ("data: " + json.dumps(state) + "\n\n").encode("utf-8")
+        for client in self.clients:
+            try:
+                client.put_nowait(data)
+            except asyncio.QueueFull:
+                pass  # un cliente lento pierde actualizaciones, no frena a los demás
+
+    def snapshot(self):
+        now = time()
+        return [station.state(now) for station in self.stations.values()]
+
+    # HTTP
+    async def handle(self, reader, writer):
+        try:
+            request = (await reader.readline()).decode("latin-1").split()
+            while (await reader.readline()).strip():
+                pass  # encabezados
+            path = request[1].split("?")[0] if len(request) > 1 else "/"
+            if path == "/events":
+                await self.stream(writer)
+            elif path == "/state":
+                self.respond(writer, "application/json", json.dumps(self.snapshot()).encode("utf-8"))
+            elif path == "/":
+                self.respond(writer, "text/html; charset=utf-8", page.encode("utf-8"))
+            else:
+                self.respond(writer, "text/plain", b"no encontrado", "404 Not Found")
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def respond(writer, content_type, body, status="200 OK"):
+        writer.write(f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\nContent-Length: {len(body)}\r\n"
+                     f"Access-Control-Allow-Origin: *\r\nConnection: close\r\n\r\n".encode("latin-1") + body)
+
+    async def stream(self, writer):
+        client = asyncio.Queue(maxsize=256)
+        self.clients.add(client)
+        try:
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\n"
+                         b"Access-Control-Allow-Origin: *\r\nConnection: keep-alive\r\n\r\n")
+            for state in self.snapshot():
+                writer.write(("data: " + json.dumps(state) + "\n\n").encode("utf-8"))
+            await writer.drain()
+            while True:
+                try:
+                    data = await asyncio.wait_for(client.get(), timeout=stale_after)
+                except asyncio.TimeoutError:
+                    data = b": sigue conectado\n\n"
+                writer.write(data)
+                await writer.drain()
+        finally:
+            self.clients.discard(client)
+
+    def stop(self):
+        """Stops a running server (callable from another thread)"""
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.stopping.set)
+
+    async def run(self, started=None):
+        loop = asyncio.get_running_loop()
+        self.loop = loop
+        self.stopping = asyncio.Event()
+        server = self
+
+        class Protocol(asyncio.DatagramProtocol):
+            def datagram_received(self, data, address):
+                server.datagram_received(data, address)
+
+        transport, _ = await loop.create_datagram_endpoint(Protocol, local_addr=(self.host, self.udp))
+        http = await asyncio.start_server(self.handle, self.host, self.http)
+        if started is not None:
+            started.set()
+        try:
+            async with http:
+                await self.stopping.wait()
+        finally:
+            transport.close()
+
+
+def start_local(http=http_port, udp=udp_port, station=None):
+    """Runs a monitor server in a background thread of this process, returns a Publisher to it"""
+    server = MonitorServer("127.0.0.1", http, udp)  # solo este equipo
+    started = threading.Event()
+    thread = threading.Thread(target=asyncio.run, args=(server.run(started),), name="monitor-server", daemon=True)
+    thread.start()
+    if not started.wait(5.0):
+        raise OSError(f"No se pudo iniciar el monitor en los puertos {http}/{udp}")
+    publisher = Publisher("127.0.0.1", udp, station)
+    publisher.server = (server, thread)
+    return publisher
+
+
+page = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Monitor Stroop</title>
+<style>body{font-family:sans-serif}td,th{padding:4px 10px;text-align:right}.inactive{color:#999}</style></head>
+<body><h2>Sesiones en curso</h2>
+<table><thead><tr><th>Estación</th><th>Sujeto</th><th>Bloque</th><th>Tarea</th><th>Ensayos</th><th>Precisión</th>
+<th>Omisiones</th><th>TR medio</th><th>TR mediana</th><th>Cuadros perdidos</th><th>Último ensayo</th><th>Estado</th></tr></thead>
+<tbody id="stations"></tbody></table>
+<script>
+const rows = new Map();
+const pct = v => v === null ? "" : (100 * v).toFixed(1) + " %";
+const ms = v => v === null ? "" : v.toFixed(0) + " ms";
+new EventSource("/events").onmessage = e => {
+  const s = JSON.parse(e.data);
+  let row = rows.get(s.station);
+  if (!row) { row = document.getElementById("stations").insertRow(); rows.set(s.station, row); }
+  const last = s.last_trial ? `${s.last_trial.face}/${s.last_trial.word} -> ${s.last_trial.answer}` : "";
+  row.className = s.active ? "" : "inactive";
+  // Los valores vienen de datagramas sin autenticar: solo como texto, nunca como HTML
+  row.replaceChildren(...[s.station, s.uid ?? "", s.block ?? "", s.task ?? "", `${s.trials}/${s.block_trials}`,
+    pct(s.accuracy), pct(s.miss_rate), ms(s.mean_rt_ms), ms(s.median_rt_ms), s.dropped_frames, last,
+    s.finished ? "finalizada" : s.active ? "en curso" : "inactiva"]
+    .map(v => { const cell = document.createElement("td"); cell.textContent = String(v); return cell; }));
+};
+</script></body></html>
+"""
+
+
+def format_state(state):
+    def value(key, scale=1, suffix=""):
+        return "-" if state[key] is None else f"{state[key] * scale:.1f}{suffix}"
+    return (f"{state['station']:>12} sujeto={state['uid']} bloque={state['block']} {state['trials']}/{state['block_trials']} "
+            f"precisión={value('accuracy', 100, '%')} omisiones={value('miss_rate', 100, '%')} "
+            f"TR={value('mean_rt_ms', suffix=' ms')} cuadros perdidos={state['dropped_frames']}"
+            + (" (finalizada)" if state["finished"] else "" if state["active"] else " (inactiva)"))
+
+
+def client(url):
+    """Test client: prints every update of the /events feed"""
+    from urllib.request import urlopen
+    with urlopen(url) as response:
+        for line in response:
+            line = line.decode("utf-8").strip()
+            if line.startswith("data: "):
+                print(format_state(json.loads(line[6:])), flush=True)
+
+
+def fake_station(name, host, port, trials, interval, seed):
+    """Publishes a simulated block like show_images does, returns the publish() times (ns)"""
+    rng = random.Random(seed)
+    publisher = Publisher(host, port, name)
+    costs = []
+    publisher.publish("bloque", uid=f"sim{seed}", block=1, task="Cara", trials=trials)
+    dropped = 0
+    for index in range(trials):
+        sleep(interval)
+        face, word = rng.choice(("Happy", "Sad")), rng.choice(("Happy", "Sad"))
+        missed = rng.random() < 0.05
+        answer = "Missed" if missed else (face if rng.random() < 0.9 else ("Sad" if face == "Happy" else "Happy"))
+        dropped += rng.random() < 0.02
+        t0 = perf_counter_ns()
+        publisher.publish("ensayo", block=1, trial=index, face=face, word=word, answer=answer,
+                          correct=None if missed else answer == face,
+                          rt_ms=None if missed else rng.gauss(550, 80) + (40 if face != word else 0), dropped_frames=dropped)
+        costs.append(perf_counter_ns() - t0)
+    publisher.publish("fin", block=1, dropped_frames=dropped)
+    publisher.publish("sesion", status="finalizada")
+    publisher.close()
+    return costs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser("serve", help="servidor de monitoreo")
+    serve.add_argument("--host", default="127.0.0.1",
+                       help="interfaz donde escuchar (0.0.0.0 = toda la red, sin autenticación)")
+    serve.add_argument("--http", type=int, default=http_port, help="puerto HTTP (página, /state, /events)")
+    serve.add_argument("--udp", type=int, default=udp_port, help="puerto UDP donde publican las estaciones")
+    test = commands.add_parser("client", help="cliente de prueba: muestra el flujo /events")
+    test.add_argument("url", nargs="?", default=f"http://127.0.0.1:{http_port}/events")
+    fake = commands.add_parser("fake", help="estaciones simuladas que publican ensayos")
+    fake.add_argument("--host", default="127.0.0.1")
+    fake.add_argument("--udp", type=int, default=udp_port)
+    fake.add_argument("--stations", type=int, default=3)
+    fake.add_argument("--trials", type=int, default=40)
+    fake.add_argument("--interval", type=float, default=0.1, help="segundos entre ensayos")
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        print(f"Monitor en http://{args.host}:{args.http}/ (estaciones -> UDP {args.host}:{args.udp})")
+        try:
+            asyncio.run(MonitorServer(args.host, args.http, args.udp).run())
+        except KeyboardInterrupt:
+            pass
+    elif args.command == "client":
+        try:
+            client(args.url)
+        except KeyboardInterrupt:
+            pass
+    else:
+        results = [None] * args.stations
+        threads = [threading.Thread(target=lambda i=i: results.__setitem__(
+            i, fake_station(f"estacion{i + 1}", args.host, args.udp, args.trials, args.interval, i)))
+            for i in range(args.stations)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        costs = sorted(cost for station in results for cost in station)
+        print(f"{len(costs)} ensayos publicados, publish() p50 {costs[len(costs) // 2] / 1000:.1f} µs, "
+              f"máx {costs[-1] / 1000:.1f} µs")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,340 @@
+# coding=utf-8
+
+"""
+Reproducción offline de una sesión grabada, para revisar qué vio el participante.
+
+A partir del archivo de resultados (orden de los ensayos, palabra y respuesta de cada uno) y
+de la telemetría de cada bloque (instantes de cada fase) se arma la línea de tiempo de la
+sesión: diapositivas, blanco inicial, fijación, cara + palabra e ITI. Cada pantalla se vuelve a
+dibujar sin ventana (driver dummy de SDL) con el mismo código del experimento (draw_paragraph,
+redraw, trial_frame) y se guarda como PNG o como video (opencv), junto con un índice con el
+instante de cada cuadro.
+
+Sin telemetría (sesiones anteriores o bloques reanudados) las duraciones son las nominales:
+fijación, estímulo hasta la respuesta o el fin de la ventana y el ITI medio. Las diapositivas
+esperan una tecla, su duración en la reproducción es slide_ms.
+
+El dibujo se reparte por rangos de ensayos entre procesos; cada proceso abre su propia
+pantalla dummy.
+
+Uso:
+    python replay.py data/<fecha>_<id>.csv                       # PNG en data/replay/<archivo>/
+    python replay.py data/<fecha>_<id>.csv --video --workers 4   # video por rango (requiere opencv)
+    python replay.py data/<fecha>_<id>.csv --annotate --scale 0.5
+"""
+import argparse, contextlib, csv, os, sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from time import perf_counter
+
+import experiment_spec, manifest
+from headless import load_experiment, script_path
+from results import read_session
+from telemetry import read_dump, sidecar_path
+
+replay_folder = script_path/"data"/"replay"
+slide_ms = 3000
+
+index_columns = ("Segmento", "Ensayo", "Bloque", "Fase", "InicioMs", "DuracionMs", "Cuadros", "TiempoNs",
+                 "IdImagen", "Palabra", "Respuesta", "TReaccionMs", "Archivo", "PrimerCuadro")
+frame_columns = ("Archivo", "Cuadro", "TiempoMs", "Segmento")
+
+# Largo del prefijo de fecha en el nombre del archivo (date_name)
+date_length = len("2000-01-01_00-00-00")
+
+
+def subject_settings(data_path, spec):
+    """Participant ({uid, keys, first}) from the data file name <fecha>_<ID>.csv, with the ID format of the spec"""
+    _, subject = experiment_spec.parse_data_file(spec, data_path)
+    if subject is None:
+        subject = {"uid": Path(data_path).stem[date_length + 1:], "keys": next(iter(spec["keys"])),
+                   "first": next(iter(spec["tasks"]))}
+        print(f"Nombre de archivo sin ID de participante reconocible: {Path(data_path).name}, "
+              f"se asume teclas {subject['keys']} y primera tarea {subject['first']}")
+    return subject
+
+
+def block_timing(data_path, block, trials):
+    """{trial: {phase: perf_counter_ns}} of a block plus its (inicio, fin), or None without usable telemetry"""
+    try:
+        records = read_dump(sidecar_path(data_path, block))
+    except (OSError, KeyError, ValueError):
+        return None
+    phases = {}
+    edges = {}
+    for trial, kind, _, t in records:
+        if trial < 0:
+            edges.setdefault(kind, t)
+        else:
+            phases.setdefault(trial, {}).setdefault(kind, t)
+    # Un bloque reanudado reinicia los índices: la telemetría ya no corresponde a las filas
+    if sorted(trial for trial, times in phases.items() if "estimulo" in times) != list(range(trials)):
+        return None
+    return phases, edges
+
+
+def session_timeline(data_path, experiment, fps=60, slide_ms=slide_ms, slides=True):
+    """Every screen of the session in order, each one a dict (see index_columns)"""
+    session = read_session(data_path)
+    spec = experiment.load_spec()
+    subject = subject_settings(data_path, spec)
+    # Los mismos pasos que recorrió el experimento (experiment_spec.compile_plan), con las filas registradas
+    # de cada bloque en lugar de sus ensayos
+    block_lists = {block["number"]: session["blocks"].get(block["number"], []) for block in spec["blocks"]}
+    unknown = sorted(set(session["blocks"]) - set(block_lists))
+    if unknown:
+        print(f"Bloques que no están en la especificación, se omiten: {unknown}")
+    steps = experiment_spec.compile_plan(spec, subject, block_lists, lambda rows, *task: rows, lambda ms: ms,
+                                         experiment.key_code)
+    images = manifest.load_manifest([script_path/"media"/"images"/"Happy", script_path/"media"/"images"/"Sad"])
+    paths = {(folder, experiment.image_id(image)): image for folder, folder_images in images.items()
+             for image in folder_images}
+    iti_ms = sum(experiment.iti_range) / 2
+
+    segments = []
+    clock = 0.0
+
+    def add(phase, draw, duration_ms, block=None, trial=-1, t_ns=None, row=None):
+        nonlocal clock
+        segment = {"Segmento": len(segments), "Ensayo": trial, "Bloque": block, "Fase": phase,
+                   "InicioMs": round(clock, 3), "DuracionMs": round(duration_ms, 3),
+                   "Cuadros": max(1, round(duration_ms * fps / 1000)), "TiempoNs": t_ns, "draw": draw,
+                   "IdImagen": None, "Palabra": None, "Respuesta": None, "TReaccionMs": None}
+        if row is not None:
+            segment.update(IdImagen=row["IdImagen"], Palabra=row["Palabra"], Respuesta=row["Respuesta"],
+                           TReaccionMs=float(row["TReaccionUs"]) / 1000 if row["TReaccionUs"] else None)
+        segments.append(segment)
+        clock += duration_ms
+
+    trial_number = 0
+    for step in steps:
+        if step.kind == "slide":
+            if slides:
+                add("diapositiva", ("slide", step.text, step.key, step.no_foot), slide_ms, step.block)
+            continue
+        if step.kind != "block":
+            continue
+        block, rows = step.block, step.trials
+
+        timing = block_timing(data_path, block, len(rows))
+        phases, edges = timing if timing is not None else ({}, {})
+        first_fixation = phases.get(0, {}).get("fijacion")
+        if "inicio" in edges and first_fixation is not None:
+            add("inicio", ("blank",), (first_fixation - edges["inicio"]) / 1e6, block, t_ns=edges["inicio"])
+        else:
+            add("inicio", ("blank",), experiment.initial_blank_time, block)
+
+        for index, row in enumerate(rows):
+            image = paths.get((row["TipoImagen"], row["IdImagen"]))
+            if image is None:
+                print(f"Imagen no encontrada: {row['TipoImagen']}/{row['IdImagen']}")
+            times = phases.get(index)
+            if times is not None and {"fijacion", "estimulo", "iti"} <= times.keys():
+                following = phases.get(index + 1, {}).get("fijacion", edges.get("fin"))
+                fixation = (times["fijacion"], (times["estimulo"] - times["fijacion"]) / 1e6)
+                stimulus = (times["estimulo"], (times["iti"] - times["estimulo"]) / 1e6)
+                iti = (times["iti"], (following - times["iti"]) / 1e6 if following is not None else iti_ms)
+            else:
+                # La cara y la palabra siguen en pantalla durante la ventana de respuesta, hasta la respuesta
+                window = experiment.answer_time
+                if row["TReaccionUs"] and row["Respuesta"] != "Missed":
+                    window = min(max(float(row["TReaccionUs"]) / 1000 - experiment.stimulus_time, 0), window)
+                fixation = (None, experiment.fixation_time)
+                stimulus = (None, experiment.stimulus_time + window)
+                iti = (None, iti_ms)
+            add("fijacion", ("fixation",), fixation[1], block, trial_number, fixation[0], row)
+            add("estimulo", ("stimulus", image, row["Palabra"]), stimulus[1], block, trial_number, stimulus[0], row)
+            add("iti", ("blank",), iti[1], block, trial_number, iti[0], row)
+            trial_number += 1
+    return segments
+
+
+def split(segments, parts, video=False):
+    """Splits the timeline into contiguous trial ranges of similar rendering cost"""
+    cost = [segment["Cuadros"] if video else 1 for segment in segments]
+    target = sum(cost) / max(1, parts)
+    chunks = [[]]
+    done = 0
+    for segment, segment_cost in zip(segments, cost):
+        # Solo se corta al empezar un ensayo o una diapositiva
+        if chunks[-1] and done >= target * len(chunks) and segment["Fase"] in ("fijacion", "diapositiva"):
+            chunks.append([])
+        chunks[-1].append(segment)
+        done += segment_cost
+    return chunks
+
+
+# Estado de cada proceso de dibujo
+renderer = None
+
+
+def start_renderer(resolution):
+    """Loads the experiment in this process and opens its dummy screen (once per process)"""
+    global renderer
+    if renderer is None:
+        experiment = load_experiment(headless=True, discover=False)
+        experiment.debug_mode = False
+        experiment.use_vsync = False
+        experiment.dirty_rects = False
+        experiment.window_resolution = resolution
+        experiment.init()
+        renderer = experiment
+    return renderer
+
+
+def draw(experiment, segment, annotate=False):
+    """Draws one screen of the timeline on the back buffer with the experiment's own code"""
+    kind = segment["draw"][0]
+    if kind == "slide":
+        _, text, key, no_foot = segment["draw"]
+        experiment.draw_paragraph(text, key=key, no_foot=no_foot)
+    elif kind == "fixation":
+        experiment.redraw([(experiment.fix, experiment.fixbox)])
+    elif kind == "stimulus":
+        _, image, word = segment["draw"]
+        experiment.redraw(experiment.trial_frame(image, word, experiment.base_size, grayscale=True)
+                          if image is not None else [])
+    else:
+        experiment.redraw([])
+
+    if annotate:
+        label = f"Bloque {segment['Bloque']}  Ensayo {segment['Ensayo']}  {segment['Fase']}  {segment['InicioMs']:.0f} ms"
+        if segment["Respuesta"] is not None:
+            rt = segment["TReaccionMs"]
+            label += f"  Respuesta: {segment['Respuesta']}" + (f" ({rt:.0f} ms)" if rt is not None else "")
+        experiment.screen.blit(experiment.text_cache.render(experiment.charnext, label, experiment.Color("red")), (15, 15))
+
+
+def output_surface(experiment, scale):
+    screen = experiment.screen
+    if scale == 1:
+        return screen
+    size = (round(screen.get_width() * scale), round(screen.get_height() * scale))
+    return experiment.pygame.transform.smoothscale(screen, size)
+
+
+def render_chunk(job):
+    """Renders a range of the timeline (run in the worker processes)
+
+    Returns [(segment, file, first frame)] and the seconds spent.
+    """
+    number, segments, settings = job
+    t0 = perf_counter()
+    experiment = start_renderer(settings["resolution"])
+    out = Path(settings["out"])
+
+    # Las caras del rango se cargan una sola vez (las repetidas no se vuelven a leer del disco)
+    stimulus_list = [segment["draw"][1:] for segment in segments if segment["draw"][0] == "stimulus" and segment["draw"][1]]
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        experiment.load_stimuli([stimulus_list], experiment.base_size, grayscale=True)
+
+    written = []
+    if settings["video"]:
+        import cv2, numpy
+        name = f"replay_{number:03d}.mp4"
+        video = None
+        frame_number = 0
+        for segment in segments:
+            draw(experiment, segment, settings["annotate"])
+            surface = output_surface(experiment, settings["scale"])
+            if video is None:
+                video = cv2.VideoWriter(str(out/name), cv2.VideoWriter_fourcc(*"mp4v"), settings["fps"], surface.get_size())
+            frame = numpy.ascontiguousarray(experiment.pygame.surfarray.array3d(surface).swapaxes(0, 1)[:, :, ::-1])
+            for _ in range(segment["Cuadros"]):
+                video.write(frame)
+            written.append((segment["Segmento"], name, frame_number))
+            frame_number += segment["Cuadros"]
+        if video is not None:
+            video.release()
+    else:
+        # Sin anotaciones las pantallas iguales (fijación, blanco, diapositivas) se guardan una vez por proceso
+        saved = {}
+        for segment in segments:
+            key = segment["draw"] if segment["draw"][0] != "stimulus" and not settings["annotate"] else None
+            name = saved.get(repr(key)) if key is not None else None
+            if name is None:
+                draw(experiment, segment, settings["annotate"])
+                name = f"{segment['Segmento']:05d}_{segment['Fase']}.png"
+                experiment.pygame.image.save(output_surface(experiment, settings["scale"]), str(out/name))
+                if key is not None:
+                    saved[repr(key)] = name
+            written.append((segment["Segmento"], name, 0))
+    return written, perf_counter() - t0
+
+
+def replay(data_path, out=None, video=False, fps=60, workers=None, resolution=(1920, 1080), scale=1.0,
+           annotate=False, slide_ms=slide_ms, slides=True):
+    """Renders a recorded session, returns (segments, folder, seconds)"""
+    t0 = perf_counter()
+    if video:
+        try:
+            import cv2
+        except ImportError:
+            raise SystemExit("El video requiere opencv-python (pip install opencv-python), o use PNG sin --video")
+    experiment = load_experiment(headless=True, discover=False)
+    segments = session_timeline(data_path, experiment, fps, slide_ms, slides)
+    out = Path(out) if out is not None else replay_folder/Path(data_path).stem
+    out.mkdir(parents=True, exist_ok=True)
+
+    workers = workers or os.cpu_count() or 1
+    chunks = split(segments, workers if video else 4 * workers, video)
+    settings = {"out": str(out), "video": video, "fps": fps, "resolution": resolution, "scale": scale,
+                "annotate": annotate}
+    jobs = [(number, chunk, settings) for number, chunk in enumerate(chunks)]
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(render_chunk, jobs))
+    else:
+        results = [render_chunk(job) for job in jobs]
+
+    files = {number: (name, first) for written, _ in results for number, name, first in written}
+    with open(out/"frames.csv", "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(index_columns)
+        for segment in segments:
+            name, first = files[segment["Segmento"]]
+            writer.writerow([("" if segment[column] is None else segment[column]) for column in index_columns[:-2]]
+                            + [name, first])
+
+    if video:
+        # Instante de cada cuadro de cada video y lista para unirlos (ffmpeg -f concat -i videos.txt)
+        frame_ms = 1000 / fps
+        with open(out/"video_frames.csv", "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f, lineterminator="\n")
+            writer.writerow(frame_columns)
+            for segment in segments:
+                name, first = files[segment["Segmento"]]
+                for frame in range(segment["Cuadros"]):
+                    writer.writerow([name, first + frame, round(segment["InicioMs"] + frame * frame_ms, 3),
+                                     segment["Segmento"]])
+        with open(out/"videos.txt", "w", encoding="utf-8") as f:
+            f.writelines(f"file 'replay_{number:03d}.mp4'\n" for number in range(len(chunks)))
+
+    return segments, out, perf_counter() - t0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="archivo de resultados de la sesión")
+    parser.add_argument("--out", help="carpeta de salida (por defecto data/replay/<archivo>/)")
+    parser.add_argument("--video", action="store_true", help="escribir video mp4 en lugar de PNG (requiere opencv)")
+    parser.add_argument("--fps", type=float, default=60, help="cuadros por segundo (refresco de la pantalla original)")
+    parser.add_argument("--workers", type=int, default=None, help="procesos en paralelo (1 = sin procesos)")
+    parser.add_argument("--resolution", default="1920x1080", help="resolución de la pantalla original")
+    parser.add_argument("--scale", type=float, default=1.0, help="escala de las imágenes de salida")
+    parser.add_argument("--annotate", action="store_true", help="escribir ensayo, fase y respuesta sobre cada cuadro")
+    parser.add_argument("--slide-ms", type=float, default=slide_ms, help="duración de cada diapositiva en la reproducción")
+    parser.add_argument("--no-slides", action="store_true", help="solo los bloques, sin diapositivas")
+    args = parser.parse_args(argv)
+
+    segments, out, seconds = replay(args.path, args.out, args.video, args.fps, args.workers,
+                                    tuple(int(value) for value in args.resolution.lower().split("x")), args.scale,
+                                    args.annotate, args.slide_ms, not args.no_slides)
+    trials = len({segment["Ensayo"] for segment in segments if segment["Ensayo"] >= 0})
+    frames = sum(segment["Cuadros"] for segment in segments)
+    print(f"{trials} ensayos, {len(segments)} pantallas, {frames} cuadros ({frames / args.fps:.0f} s de sesión) "
+          f"en {seconds:.1f} s -> {out}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,53 @@
+# coding=utf-8
+
+"""
+Captura de respuestas con marca de tiempo de alta resolución.
+
+Las teclas se registran al presionarse (KEYDOWN) con el instante perf_counter_ns en que el
+despachador de eventos (events.py) las recibe, y el tiempo de reacción se
+mide desde el flip que mostró el estímulo. También se guarda el instante en que se suelta la
+tecla, para separar la latencia de la duración de la presión.
+"""
+from pygame.locals import KEYDOWN, KEYUP
+
+
+class ResponseCapture:
+    """Records the first response key press (and its release) after a stimulus onset
+
+    It is used as a listener of the event dispatcher (events.py): it consumes the response
+    key events and lets every other event through.
+    """
+
+    def __init__(self, onset_ns, keys):
+        self.onset_ns = onset_ns
+        self.keys = keys  # tecla -> respuesta, p.ej. {K_v: "Happy", K_n: "Sad"}
+        self.key = None
+        self.answer = None
+        self.press_ns = None
+        self.release_ns = None
+
+    def pressed(self):
+        return self.press_ns is not None
+
+    def released(self):
+        return self.release_ns is not None
+
+    def __call__(self, event, now):
+        """Processes one event, True if it was a response event"""
+        if event.type == KEYDOWN and self.key is None and event.key in self.keys:
+            self.key = event.key
+            self.answer = self.keys[event.key]
+            self.press_ns = now
+            return True
+        if event.type == KEYUP and event.key == self.key and self.release_ns is None:
+            self.release_ns = now
+            return True
+        return False
+
+    def rt_us(self):
+        """Onset-relative reaction time in µs (None if there was no response)"""
+        return None if self.press_ns is None else (self.press_ns - self.onset_ns) // 1000
+
+    def release_us(self):
+        """Onset-relative release time in µs (None if the key was not released yet)"""
+        return None if self.release_ns is None else (self.release_ns - self.onset_ns) // 1000
@@ -0,0 +1,158 @@
+# coding=utf-8
+
+"""
+Escritura de resultados ensayo a ensayo, a prueba de caídas.
+
+Cada fila se encola apenas termina el ensayo y un hilo de fondo la agrega al archivo, con
+fsync periódico, de modo que un cierre con ESC, un error o un corte de luz pierden como mucho
+las últimas filas. read_session() reconstruye una sesión desde un archivo parcial.
+
+Uso:
+    python results.py data/<fecha>_<id>.csv     # resumen de una sesión (parcial o completa)
+"""
+import atexit, csv, os, queue, sys, threading
+from time import monotonic
+
+# TReaccion (ms) se mide, como siempre, desde el inicio de la ventana de respuesta (sin respuesta es
+# el largo de la ventana); TReaccionUs y TSoltarUs (µs) se miden desde el flip del estímulo y quedan
+# vacíos sin respuesta
+columns = ("Sujeto", "IdImagen", "Bloque", "TReaccion", "TipoImagen", "Palabra", "TipoRespuesta", "Respuesta",
+           "Acierto", "TReaccionUs", "TSoltarUs")
+
+
+class ResultWriter:
+    """Appends result rows from a background thread, fsyncing every few rows or seconds"""
+
+    def __init__(self, path, columns=columns, fsync_rows=10, fsync_seconds=2.0):
+        self.path = path
+        self.fsync_rows = fsync_rows
+        self.fsync_seconds = fsync_seconds
+
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, 'a', newline='', encoding='utf-8')
+        self.writer = csv.writer(self.file, lineterminator='\n')
+        if new_file:
+            self.writer.writerow(columns)
+            self.sync()
+
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self.run, name="results", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)  # también al salir con sys.exit() (ESC)
+
+    def write(self, row):
+        """Queues a row (sequence of values, None is written as empty), returns immediately"""
+        self.queue.put(row)
+
+    def sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def run(self):
+        unsynced = 0
+        last_sync = monotonic()
+        while True:
+            try:
+                row = self.queue.get(timeout=self.fsync_seconds)
+            except queue.Empty:
+                row = ()  # solo sincroniza lo pendiente
+            if row is None:
+                self.sync()
+                self.queue.task_done()
+                break
+            if row:
+                self.writer.writerow(["" if value is None else value for value in row])
+                unsynced += 1
+            if unsynced and (unsynced >= self.fsync_rows or monotonic() - last_sync >= self.fsync_seconds):
+                self.sync()
+                unsynced = 0
+                last_sync = monotonic()
+            if row != ():
+                self.queue.task_done()
+
+    def flush(self):
+        """Blocks until every queued row is on disk"""
+        self.queue.join()
+        if not self.file.closed:
+            self.sync()
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.queue.put(None)
+        self.thread.join()
+        self.file.close()
+        atexit.unregister(self.close)
+
+
+def read_session(path):
+    """Rebuilds a session from a (possibly partial) result file
+
+    A last line cut by a crash is discarded. Returns a dict with the columns, the rows (dicts),
+    the rows of each block and the block where the session stopped.
+    """
+    with open(path, newline='', encoding='utf-8') as f:
+        content = f.read()
+
+    lines = content.split('\n')
+    torn = bool(lines[-1])  # la última fila no alcanzó a terminar con salto de línea
+    lines = [line for line in (lines[:-1] if torn else lines) if line]
+    if not lines:
+        return {"columns": list(columns), "rows": [], "blocks": {}, "last_block": None, "torn": torn}
+
+    reader = csv.reader(lines)
+    header = next(reader)
+    rows = []
+    for values in reader:
+        if len(values) != len(header):
+            torn = True
+            continue
+        rows.append(dict(zip(header, values)))
+
+    blocks = {}
+    for row in rows:
+        blocks.setdefault(int(row["Bloque"]), []).append(row)
+
+    return {
+        "columns": header,
+        "rows": rows,
+        "blocks": blocks,
+        "last_block": max(blocks) if blocks else None,
+        "torn": torn,
+    }
+
+
+def remaining_trials(image_list, done_rows, image_id):
+    """Trials of a block that were not answered yet (the block list minus the finished rows)
+
+    image_id(image) must return the same IdImagen written in the file.
+    """
+    done = {}
+    for row in done_rows:
+        pair = (row["IdImagen"], row["Palabra"])
+        done[pair] = done.get(pair, 0) + 1
+
+    remaining = []
+    for image, word in image_list:
+        pair = (image_id(image), word)
+        if done.get(pair):
+            done[pair] -= 1
+        else:
+            remaining.append((image, word))
+    return remaining
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        print(__doc__)
+        return 1
+    for path in argv:
+        session = read_session(path)
+        print(f"{path}: {len(session['rows'])} ensayos" + (" (última línea incompleta descartada)" if session["torn"] else ""))
+        for block, rows in sorted(session["blocks"].items()):
+            print(f"  Bloque {block}: {len(rows)} ensayos")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
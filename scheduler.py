@@ -0,0 +1,188 @@
+# coding=utf-8
+
+"""
+Presentación sincronizada con el refresco de pantalla.
+
+Cada fase (fijación, estímulo, respuesta, ITI) se programa como un número entero de cuadros.
+El inicio de cada fase es un flip cuyo instante se mide con perf_counter_ns, y la fase dura
+hasta el flip que inicia la siguiente.
+"""
+import pygame
+from time import perf_counter_ns, sleep
+
+default_refresh_rate = 60
+
+# Margen en que se deja de dormir y se espera activamente (ns)
+spin_margin = 2_000_000
+
+# Antes de un flip con vsync se deja de esperar eventos este margen (ns)
+flip_margin = 2_000_000
+
+
+def sleep_until(deadline_ns):
+    """Sleeps until perf_counter_ns() >= deadline_ns, spinning only the last couple of ms"""
+    remaining = deadline_ns - perf_counter_ns()
+    if remaining > spin_margin:
+        sleep((remaining - spin_margin) / 1e9)
+    while perf_counter_ns() < deadline_ns:
+        pass
+
+
+def display_refresh_rate():
+    """Refresh rate reported by the display, or the default when unknown"""
+    try:
+        rate = pygame.display.get_current_refresh_rate()  # pygame >= 2.2
+    except (AttributeError, pygame.error):
+        rate = 0
+    return rate if rate > 0 else default_refresh_rate
+
+
+class FrameScheduler:
+    """Presents phases as whole numbers of display refreshes and records every onset"""
+
+    def __init__(self, vsync=False, refresh_rate=None, partial_updates=False):
+        self.vsync = vsync
+        self.partial_updates = partial_updates  # modo de rectángulos sucios: display.update(rects)
+        self.refresh_rate = refresh_rate or display_refresh_rate()
+        self.frame_ns = 1e9 / self.refresh_rate
+        self.frame_count = 0
+        self.dropped_frames = 0
+        self.last_flip_ns = perf_counter_ns()
+        self.next_flip_ns = self.last_flip_ns
+        self.reset()
+
+    def reset(self):
+        """Starts a new run: forgets the recorded phases"""
+        self.phases = []  # [nombre, cuadros pedidos, onset_ns, cuadro del onset, interrumpida]
+        self.end_frame = self.frame_count
+        self.resync()
+
+    def resync(self):
+        """Restarts the frame grid at the next flip, e.g. after a text slide"""
+        self.idle = True
+
+    def frames(self, ms):
+        """Converts a duration in ms to a whole number of frames (at least one)"""
+        return max(1, round(ms * self.refresh_rate / 1000))
+
+    def calibrate(self, frames=60):
+        """Measures the real refresh period by flipping; only meaningful with vsync"""
+        if not self.vsync:
+            return self.refresh_rate
+        start = self.flip()
+        for _ in range(frames):
+            end = self.flip()
+        frame_ns = (end - start) / frames
+        self.resync()
+
+        # Si el flip no bloquea (driver sin vsync real) se sigue con el ritmo nominal
+        if frame_ns < 0.75 * self.frame_ns:
+            self.vsync = False
+            return self.refresh_rate
+        self.frame_ns = frame_ns
+        self.refresh_rate = 1e9 / frame_ns
+        return self.refresh_rate
+
+    def flip(self, rects=None):
+        """Flips the display and returns the timestamp of the flip (ns)
+
+        With vsync the flip blocks until the refresh. Without it, flips are paced to the
+        nominal refresh period so frame counts keep their meaning. In partial update mode
+        only the given rects are pushed (rects=None pushes the whole screen).
+        """
+        if self.idle:
+            # Tras una pausa (p.ej. una diapositiva de texto) se reinicia la grilla de cuadros
+            self.next_flip_ns = perf_counter_ns()
+        if not self.vsync:
+            sleep_until(self.next_flip_ns)
+        if rects is not None and self.partial_updates:
+            pygame.display.update(rects)
+        else:
+            pygame.display.flip()
+        now = perf_counter_ns()
+
+        # Cuadros perdidos: el flip llegó uno o más refrescos tarde
+        missed = 0 if self.idle else int((now - self.last_flip_ns) / self.frame_ns - 0.5)
+        self.idle = False
+        if missed > 0:
+            self.dropped_frames += missed
+            self.frame_count += missed
+
+        self.frame_count += 1
+        self.last_flip_ns = now
+        if self.vsync or now - self.next_flip_ns > self.frame_ns / 2:
+            # Con vsync el flip retornó en el refresco; sin vsync, tras un flip tardío la grilla
+            # sigue desde él (si no, el siguiente flip saldría de inmediato y acortaría la fase)
+            self.next_flip_ns = now + self.frame_ns
+        else:
+            self.next_flip_ns += self.frame_ns
+        return now
+
+    def present(self, phase, frames, rects=None):
+        """Flips the prepared back buffer as the onset of a phase lasting the given frames
+
+        rects are the regions that changed (only used in partial update mode, None = whole screen).
+        """
+        onset = self.flip(rects)
+        self.phases.append([phase, frames, onset, self.frame_count, False])
+        self.end_frame = self.frame_count + frames - 1
+        return onset
+
+    def start(self, phase, frames):
+        """Starts a phase without changing the screen (e.g. response window over the stimulus)
+
+        The unchanged back buffer is flipped again so the phase starts on a refresh too.
+        """
+        return self.present(phase, frames, [])
+
+    def hold(self, events=None, until=None):
+        """Keeps the current phase on screen until its last frame
+
+        Dropped frames count as elapsed, so a late flip does not lengthen the phase.
+        Between flips the time is spent blocked on the event dispatcher (see events.py); if a
+        binding asks to stop or until() becomes true the phase ends early and hold returns True.
+        """
+        while self.frame_count < self.end_frame:
+            if events is not None:
+                deadline = self.next_flip_ns - (flip_margin if self.vsync else 0)
+                if events.wait_until(deadline, until):
+                    return self.interrupt()
+            self.flip([])
+        return False
+
+    def interrupt(self):
+        """Ends the current phase early"""
+        self.phases[-1][4] = True
+        self.end_frame = self.frame_count
+        return True
+
+    def durations(self):
+        """Yields (phase, requested ms, achieved ms, interrupted) for every finished phase"""
+        for current, following in zip(self.phases, self.phases[1:]):
+            phase, frames, onset, _, interrupted = current
+            yield phase, frames * self.frame_ns / 1e6, (following[2] - onset) / 1e6, interrupted
+
+    def report(self):
+        """Summary of achieved vs requested durations per phase"""
+        summary = {}
+        for phase, requested, achieved, interrupted in self.durations():
+            stats = summary.setdefault(phase, {"n": 0, "interrupted": 0, "requested": [], "achieved": []})
+            stats["n"] += 1
+            if interrupted:
+                stats["interrupted"] += 1
+                continue
+            stats["requested"].append(requested)
+            stats["achieved"].append(achieved)
+
+        lines = [f"Duraciones por fase ({self.refresh_rate:.2f} Hz, {'vsync' if self.vsync else 'sin vsync'}, "
+                 f"{self.dropped_frames} cuadros perdidos):"]
+        for phase, stats in summary.items():
+            if not stats["achieved"]:
+                lines.append(f"  {phase}: {stats['n']} fases, todas interrumpidas")
+                continue
+            errors = [a - r for r, a in zip(stats["requested"], stats["achieved"])]
+            lines.append(f"  {phase}: n={stats['n']} pedida={sum(stats['requested']) / len(errors):.1f} ms "
+                         f"lograda={sum(stats['achieved']) / len(errors):.1f} ms "
+                         f"error medio={sum(errors) / len(errors):+.2f} ms máx={max(errors, key=abs):+.2f} ms"
+                         + (f" ({stats['interrupted']} interrumpidas)" if stats["interrupted"] else ""))
+        return "\n".join(lines)
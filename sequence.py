@@ -0,0 +1,210 @@
+# coding=utf-8
+
+"""
+Secuencias de ensayos con semilla y restricciones.
+
+Cada bloque cruza cara x palabra: cada cara feliz se presenta con la palabra Feliz y con la
+palabra Triste, y lo mismo cada cara triste, de modo que las cuatro condiciones (HH, HS, SS,
+SH) tienen el mismo número de ensayos y cada imagen aparece con ambas palabras. El orden se
+elige entre miles de permutaciones candidatas (generadas y evaluadas por lotes con numpy)
+según estas restricciones:
+
+- a lo sumo max_run ensayos seguidos congruentes o incongruentes, y de la misma condición,
+- la misma imagen nunca en dos ensayos seguidos,
+- transiciones entre condiciones lo más parejas posible.
+
+El plan (semilla, restricciones y orden de cada bloque) se guarda en data/plans/<id>_<semilla>.json
+para poder reproducir o reanudar la sesión.
+
+Uso:
+    python sequence.py --uid 4321 --seed 7           # genera y guarda un plan
+    python sequence.py --benchmark                   # candidatos evaluados por segundo
+"""
+import argparse, json, os, random, sys
+from pathlib import Path
+from time import perf_counter
+
+import numpy as np
+
+import manifest
+
+script_path = Path(__file__).parent.resolve()
+
+plans_folder = script_path/"data"/"plans"
+
+# (cara, palabra) de cada condición, en el orden de sus códigos
+conditions = (("Happy", "Happy"), ("Happy", "Sad"), ("Sad", "Sad"), ("Sad", "Happy"))
+condition_codes = {condition: code for code, condition in enumerate(conditions)}
+
+# Penalización de cada violación de una restricción dura frente al desbalance de transiciones
+hard_penalty = 1000
+
+
+def face_type(image):
+    """Happy/Sad: folder that contains the image"""
+    return Path(image).parent.name
+
+
+def build_trials(happy_images, sad_images, faces=60):
+    """Face x word crossing: the first faces of each pool, each one with both words"""
+    return [(image, word) for images in (happy_images[:faces], sad_images[:faces])
+            for word in ("Happy", "Sad") for image in images]
+
+
+def window_all(flags, length):
+    """Per row, how many windows of the given length are all True"""
+    if flags.shape[1] < length:
+        return np.zeros(len(flags), dtype=np.int64)
+    sums = np.cumsum(flags, axis=1, dtype=np.int32)
+    sums = np.pad(sums, ((0, 0), (1, 0)))
+    return ((sums[:, length:] - sums[:, :-length]) == length).sum(axis=1)
+
+
+def score(orders, codes, images, max_run):
+    """Cost of every candidate order (rows of trial indexes), lower is better
+
+    Returns (cost, hard violations, transition imbalance) arrays, one value per row.
+    """
+    condition = codes[orders]
+    congruent = condition % 2 == 0  # HH y SS
+    same_congruency = congruent[:, 1:] == congruent[:, :-1]
+    same_condition = condition[:, 1:] == condition[:, :-1]
+
+    # Una racha de más de max_run ensayos = max_run pares seguidos iguales
+    violations = window_all(same_congruency, max_run) + window_all(same_condition, max_run)
+    image = images[orders]
+    violations += (image[:, 1:] == image[:, :-1]).sum(axis=1)
+
+    rows, columns = orders.shape
+    transitions = condition[:, :-1] * len(conditions) + condition[:, 1:]
+    offsets = np.arange(rows)[:, None] * len(conditions) ** 2
+    counts = np.bincount((transitions + offsets).ravel(), minlength=rows * len(conditions) ** 2)
+    counts = counts.reshape(rows, len(conditions) ** 2)
+    imbalance = np.abs(counts - (columns - 1) / len(conditions) ** 2).sum(axis=1)
+
+    return hard_penalty * violations + imbalance, violations, imbalance
+
+
+def best_order(trials, rng, max_run=3, candidates=5000, batch=500):
+    """Searches candidate orders of the trials and returns (ordered trials, stats of the best)
+
+    Half of the candidates are random permutations; the other half are the best order so far
+    with two trials swapped (one swap per candidate), which removes the few violations left.
+    """
+    codes = np.array([condition_codes[face_type(image), word] for image, word in trials])
+    _, images = np.unique([str(image) for image, _ in trials], return_inverse=True)
+
+    size = len(trials)
+    base = np.broadcast_to(np.arange(size), (batch, size))
+    swaps = max(1, batch // 10)  # lotes chicos: más pasos de mejora por candidato evaluado
+    rows = np.arange(swaps)
+    best = None
+    t0 = perf_counter()
+    evaluated = 0
+    while evaluated < candidates:
+        if evaluated < candidates // 2 or best is None:
+            orders = rng.permuted(base, axis=1)
+        else:
+            orders = np.tile(best[1], (swaps, 1))
+            first, second = rng.integers(size, size=(2, swaps))
+            orders[rows, first], orders[rows, second] = orders[rows, second], orders[rows, first]
+        cost, violations, imbalance = score(orders, codes, images, max_run)
+        index = int(np.argmin(cost))
+        if best is None or cost[index] < best[0]:
+            best = (float(cost[index]), orders[index].copy(), int(violations[index]), float(imbalance[index]))
+        evaluated += len(orders)
+        if best[0] == 0:
+            break
+    elapsed = perf_counter() - t0
+
+    _, order, violations, imbalance = best
+    stats = {"candidates": evaluated, "seconds": elapsed, "violations": violations, "imbalance": imbalance}
+    return [trials[i] for i in order], stats
+
+
+def new_seed():
+    return random.SystemRandom().randrange(2 ** 32)
+
+
+def make_plan(happy_images, sad_images, uid=None, seed=None, blocks=2, faces=60, max_run=3, candidates=5000):
+    """Builds the ordered trial list of every block from a seed (a random one if None)"""
+    seed = new_seed() if seed is None else seed
+    rng = np.random.default_rng(seed)
+    # Qué caras entran al bloque también depende de la semilla
+    happy_images = [happy_images[i] for i in rng.permutation(len(happy_images))]
+    sad_images = [sad_images[i] for i in rng.permutation(len(sad_images))]
+    trials = build_trials(happy_images, sad_images, faces)
+    plan = {"uid": uid, "seed": seed, "faces": faces, "max_run": max_run, "candidates": candidates, "blocks": []}
+    for _ in range(blocks):
+        order, stats = best_order(trials, rng, max_run, candidates)
+        plan["blocks"].append({"trials": order, "stats": stats})
+    return plan
+
+
+def plan_path(uid, seed, folder=plans_folder):
+    return Path(folder)/f"{uid}_{seed}.json"
+
+
+def relative(image):
+    image = Path(image)
+    return image.relative_to(script_path).as_posix() if image.is_absolute() else image.as_posix()
+
+
+def save_plan(plan, folder=plans_folder):
+    os.makedirs(folder, exist_ok=True)
+    path = plan_path(plan["uid"], plan["seed"], folder)
+    content = {**plan, "blocks": [{**block, "trials": [[relative(image), word] for image, word in block["trials"]]}
+                                  for block in plan["blocks"]]}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(content, f, indent=1)
+    return path
+
+
+def load_plan(path):
+    """Reads a saved plan, with the image paths resolved against the experiment folder"""
+    with open(path, encoding="utf-8") as f:
+        plan = json.load(f)
+    for block in plan["blocks"]:
+        block["trials"] = [(script_path/image, word) for image, word in block["trials"]]
+    return plan
+
+
+def latest_plan(uid, folder=plans_folder):
+    """Path of the most recent plan saved for a participant, None if there is none"""
+    paths = sorted(Path(folder).glob(f"{uid}_*.json"), key=lambda path: path.stat().st_mtime_ns)
+    return paths[-1] if paths else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uid", default="prueba", help="ID del participante")
+    parser.add_argument("--seed", type=int, default=None, help="semilla (por defecto una al azar)")
+    parser.add_argument("--faces", type=int, default=60, help="caras de cada tipo por bloque")
+    parser.add_argument("--max-run", type=int, default=3, help="largo máximo de las rachas")
+    parser.add_argument("--candidates", type=int, default=5000, help="órdenes evaluados por bloque")
+    parser.add_argument("--benchmark", action="store_true", help="solo medir candidatos por segundo")
+    args = parser.parse_args(argv)
+
+    folders = [script_path/"media"/"images"/"Happy", script_path/"media"/"images"/"Sad"]
+    images = manifest.load_manifest(folders)
+    happy_images, sad_images = images["Happy"], images["Sad"]
+
+    if args.benchmark:
+        trials = build_trials(happy_images, sad_images, args.faces)
+        _, stats = best_order(trials, np.random.default_rng(args.seed), args.max_run, args.candidates)
+        print(f"{len(trials)} ensayos: {stats['candidates']} candidatos en {stats['seconds']:.3f} s "
+              f"({stats['candidates'] / stats['seconds']:.0f}/s)")
+        return
+
+    plan = make_plan(happy_images, sad_images, args.uid, args.seed, faces=args.faces, max_run=args.max_run,
+                     candidates=args.candidates)
+    path = save_plan(plan)
+    for number, block in enumerate(plan["blocks"], 1):
+        stats = block["stats"]
+        print(f"Bloque {number}: {len(block['trials'])} ensayos, {stats['violations']} violaciones, "
+              f"desbalance de transiciones {stats['imbalance']:.1f} ({stats['candidates']} candidatos)")
+    print(f"Plan guardado en {path}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
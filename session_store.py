@@ -0,0 +1,269 @@
+# coding=utf-8
+
+"""
+Base de datos SQLite con todas las sesiones (data/sessions.sqlite).
+
+Cada archivo de resultados terminado se carga una vez, con sus ensayos y los triggers de sus
+volcados de telemetría, en tablas indexadas por sujeto, bloque, imagen y condición. Los
+archivos se identifican por su hash: los que ya están cargados se saltan, y un archivo que
+cambió (una sesión reanudada) reemplaza su versión anterior. Las consultas entre sesiones
+("TR medio por imagen de todos los sujetos") ya no necesitan volver a leer los CSV.
+
+Uso:
+    python session_store.py ingest                   # carga los archivos nuevos de data/
+    python session_store.py images                   # TR medio y precisión por imagen
+    python session_store.py codes                    # TR medio y precisión por código de cara (codebook)
+    python session_store.py conditions               # TR medio y precisión por condición y sujeto
+    python session_store.py sql "SELECT COUNT(*) FROM trials"
+"""
+import argparse, hashlib, sqlite3, sys
+from pathlib import Path
+from time import gmtime, perf_counter, strftime
+
+import experiment_spec
+from results import read_session
+from telemetry import read_dump, sidecar_path
+
+script_path = Path(__file__).parent.resolve()
+
+database_file = script_path/"data"/"sessions.sqlite"
+
+
+schema = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    file TEXT NOT NULL UNIQUE,
+    sha1 TEXT NOT NULL,
+    date TEXT,
+    subject TEXT,
+    happy_key TEXT,
+    first_block TEXT,
+    trials INTEGER,
+    torn INTEGER,
+    ingested TEXT
+);
+CREATE TABLE IF NOT EXISTS trials (
+    session_id INTEGER NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+    trial INTEGER,
+    subject TEXT,
+    block INTEGER,
+    image_id TEXT,
+    face TEXT,
+    word TEXT,
+    condition TEXT,
+    congruent INTEGER,
+    task TEXT,
+    answer TEXT,
+    correct INTEGER,
+    rt_ms REAL,
+    rt_us INTEGER,
+    release_us INTEGER
+);
+CREATE TABLE IF NOT EXISTS triggers (
+    session_id INTEGER NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+    block INTEGER,
+    trial INTEGER,
+    event TEXT,
+    code INTEGER,
+    t_ns INTEGER
+);
+CREATE TABLE IF NOT EXISTS stimuli (
+    image_id TEXT PRIMARY KEY,
+    emotion TEXT,
+    code TEXT,
+    expression TEXT,
+    width INTEGER,
+    height INTEGER,
+    sha1 TEXT
+);
+CREATE INDEX IF NOT EXISTS trials_subject ON trials(subject);
+CREATE INDEX IF NOT EXISTS trials_block ON trials(block);
+CREATE INDEX IF NOT EXISTS trials_image ON trials(image_id);
+CREATE INDEX IF NOT EXISTS trials_condition ON trials(condition);
+CREATE INDEX IF NOT EXISTS trials_session ON trials(session_id);
+CREATE INDEX IF NOT EXISTS triggers_session ON triggers(session_id, block);
+"""
+
+
+def file_hash(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def number(value, kind=float):
+    return kind(value) if value not in ("", None) else None
+
+
+def trial_rows(session_id, rows):
+    """Values of the trials table for the rows of a result file"""
+    for index, row in enumerate(rows):
+        face, word = row["TipoImagen"], row["Palabra"]
+        rt_us = number(row.get("TReaccionUs"), int)
+        yield (session_id, index, row["Sujeto"], int(row["Bloque"]), row["IdImagen"], face, word,
+               face[0] + word[0], int(face == word), row["TipoRespuesta"], row["Respuesta"],
+               number(row["Acierto"], int), rt_us / 1000 if rt_us is not None else number(row["TReaccion"]),
+               rt_us, number(row.get("TSoltarUs"), int))
+
+
+class SessionStore:
+    """SQLite store of every ingested session, with a few ready-made cross-session queries"""
+
+    def __init__(self, path=database_file, spec=None):
+        self.path = path
+        self.spec = spec  # experiment_spec: formato del ID en los nombres de archivo (por defecto experiment.json)
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.executescript(schema)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def ingest(self, paths, batch=50):
+        """Loads the result files not ingested yet, committing every batch files
+
+        Returns (ingested, skipped) counts. A file whose content changed replaces its old rows.
+        """
+        known = dict(self.connection.execute("SELECT file, sha1 FROM sessions"))
+        ingested = skipped = 0
+        pending = 0
+        for path in paths:
+            path = Path(path)
+            sha1 = file_hash(path)
+            if known.get(path.name) == sha1:
+                skipped += 1
+                continue
+            self.connection.execute("DELETE FROM sessions WHERE file = ?", (path.name,))
+            self.add_session(path, sha1)
+            ingested += 1
+            pending += 1
+            if pending >= batch:
+                self.connection.commit()
+                pending = 0
+        self.connection.commit()
+        return ingested, skipped
+
+    def add_session(self, path, sha1):
+        session = read_session(path)
+        rows = session["rows"]
+        if self.spec is None:
+            self.spec = experiment_spec.load()
+        # <fecha>_<ID>.csv, con el ID según subject.pattern de la especificación
+        date, subject = experiment_spec.parse_data_file(self.spec, path)
+        fields = {"date": date, **(subject or {"uid": rows[0]["Sujeto"] if rows else None, "keys": None, "first": None})}
+        cursor = self.connection.execute(
+            "INSERT INTO sessions (file, sha1, date, subject, happy_key, first_block, trials, torn, ingested) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (path.name, sha1, fields["date"], fields["uid"], fields["keys"], fields["first"], len(rows),
+             int(session["torn"]), strftime("%Y-%m-%d_%H-%M-%S", gmtime())))
+        session_id = cursor.lastrowid
+        self.connection.executemany("INSERT INTO trials VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                    trial_rows(session_id, rows))
+
+        for block in session["blocks"]:
+            dump = sidecar_path(path, block)
+            if dump.exists():
+                self.connection.executemany(
+                    "INSERT INTO triggers VALUES (?, ?, ?, ?, ?, ?)",
+                    ((session_id, block, trial, event, code, t) for trial, event, code, t in read_dump(dump)
+                     if event.startswith("trigger")))
+        return session_id
+
+    def load_catalog(self, stimuli):
+        """Replaces the stimuli table with the stimulus catalog (catalog.py)"""
+        table = stimuli.table
+        with self.connection:
+            self.connection.execute("DELETE FROM stimuli")
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO stimuli VALUES (?, ?, ?, ?, ?, ?, ?)",
+                zip(table["id"], table["emotion"], table["code"], table["expression"], table["width"],
+                    table["height"], table["sha1"]))
+
+    def query(self, sql, parameters=()):
+        """Runs a query, returns (column names, rows)"""
+        cursor = self.connection.execute(sql, parameters)
+        return [column[0] for column in cursor.description or ()], cursor.fetchall()
+
+    def mean_rt_per_image(self, block=None):
+        """Mean RT of correct answers and accuracy per image, across every subject"""
+        return self.query(
+            "SELECT image_id, face, COUNT(DISTINCT subject) AS subjects, COUNT(*) AS n, "
+            "AVG(CASE WHEN correct = 1 THEN rt_ms END) AS rt_ms, AVG(correct) AS accuracy "
+            "FROM trials WHERE answer != 'Missed' AND (? IS NULL OR block = ?) "
+            "GROUP BY image_id, face ORDER BY image_id", (block, block))
+
+    def mean_rt_per_code(self, block=None):
+        """Mean RT of correct answers and accuracy per face code of the codebook, per task"""
+        return self.query(
+            "SELECT t.task, s.code, s.expression, COUNT(DISTINCT t.image_id) AS images, COUNT(*) AS n, "
+            "AVG(CASE WHEN t.correct = 1 THEN t.rt_ms END) AS rt_ms, AVG(t.correct) AS accuracy "
+            "FROM trials t LEFT JOIN stimuli s ON s.image_id = t.image_id "
+            "WHERE t.answer != 'Missed' AND (? IS NULL OR t.block = ?) "
+            "GROUP BY t.task, s.code ORDER BY t.task, s.code", (block, block))
+
+    def mean_rt_per_condition(self, subject=None):
+        """Mean RT of correct answers and accuracy per subject, task and condition"""
+        return self.query(
+            "SELECT subject, task, condition, COUNT(*) AS n, "
+            "AVG(CASE WHEN correct = 1 THEN rt_ms END) AS rt_ms, AVG(correct) AS accuracy, "
+            "AVG(answer = 'Missed') AS missed "
+            "FROM trials WHERE (? IS NULL OR subject = ?) "
+            "GROUP BY subject, task, condition ORDER BY subject, task, condition", (subject, subject))
+
+    def sessions(self, subject=None):
+        return self.query("SELECT * FROM sessions WHERE (? IS NULL OR subject = ?) ORDER BY date",
+                          (subject, subject))
+
+
+def print_table(columns, rows):
+    print("\t".join(columns))
+    for row in rows:
+        print("\t".join("" if value is None else f"{value:.3f}" if isinstance(value, float) else str(value)
+                        for value in row))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["ingest", "images", "codes", "conditions", "sessions", "sql"])
+    parser.add_argument("arguments", nargs="*", help="archivos a cargar (ingest) o consulta (sql)")
+    parser.add_argument("--db", default=database_file, help="base de datos")
+    parser.add_argument("--subject", help="filtrar por sujeto (conditions, sessions)")
+    parser.add_argument("--block", type=int, help="filtrar por bloque (images, codes)")
+    args = parser.parse_args(argv)
+
+    with SessionStore(args.db) as store:
+        if args.command == "ingest":
+            from analysis import session_files
+            paths = [Path(path) for path in args.arguments] or session_files()
+            t0 = perf_counter()
+            ingested, skipped = store.ingest(paths)
+            print(f"{ingested} sesiones cargadas, {skipped} ya estaban ({perf_counter() - t0:.2f} s)")
+            try:
+                import catalog
+                store.load_catalog(catalog.load_catalog())
+            except OSError as e:
+                print(f"Sin catálogo de estímulos: {e}")
+        elif args.command == "codes":
+            print_table(*store.mean_rt_per_code(args.block))
+        elif args.command == "images":
+            print_table(*store.mean_rt_per_image(args.block))
+        elif args.command == "conditions":
+            print_table(*store.mean_rt_per_condition(args.subject))
+        elif args.command == "sessions":
+            print_table(*store.sessions(args.subject))
+        else:
+            print_table(*store.query(" ".join(args.arguments)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
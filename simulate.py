@@ -0,0 +1,309 @@
+# coding=utf-8
+
+"""
+Simulación Monte Carlo de sesiones con participantes sintéticos, para evaluar cambios de diseño.
+
+Antes de cambiar el número de caras por bloque, el ITI o la ventana de respuesta se puede ver
+su efecto en la duración de la sesión y en la potencia para detectar la interferencia Stroop.
+Cada lote de sesiones usa el código real del experimento:
+
+- el orden de los ensayos sale de sequence.make_plan (con sus restricciones) y los registros
+  de trials.prepare_block, que definen la respuesta esperada (igual que trials.score) con la
+  tarea de cada bloque según experiment.json y la tarea del primer bloque (--first),
+- las duraciones se cuantizan a cuadros como FrameScheduler.frames,
+- la interferencia de cada sesión se estima con el recorte de analysis.trim (mismos
+  parámetros que analysis.py).
+
+Los valores por defecto del diseño se leen de "home version.py" y de experiment.json. Las imágenes son identidades
+sintéticas (no se lee media/), así que se puede simular cualquier número de caras.
+
+Participante sintético: TR ex-gaussiano (mu + sigma normal + tau exponencial) medido desde el
+inicio del estímulo, con un nivel propio por sujeto (subject_sd) y un efecto de interferencia
+propio (interference ± interference_sd) en los ensayos incongruentes; precisión menor en los
+incongruentes y lapsos sin respuesta. Un TR más largo que estímulo + ventana es una omisión.
+
+Cada proceso simula un lote de sesiones sobre un plan propio, vectorizado con numpy (sesiones x
+ensayos). El participante responde por la etiqueta (Happy/Sad), así que la asignación de teclas
+no cambia la simulación. La potencia se calcula agrupando las sesiones en estudios de N
+participantes, con una prueba t de una muestra (bilateral) de la interferencia de cada bloque.
+
+Uso:
+    python simulate.py --sessions 100000
+    python simulate.py --faces 40 --iti 800 1000 --answer-time 1500 --participants 20 30 40
+    python simulate.py --sessions 20000 --interference 20 --out sesiones.csv --json resumen.json
+"""
+import argparse, csv, json, sys
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+from time import perf_counter
+
+import numpy as np
+
+import analysis, experiment_spec, sequence
+from headless import load_experiment, script_path
+from scheduler import FrameScheduler
+from trials import prepare_block
+
+responder_defaults = {
+    "mu": 550.0,  # ms, parte normal del TR
+    "sigma": 60.0,
+    "tau": 120.0,  # ms, parte exponencial
+    "subject_sd": 80.0,  # variación del TR medio entre sujetos
+    "interference": 30.0,  # ms extra en los ensayos incongruentes
+    "interference_sd": 20.0,  # variación del efecto entre sujetos
+    "accuracy": 0.95,
+    "accuracy_interference": 0.03,  # precisión menor en los incongruentes
+    "lapse_rate": 0.02,  # ensayos sin respuesta
+}
+
+summary_columns = ("Sesion", "Plan", "DuracionS")
+block_columns = ("Omisiones", "Precision", "Interferencia", "InterferenciaPrecision")
+
+
+def design_defaults(experiment):
+    """Design parameters as they are set in the experiment script"""
+    return {
+        "faces": experiment.faces_per_block,
+        "blocks": len(experiment.spec["blocks"]),  # bloques de experiment.json
+        "first": next(iter(experiment.spec["tasks"])),  # tarea del primer bloque (C/P)
+        "max_run": experiment.max_run,
+        "candidates": experiment.sequence_candidates,
+        "initial_blank_time": experiment.initial_blank_time,
+        "fixation_time": experiment.fixation_time,
+        "stimulus_time": experiment.stimulus_time,
+        "answer_time": experiment.answer_time,
+        "iti_range": list(experiment.iti_range),
+        "refresh_rate": 60.0,
+    }
+
+
+def synthetic_pools(faces):
+    """Image identities for the sequence generator (same folder layout as media/images)"""
+    folder = script_path/"media"/"images"
+    return ([str(folder/"Happy"/f"{i:03d}_sim.jpg") for i in range(faces)],
+            [str(folder/"Sad"/f"{i:03d}_sim.jpg") for i in range(faces)])
+
+
+def plan_layout(design, seed):
+    """Trial arrays of a generated plan: block, face/word/expected answer (True = Happy), tasks"""
+    experiment = load_experiment(headless=True, discover=False)
+    spec = experiment.spec
+    happy, sad = synthetic_pools(design["faces"])
+    plan = sequence.make_plan(happy, sad, seed=seed, blocks=design["blocks"], faces=design["faces"],
+                              max_run=design["max_run"], candidates=design["candidates"])
+    block, face, word, expected, tasks = [], [], [], [], []
+    for index, (number, plan_block) in enumerate(zip((entry["number"] for entry in spec["blocks"]), plan["blocks"])):
+        task = spec["tasks"][experiment_spec.block_task(spec, number, design["first"])]
+        trials = prepare_block(plan_block["trials"], number, experiment.trigger_helper, experiment.image_id,
+                               experiment.image_type, task=task["name"], answer=task["answer"])
+        tasks.append(task["name"])
+        for trial in trials:
+            block.append(index)
+            face.append(trial.image_type == "Happy")
+            word.append(trial.word == "Happy")
+            expected.append(trial.expected == "Happy")
+    violations = sum(plan_block["stats"]["violations"] for plan_block in plan["blocks"])
+    return {"block": np.array(block), "face": np.array(face), "word": np.array(word),
+            "expected": np.array(expected), "tasks": tasks, "violations": violations}
+
+
+def simulate_batch(job):
+    """Simulates sessions of synthetic participants over one generated plan (run in the worker processes)"""
+    number, seed, sessions, design, responder, settings = job
+    layout = plan_layout(design, seed)
+    rng = np.random.default_rng(seed)
+    blocks = len(layout["tasks"])
+    trials = len(layout["block"])
+    incongruent = layout["face"] != layout["word"]
+
+    # Duraciones en cuadros, como FrameScheduler.frames
+    scheduler = FrameScheduler(refresh_rate=design["refresh_rate"])
+    frame_ms = 1000 / scheduler.refresh_rate
+    blank_frames = scheduler.frames(design["initial_blank_time"])
+    fixation_frames = scheduler.frames(design["fixation_time"])
+    stimulus_frames = scheduler.frames(design["stimulus_time"])
+    answer_frames = scheduler.frames(design["answer_time"])
+    low, high = design["iti_range"]
+    iti_table = np.array([scheduler.frames(ms) for ms in range(low, high + 1)])  # randint incluye ambos extremos
+
+    # Participantes: nivel y efecto propios, TR ex-gaussiano desde el inicio del estímulo
+    level = rng.normal(responder["mu"], responder["subject_sd"], (sessions, 1))
+    effect = rng.normal(responder["interference"], responder["interference_sd"], (sessions, 1))
+    rt = (level + incongruent * effect + rng.normal(0, responder["sigma"], (sessions, trials))
+          + rng.exponential(responder["tau"], (sessions, trials)))
+    right = rng.random((sessions, trials)) < responder["accuracy"] - incongruent * responder["accuracy_interference"]
+    selected = np.where(right, layout["expected"], ~layout["expected"])
+    missed = (rng.random((sessions, trials)) < responder["lapse_rate"]) | (rt > (stimulus_frames + answer_frames) * frame_ms)
+    # Mismo criterio que trials.score: una omisión no es acierto ni error
+    correct = ~missed & (selected == layout["expected"])
+
+    # Duración: la ventana de respuesta termina en el cuadro siguiente a la respuesta
+    window = np.clip(np.ceil((rt - stimulus_frames * frame_ms) / frame_ms), 1, answer_frames)
+    window = np.where(missed, answer_frames, window)
+    iti = iti_table[rng.integers(len(iti_table), size=(sessions, trials))]
+    duration = (blocks * blank_frames + trials * (fixation_frames + stimulus_frames) + window.sum(axis=1)
+                + iti.sum(axis=1)) * frame_ms / 1000
+
+    # Interferencia por sesión y bloque con el recorte de analysis.py (grupos sesión x bloque x congruencia)
+    size = sessions * blocks * 2
+    groups = ((np.arange(sessions)[:, None] * blocks + layout["block"]) * 2 + ~incongruent).ravel()
+    valid = correct.ravel()
+    keep = analysis.trim(np.where(valid, rt.ravel(), np.nan), groups, settings["min_rt"], settings["max_rt"],
+                         settings["trim_sd"])
+
+    def per_group(mask, weights=None):
+        counts = np.bincount(groups, weights=mask if weights is None else np.where(mask, weights, 0), minlength=size)
+        return counts.reshape(sessions, blocks, 2)
+
+    answered = per_group(~missed.ravel())
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_rt = per_group(keep, rt.ravel()) / per_group(keep)
+        accuracy = per_group(correct.ravel()) / answered
+        totals = answered.sum(axis=2)
+        result = {
+            "plan": np.full(sessions, number),
+            "duration": duration,
+            "Omisiones": 1 - totals / (trials / blocks),
+            "Precision": per_group(correct.ravel()).sum(axis=2) / totals,
+            "Interferencia": mean_rt[:, :, 0] - mean_rt[:, :, 1],
+            "InterferenciaPrecision": accuracy[:, :, 1] - accuracy[:, :, 0],
+        }
+    return result, layout["tasks"], layout["violations"]
+
+
+def t_critical(alpha, df):
+    """Two-sided critical t (Cornish-Fisher expansion of the normal quantile, no scipy)"""
+    z = NormalDist().inv_cdf(1 - alpha / 2)
+    return (z + (z ** 3 + z) / (4 * df) + (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * df ** 2)
+            + (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / (384 * df ** 3)
+            + (79 * z ** 9 + 776 * z ** 7 + 1482 * z ** 5 - 1920 * z ** 3 - 945 * z) / (92160 * df ** 4))
+
+
+def power(effects, participants, alpha=0.05):
+    """Share of simulated studies of n participants whose interference differs significantly from 0 (two-sided)"""
+    effects = effects[~np.isnan(effects)]
+    studies = len(effects) // participants
+    if studies == 0 or participants < 2:
+        return None
+    samples = effects[:studies * participants].reshape(studies, participants)
+    t = samples.mean(axis=1) / (samples.std(axis=1, ddof=1) / np.sqrt(participants))
+    return float(np.mean(np.abs(t) > t_critical(alpha, participants - 1)))
+
+
+def distribution(values):
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return None
+    low, median, high = np.percentile(values, [2.5, 50, 97.5])
+    return {"media": float(values.mean()), "de": float(values.std()), "p2.5": float(low), "p50": float(median),
+            "p97.5": float(high)}
+
+
+def simulate(sessions=10000, design=None, responder=None, settings=analysis.defaults, participants=(20, 30, 40),
+             workers=None, sessions_per_plan=250, seed=None, alpha=0.05):
+    """Runs the simulation, returns (per-session arrays, summary); design defaults to the experiment's own"""
+    if design is None:
+        design = design_defaults(load_experiment(headless=True, discover=False))
+    responder = {**responder_defaults, **(responder or {})}
+    settings = {**analysis.defaults, **settings}
+    master = np.random.default_rng(seed)
+    sizes = [min(sessions_per_plan, sessions - start) for start in range(0, sessions, sessions_per_plan)]
+    seeds = master.integers(2 ** 32, size=len(sizes))
+    jobs = [(number, int(job_seed), size, design, responder, settings)
+            for number, (job_seed, size) in enumerate(zip(seeds, sizes))]
+
+    t0 = perf_counter()
+    if workers != 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(simulate_batch, jobs))
+    else:
+        results = [simulate_batch(job) for job in jobs]
+    elapsed = perf_counter() - t0
+
+    tasks = results[0][1]
+    data = {key: np.concatenate([result[key] for result, _, _ in results]) for key in results[0][0]}
+    summary = {
+        "sesiones": sessions,
+        "planes": len(jobs),
+        "segundos": elapsed,
+        "violaciones_planes": int(sum(violations for _, _, violations in results)),
+        "diseno": design,
+        "participante": responder,
+        "analisis": settings,
+        "duracion_min": distribution(data["duration"] / 60),
+        "bloques": [],
+    }
+    for index, task in enumerate(tasks):
+        summary["bloques"].append({
+            "bloque": index + 1,
+            "tarea": task,
+            **{column: distribution(data[column][:, index]) for column in block_columns},
+            "potencia": {str(n): power(data["Interferencia"][:, index], n, alpha) for n in participants},
+        })
+    return data, summary
+
+
+def write_sessions(path, data, blocks):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(summary_columns + tuple(f"{column}B{block + 1}" for block in range(blocks)
+                                                for column in block_columns))
+        for session in range(len(data["duration"])):
+            writer.writerow([session, int(data["plan"][session]), round(float(data["duration"][session]), 3)]
+                            + ["" if np.isnan(data[column][session, block]) else round(float(data[column][session, block]), 4)
+                               for block in range(blocks) for column in block_columns])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=10000, help="sesiones simuladas")
+    parser.add_argument("--participants", type=int, nargs="+", default=[20, 30, 40], help="tamaños de estudio para la potencia")
+    parser.add_argument("--alpha", type=float, default=0.05, help="nivel de significación (bilateral)")
+    parser.add_argument("--workers", type=int, default=None, help="procesos en paralelo (1 = sin procesos)")
+    parser.add_argument("--sessions-per-plan", type=int, default=250, help="sesiones simuladas sobre cada plan generado")
+    parser.add_argument("--seed", type=int, default=None, help="semilla de la simulación")
+    parser.add_argument("--faces", type=int, help="caras de cada tipo por bloque")
+    parser.add_argument("--iti", type=int, nargs=2, metavar=("MIN", "MAX"), help="rango del ITI (ms)")
+    parser.add_argument("--answer-time", type=int, help="ventana de respuesta (ms)")
+    parser.add_argument("--refresh-rate", type=float, help="refresco de pantalla (Hz)")
+    parser.add_argument("--first", help="tarea del primer bloque (tasks de experiment.json, p.ej. C o P)")
+    for name, value in responder_defaults.items():
+        parser.add_argument("--" + name.replace("_", "-"), type=float, default=value, help=f"participante (por defecto {value})")
+    parser.add_argument("--out", help="guardar los resultados de cada sesión en este CSV")
+    parser.add_argument("--json", help="guardar el resumen en este archivo")
+    args = parser.parse_args(argv)
+
+    experiment = load_experiment(headless=True, discover=False)
+    design = design_defaults(experiment)
+    if args.first is not None and args.first not in experiment.spec["tasks"]:
+        parser.error(f"--first debe ser uno de {', '.join(experiment.spec['tasks'])}")
+    for key, value in (("faces", args.faces), ("iti_range", args.iti), ("answer_time", args.answer_time),
+                       ("refresh_rate", args.refresh_rate), ("first", args.first)):
+        if value is not None:
+            design[key] = value
+    responder = {name: getattr(args, name) for name in responder_defaults}
+
+    data, summary = simulate(args.sessions, design, responder, participants=args.participants, workers=args.workers,
+                             sessions_per_plan=args.sessions_per_plan, seed=args.seed, alpha=args.alpha)
+
+    duration = summary["duracion_min"]
+    print(f"{args.sessions} sesiones ({summary['planes']} planes) en {summary['segundos']:.1f} s")
+    print(f"Duración de la sesión (sin diapositivas): {duration['p50']:.1f} min "
+          f"[{duration['p2.5']:.1f}, {duration['p97.5']:.1f}]")
+    for block in summary["bloques"]:
+        effect = block["Interferencia"]
+        print(f"Bloque {block['bloque']} ({block['tarea']}): interferencia {effect['media']:.1f} ± {effect['de']:.1f} ms "
+              f"[{effect['p2.5']:.1f}, {effect['p97.5']:.1f}], omisiones {block['Omisiones']['media']:.1%}, "
+              f"precisión {block['Precision']['media']:.1%}")
+        print("  potencia: " + ", ".join(f"N={n}: {value:.2f}" for n, value in block["potencia"].items()
+                                         if value is not None))
+
+    if args.out:
+        write_sessions(args.out, data, len(summary["bloques"]))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=1)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3.11
+# coding=utf-8
+
+"""
+Transformaciones de imágenes sobre arreglos completos de pixeles (pygame.surfarray + NumPy).
+
+Uso como preprocesamiento offline:
+    python stimuli.py --size 350 --normalize --out media/processed
+"""
+import argparse, os, sys
+import numpy as np
+import pygame
+from os.path import isfile, join
+from pathlib import Path
+from time import perf_counter
+
+script_path = Path(__file__).parent.resolve()
+
+image_folders = [script_path/"media"/"images"/"Happy", script_path/"media"/"images"/"Sad"]
+
+# Pesos de luminancia (ITU-R BT.601), los mismos del experimento original
+gray_weights = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+def as_rgb_surface(surface):
+    """Returns a 24/32-bit copy of the surface so surfarray can reference its pixels"""
+    if surface.get_bitsize() >= 24:
+        return surface.copy()
+    flags = pygame.SRCALPHA if surface.get_flags() & pygame.SRCALPHA else 0
+    rgb = pygame.Surface(surface.get_size(), flags, 32)
+    rgb.blit(surface, (0, 0))
+    return rgb
+
+
+def luminance(surface):
+    """Returns the luminance of every pixel as a float32 array with shape (width, height)"""
+    return pygame.surfarray.pixels3d(surface) @ gray_weights
+
+
+def grayscale(surface):
+    """Returns a grayscale copy of the surface, alpha is kept untouched"""
+    result = as_rgb_surface(surface)
+    pixels = pygame.surfarray.pixels3d(result)
+    gray = (pixels @ gray_weights).astype(np.uint8)  # trunca igual que int()
+    pixels[...] = gray[..., np.newaxis]
+    del pixels  # libera el lock de la superficie
+    return result
+
+
+def scale(surface, width, smooth=False):
+    """Scales the surface to the given width keeping its aspect ratio"""
+    real_width, real_height = surface.get_size()
+    size = [int(width), int(real_height * width / real_width)]
+    if smooth and surface.get_bitsize() >= 24:
+        return pygame.transform.smoothscale(surface, size)
+    return pygame.transform.scale(surface, size)
+
+
+def normalize(surfaces, mean=None, std=None):
+    """Matches the luminance mean and contrast (std) of grayscale surfaces across the set
+
+    When mean/std are not given, the averages of the whole set are used as targets.
+    """
+    stats = []
+    for surface in surfaces:
+        lum = luminance(surface)
+        stats.append((float(lum.mean()), float(lum.std())))
+
+    if not stats:
+        return []
+    if mean is None:
+        mean = sum(m for m, _ in stats) / len(stats)
+    if std is None:
+        std = sum(s for _, s in stats) / len(stats)
+
+    result = []
+    for surface, (image_mean, image_std) in zip(surfaces, stats):
+        normalized = as_rgb_surface(surface)
+        pixels = pygame.surfarray.pixels3d(normalized)
+        lum = pixels @ gray_weights
+        lum -= image_mean
+        if image_std > 0:
+            lum *= std / image_std
+        lum += mean
+        np.clip(lum, 0, 255, out=lum)
+        pixels[...] = lum.astype(np.uint8)[..., np.newaxis]
+        del pixels
+        result.append(normalized)
+    return result
+
+
+def load_image(image, width, grayscale_image=False, smooth=False):
+    """Loads an image from disk and runs it through the scale/grayscale pipeline"""
+    picture = scale(pygame.image.load(image), width, smooth)
+    if grayscale_image:
+        picture = grayscale(picture)
+    return picture
+
+
+def list_images(folder):
+    """Lists the image files of a stimulus folder"""
+    return sorted(Path(folder)/f for f in os.listdir(folder) if isfile(join(folder, f)))
+
+
+def process_folders(folders, width, out_dir=None, grayscale_image=True, normalize_set=False, smooth=False):
+    """Batch mode: processes every image of the folders, optionally saving them into out_dir/<folder>/
+
+    Returns a dict path -> Surface. Normalization uses the whole set (all folders) as reference.
+    """
+    images = [image for folder in folders for image in list_images(folder)]
+    surfaces = []
+    for image in images:
+        try:
+            surfaces.append(load_image(image, width, grayscale_image, smooth))
+        except pygame.error as e:
+            print(f"Error al cargar imagen {image}: {e}")
+            surfaces.append(None)
+
+    loaded = [(image, surface) for image, surface in zip(images, surfaces) if surface is not None]
+    if normalize_set:
+        loaded = list(zip([image for image, _ in loaded], normalize([surface for _, surface in loaded])))
+
+    if out_dir is not None:
+        for image, surface in loaded:
+            target = Path(out_dir)/image.parent.name
+            target.mkdir(parents=True, exist_ok=True)
+            pygame.image.save(surface, str(target/(image.stem + ".png")))
+
+    return dict(loaded)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Preprocesa las imágenes de estímulos (escala, grises, normalización)")
+    parser.add_argument("folders", nargs="*", default=image_folders, help="carpetas de imágenes (por defecto Happy y Sad)")
+    parser.add_argument("--size", type=int, default=350, help="ancho final en pixeles")
+    parser.add_argument("--out", default=script_path/"media"/"processed", help="carpeta de salida")
+    parser.add_argument("--color", action="store_true", help="no convertir a escala de grises")
+    parser.add_argument("--normalize", action="store_true", help="igualar luminancia y contraste entre imágenes")
+    parser.add_argument("--smooth", action="store_true", help="escalado suavizado en lugar de vecino más cercano")
+    args = parser.parse_args(argv)
+
+    t0 = perf_counter()
+    processed = process_folders(args.folders, args.size, args.out, not args.color, args.normalize, args.smooth)
+    print(f"{len(processed)} imágenes procesadas en {perf_counter() - t0:.2f} s -> {args.out}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+# coding=utf-8
+
+"""
+Telemetría de tiempos por ensayo.
+
+Registra en un buffer circular preasignado (arrays de enteros, sin crear objetos por evento)
+el instante perf_counter_ns de cada flip de fase, cada trigger encolado y escrito, y cada
+tecla presionada y soltada. Al final de cada bloque se vuelca a un CSV junto al archivo de
+datos (<datos>_telemetria_b<bloque>.csv) y se resume la variación de cada intervalo.
+
+Uso:
+    python telemetry.py data/<fecha>_<id>_telemetria_b1.csv     # resumen de un volcado
+"""
+import csv, sys, threading
+from array import array
+from pathlib import Path
+from time import perf_counter_ns
+
+kinds = ("inicio", "fijacion", "estimulo", "respuesta", "iti", "fin",
+         "trigger_encolado", "trigger_escrito", "tecla_presionada", "tecla_soltada")
+kind_codes = {kind: code for code, kind in enumerate(kinds)}
+
+# Intervalos resumidos: (desde, hasta) dentro del mismo ensayo
+intervals = (("fijacion", "estimulo"), ("estimulo", "respuesta"), ("respuesta", "iti"),
+             ("estimulo", "trigger_escrito"), ("trigger_encolado", "trigger_escrito"),
+             ("estimulo", "tecla_presionada"), ("tecla_presionada", "tecla_soltada"))
+
+columns = ("Ensayo", "Evento", "Codigo", "TiempoNs", "TiempoMs")
+
+
+def percentile(values, q):
+    return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+
+class Telemetry:
+    """Fixed-size ring buffer of (trial, event kind, code, perf_counter_ns) records
+
+    record() only writes into preallocated arrays; when the buffer is full the oldest records
+    are overwritten (overwritten counts them). Safe to call from the trigger thread.
+    """
+
+    def __init__(self, capacity=16384):
+        self.capacity = capacity
+        self.times = array('q', bytes(8 * capacity))
+        self.trials = array('i', bytes(4 * capacity))
+        self.kinds = array('b', bytes(capacity))
+        self.codes = array('i', bytes(4 * capacity))  # código de trigger o de tecla
+        self.count = 0
+        self.trial = -1  # ensayo en curso, lo fija el ciclo de ensayos
+        self.lock = threading.Lock()
+
+    def record(self, kind, code=0, t=None, trial=None):
+        """Stores an event (kind is one of kinds), at t or now"""
+        if t is None:
+            t = perf_counter_ns()
+        with self.lock:
+            index = self.count % self.capacity
+            self.times[index] = t
+            self.trials[index] = self.trial if trial is None else trial
+            self.kinds[index] = kind_codes[kind]
+            self.codes[index] = code
+            self.count += 1
+
+    @property
+    def overwritten(self):
+        return max(0, self.count - self.capacity)
+
+    def clear(self):
+        with self.lock:
+            self.count = 0
+            self.trial = -1
+
+    def records(self):
+        """(trial, kind, code, t_ns) of the buffered events, oldest first"""
+        with self.lock:
+            count = self.count
+            start = max(0, count - self.capacity)
+            indexes = [i % self.capacity for i in range(start, count)]
+            return [(self.trials[i], kinds[self.kinds[i]], self.codes[i], self.times[i]) for i in indexes]
+
+    def dump(self, path):
+        """Writes the buffered events to a CSV (times also in ms from the first event)"""
+        rows = sorted(self.records(), key=lambda row: row[3])
+        origin = rows[0][3] if rows else 0
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f, lineterminator='\n')
+            writer.writerow(columns)
+            for trial, kind, code, t in rows:
+                writer.writerow((trial, kind, code, t, f"{(t - origin) / 1e6:.3f}"))
+        return path
+
+    def summary(self):
+        return summarize(self.records(), self.overwritten)
+
+
+def summarize(records, overwritten=0):
+    """Per-interval mean, SD, p95, min and max (ms) over the trials, as text
+
+    Each interval goes from the first start event of a trial to the first end event after it;
+    queued -> written triggers are paired in order per trigger code (the dispatcher is FIFO), and
+    a write with no earlier queued event of its code is left out.
+    """
+    times = {}
+    for trial, kind, code, t in sorted(records, key=lambda record: record[3]):
+        times.setdefault(kind, {}).setdefault(trial, []).append(t)
+
+    lines = ["Telemetría (intervalo: n, media ± DE, p95, mín-máx en ms):"]
+    for start, end in intervals:
+        if (start, end) == ("trigger_encolado", "trigger_escrito"):
+            values = pair_triggers(records)
+        else:
+            values = []
+            for trial, starts in times.get(start, {}).items():
+                following = [t for t in times.get(end, {}).get(trial, ()) if t >= starts[0]]
+                if following:
+                    values.append((following[0] - starts[0]) / 1e6)
+        if not values:
+            continue
+        values.sort()
+        mean = sum(values) / len(values)
+        sd = (sum((value - mean) ** 2 for value in values) / len(values)) ** 0.5
+        lines.append(f"  {start:>16} -> {end:<16} n={len(values):4d} {mean:9.3f} ± {sd:7.3f}  "
+                     f"p95={percentile(values, 95):9.3f}  {values[0]:9.3f}-{values[-1]:9.3f}")
+    if overwritten:
+        lines.append(f"  ({overwritten} eventos antiguos sobrescritos, aumentar la capacidad)")
+    return "\n".join(lines)
+
+
+def pair_triggers(records):
+    """Queued -> written latency (ms) of each trigger, pairing in FIFO order within each code"""
+    pending = {}
+    values = []
+    for trial, kind, code, t in sorted(records, key=lambda record: record[3]):
+        if kind == "trigger_encolado":
+            pending.setdefault(code, []).append(t)
+        elif kind == "trigger_escrito" and pending.get(code):
+            values.append((t - pending[code].pop(0)) / 1e6)
+    return values
+
+
+def sidecar_path(data_path, block):
+    data_path = Path(data_path)
+    return data_path.with_name(f"{data_path.stem}_telemetria_b{block}.csv")
+
+
+def read_dump(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        return [(int(row["Ensayo"]), row["Evento"], int(row["Codigo"]), int(row["TiempoNs"]))
+                for row in csv.DictReader(f)]
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        print(__doc__)
+        return 1
+    for path in argv:
+        print(path)
+        print(summarize(read_dump(path)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
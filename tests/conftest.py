@@ -0,0 +1,23 @@
+# coding=utf-8
+
+# Los módulos del experimento están en la carpeta raíz (sin paquete)
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent.resolve()))
+
+
+@pytest.fixture(scope="session")
+def experiment():
+    """The experiment script loaded without a display (SDL dummy driver), in a small window"""
+    from headless import load_experiment, script_path
+    if not (script_path/"media"/"Arial_Rounded_MT_Bold.ttf").exists():
+        pytest.skip("media/ no está en esta copia del experimento")
+    experiment = load_experiment(headless=True, discover=False)
+    experiment.debug_mode = False
+    experiment.use_vsync = False
+    experiment.window_resolution = (320, 240)
+    experiment.init()
+    return experiment
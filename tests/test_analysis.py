@@ -0,0 +1,61 @@
+# coding=utf-8
+
+import numpy as np
+import pytest
+
+import analysis
+import results
+
+
+def row(face, word, answer, correct, rt_ms, block=1, task="Cara"):
+    rt_us = "" if rt_ms is None else rt_ms * 1000
+    return ["4321", "001", block, "" if rt_ms is None else rt_ms, face, word, task, answer, correct, rt_us, ""]
+
+
+@pytest.fixture
+def session(tmp_path):
+    path = tmp_path/"2024-05-01_10-20-30_4321_F_C.csv"
+    writer = results.ResultWriter(path)
+    for values in (
+        row("Happy", "Happy", "Happy", 1, 500),  # congruentes
+        row("Sad", "Sad", "Sad", 1, 520),
+        row("Sad", "Sad", "Sad", 1, 150),  # bajo min_rt: se recorta
+        row("Happy", "Sad", "Happy", 1, 600),  # incongruentes
+        row("Sad", "Happy", "Sad", 1, 640),
+        row("Sad", "Happy", "Happy", 0, 450),  # error
+        row("Happy", "Sad", "Missed", "", None),  # omisión
+        row("Happy", "Happy", "Sad", 1, 700, block=2, task="Palabra"),
+        row("Happy", "Sad", "Sad", 1, 800, block=2, task="Palabra"),
+    ):
+        writer.write(values)
+    writer.close()
+    return path
+
+
+def test_summary_scores_each_block(session):
+    first, second = analysis.analyze_file(session)
+    assert (first["Bloque"], first["TipoRespuesta"], first["Ensayos"]) == (1, "Cara", 7)
+    assert first["Omisiones"] == pytest.approx(1 / 7)
+    assert first["Precision"] == pytest.approx(5 / 6)
+    assert first["PrecisionCongruente"] == 1.0
+    assert first["PrecisionIncongruente"] == pytest.approx(2 / 3)
+    assert first["TRCongruente"] == pytest.approx(510)
+    assert first["TRIncongruente"] == pytest.approx(620)
+    assert first["Interferencia"] == pytest.approx(110)
+    assert first["Recortados"] == 1
+    assert (second["Bloque"], second["TipoRespuesta"], second["Interferencia"]) == (2, "Palabra", pytest.approx(100))
+
+
+def test_rt_comes_from_the_microsecond_column(session):
+    columns = analysis.read_columns(session)
+    assert columns["rt"][0] == pytest.approx(500.0)
+    assert np.isnan(columns["rt"][6])  # omisión
+
+
+def test_trim_drops_outliers_per_group():
+    rt = np.array([500, 510, 490, 505, 495, 2000, 300, 310, np.nan, 150], dtype=float)
+    groups = np.array([0, 0, 0, 0, 0, 0, 1, 1, 1, 1])
+    keep = analysis.trim(rt, groups, 200, 1200, trim_sd=2.0)
+    assert keep.tolist() == [True] * 5 + [False, True, True, False, False]
+    rt = np.array([100, 110, 120, 130, 140, 1000], dtype=float)
+    assert analysis.trim(rt, np.zeros(6, dtype=int), 0, 2000, trim_sd=2.0).tolist() == [True] * 5 + [False]
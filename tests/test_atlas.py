@@ -0,0 +1,73 @@
+# coding=utf-8
+
+import os
+
+import numpy as np
+import pygame
+import pytest
+
+import atlas
+import stimuli
+
+
+@pytest.fixture
+def folders(tmp_path):
+    rng = np.random.default_rng(0)
+    result = []
+    for name, size in (("Happy", (80, 60)), ("Sad", (60, 90))):
+        folder = tmp_path/"images"/name
+        folder.mkdir(parents=True)
+        for number in range(2):
+            surface = pygame.Surface(size, 0, 32)
+            pygame.surfarray.blit_array(surface, rng.integers(0, 1 << 24, size, dtype=np.uint32))
+            pygame.image.save(surface, str(folder/f"00{number}.png"))
+        result.append(folder)
+    return result
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return {"atlas_path": tmp_path/"atlas.bin", "index_path": tmp_path/"atlas.json"}
+
+
+def test_atlas_pixels_match_the_pipeline(folders, paths):
+    assert atlas.compile_atlas(folders, 40, True, **paths)
+    stimulus_atlas = atlas.Atlas(**paths)
+    try:
+        assert stimulus_atlas.matches(40, True) and not stimulus_atlas.matches(50, True)
+        for folder in folders:
+            for image in stimuli.list_images(folder):
+                assert stimulus_atlas.is_fresh(image)
+                surface = stimulus_atlas.surface(image).copy()
+                expected = stimuli.load_image(image, 40, True)
+                assert surface.get_size() == expected.get_size()
+                assert (pygame.surfarray.array3d(surface) == pygame.surfarray.array3d(expected)).all()
+    finally:
+        stimulus_atlas.close()
+
+
+def test_atlas_is_rebuilt_only_when_something_changes(folders, paths):
+    assert atlas.compile_atlas(folders, 40, True, **paths)
+    assert not atlas.compile_atlas(folders, 40, True, **paths)
+    assert atlas.compile_atlas(folders, 40, False, **paths)  # otro formato
+    assert atlas.compile_atlas(folders, 40, False, force=True, **paths)
+
+    image = folders[0]/"000.png"
+    pygame.image.save(pygame.Surface((80, 60)), str(image))
+    stimulus_atlas = atlas.Atlas(**paths)
+    try:
+        assert not stimulus_atlas.is_fresh(image)  # modificada después de compilar
+        assert not stimulus_atlas.is_fresh(folders[0]/"no_existe.png")
+    finally:
+        stimulus_atlas.close()
+    assert atlas.compile_atlas(folders, 40, False, **paths)
+
+
+def test_missing_or_old_index_is_rejected(folders, paths):
+    with pytest.raises(FileNotFoundError):
+        atlas.Atlas(**paths)
+    atlas.compile_atlas(folders, 40, True, **paths)
+    paths["index_path"].write_text('{"version": 0}', encoding="utf-8")
+    with pytest.raises(FileNotFoundError):
+        atlas.Atlas(**paths)
+    assert not os.path.exists(str(paths["atlas_path"]) + ".tmp")
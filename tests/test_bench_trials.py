@@ -0,0 +1,68 @@
+# coding=utf-8
+
+import sys
+from pathlib import Path
+from time import perf_counter_ns
+
+import pygame
+
+sys.path.insert(0, str(Path(__file__).parent.parent/"benchmarks"))
+import bench_trials
+
+
+class Experiment:
+    """Experiment stand-in: only what the synthetic participant uses"""
+
+    pygame = pygame
+
+    @staticmethod
+    def image_type(image):
+        return Path(image).parent.name
+
+
+def participant(image_list, block=1, **kwargs):
+    result = bench_trials.SyntheticParticipant(Experiment, image_list, block, {"v": "Happy", "n": "Sad"},
+                                               mu=0, sigma=0, tau=1, hold_ms=(10, 10), seed=1, **kwargs)
+    result.posted = []
+    result.post = lambda event_type, key: result.posted.append((event_type, key, perf_counter_ns()))
+    return result
+
+
+def answer(synthetic):
+    start = perf_counter_ns()
+    synthetic.on_stimulus()
+    for timer in synthetic.timers:
+        timer.join()
+    return [(event_type, key, (t - start) / 1e6) for event_type, key, t in synthetic.posted]
+
+
+def test_participant_presses_then_releases_the_answer_key():
+    synthetic = participant([("m/Happy/001.jpg", "Sad")], accuracy=1, miss_rate=0)
+    (down, key, pressed), (up, released_key, released) = answer(synthetic)
+    assert (down, up) == (pygame.KEYDOWN, pygame.KEYUP)
+    assert key == released_key == "v"  # bloque 1: se responde la cara
+    assert 120 <= pressed < released
+    assert synthetic.trial == 1
+
+
+def test_participant_answers_the_word_in_block_2_and_can_fail_or_miss():
+    assert answer(participant([("m/Happy/001.jpg", "Sad")], block=2, accuracy=1, miss_rate=0))[0][1] == "n"
+    assert answer(participant([("m/Happy/001.jpg", "Sad")], accuracy=0, miss_rate=0))[0][1] == "n"
+    assert answer(participant([("m/Happy/001.jpg", "Sad")], miss_rate=1)) == []
+
+
+def test_rts_are_ex_gaussian_above_the_floor():
+    synthetic = bench_trials.SyntheticParticipant(Experiment, [], 1, {}, seed=3)
+    rts = [synthetic.rt_ms() for _ in range(4000)]
+    assert min(rts) >= 120
+    assert 640 < sum(rts) / len(rts) < 700  # mu + tau
+
+
+def test_percentiles_and_fake_port():
+    assert bench_trials.percentiles([]) == {}
+    stats = bench_trials.percentiles(range(1, 101))
+    assert (stats["p50"], stats["p95"], stats["p100"]) == (51, 96, 100)
+    port = bench_trials.FakePort()
+    port.write(bytes([21]))
+    [(code, t)] = port.writes
+    assert code == 21 and t <= perf_counter_ns()
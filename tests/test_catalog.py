@@ -0,0 +1,81 @@
+# coding=utf-8
+
+import hashlib
+import os
+import struct
+
+import pytest
+
+import catalog
+
+
+def png(width, height):
+    return b"\x89PNG\r\n\x1a\n" + b"\x00\x00\x00\x0dIHDR" + struct.pack(">II", width, height) + b"\x08\x02\x00\x00\x00"
+
+
+def jpeg(width, height):
+    app0 = b"\xff\xe0" + struct.pack(">H", 6) + b"JFIF"
+    sof0 = b"\xff\xc0" + struct.pack(">HBHH", 11, 8, height, width) + b"\x01\x01\x11\x00"
+    return b"\xff\xd8" + app0 + sof0 + b"\xff\xd9"
+
+
+@pytest.fixture
+def media(tmp_path):
+    (tmp_path/"codebook.csv").write_text("Codigo,Descripcion\nha_c,feliz boca cerrada\nsa_o,triste boca abierta\n",
+                                         encoding="utf-8")
+    happy, sad = tmp_path/"Happy", tmp_path/"Sad"
+    happy.mkdir()
+    sad.mkdir()
+    (happy/"001_ha_c.jpg").write_bytes(jpeg(400, 500))
+    (happy/"002_ha_c.png").write_bytes(png(300, 200))
+    (sad/"001_sa_o.jpg").write_bytes(jpeg(640, 480))
+    (sad/"extra.jpg").write_bytes(b"no es una imagen")
+    return tmp_path
+
+
+def load(media, **options):
+    return catalog.load_catalog((media/"Happy", media/"Sad"), media/"catalog.json", media/"codebook.csv",
+                                manifest_path=media/"manifest.json", **options)
+
+
+def test_entries_come_from_file_names_headers_and_codebook(media):
+    stimuli = load(media)
+    assert len(stimuli) == 4
+    image = media/"Happy"/"001_ha_c.jpg"
+    assert image in stimuli
+    assert stimuli.record("001_ha_c") == {
+        "id": "001_ha_c", "emotion": "Happy", "code": "ha_c", "expression": "feliz boca cerrada", "number": 1,
+        "width": 400, "height": 500, "sha1": hashlib.sha1(image.read_bytes()).hexdigest(), "path": image}
+    assert (stimuli.get(media/"Happy"/"002_ha_c.png", "width"), stimuli.get(media/"Happy"/"002_ha_c.png", "height")) == (300, 200)
+    assert stimuli.emotion(media/"Sad"/"001_sa_o.jpg") == "Sad"
+    extra = stimuli.record("extra")
+    assert (extra["code"], extra["width"]) == (None, None)
+    assert stimuli.get(media/"Sad"/"otra.jpg", "id") is None
+
+
+def test_select_and_counts(media):
+    stimuli = load(media)
+    assert stimuli.select("Happy") == [media/"Happy"/"001_ha_c.jpg", media/"Happy"/"002_ha_c.png"]
+    assert stimuli.select(codes={"sa_o"}) == [media/"Sad"/"001_sa_o.jpg"]
+    assert stimuli.counts() == {("Happy", "ha_c"): 2, ("Sad", "sa_o"): 1, ("Sad", None): 1}
+
+
+def test_only_changed_files_are_read_again(media, monkeypatch):
+    load(media)
+    described = []
+    describe = catalog.describe
+    monkeypatch.setattr(catalog, "describe", lambda path, *args: described.append(path.name) or describe(path, *args))
+
+    assert len(load(media)) == 4
+    assert described == []  # nada cambió: todo sale de catalog.json
+
+    (media/"Sad"/"002_sa_o.jpg").write_bytes(jpeg(10, 20))
+    stat = os.stat(media/"Sad")
+    os.utime(media/"Sad", ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    stimuli = load(media)
+    assert described == ["002_sa_o.jpg"]
+    assert stimuli.get(media/"Sad"/"002_sa_o.jpg", "width") == 10
+
+    described.clear()
+    load(media, rebuild=True)
+    assert len(described) == 5
@@ -0,0 +1,73 @@
+# coding=utf-8
+
+import os
+from time import perf_counter_ns
+
+import pytest
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+import pygame
+from pygame.locals import KEYDOWN, KEYUP, K_n, K_v, USEREVENT
+
+from events import EventDispatcher
+
+
+@pytest.fixture
+def events():
+    # Si otra prueba ya abrió la pantalla (el experimento) se usa esa y no se cierra
+    opened = pygame.display.get_surface() is None
+    if opened:
+        pygame.display.init()
+        pygame.display.set_mode((16, 16))
+    pygame.event.clear()
+    yield EventDispatcher()
+    if opened:
+        pygame.display.quit()
+
+
+def test_wait_until_reaches_the_deadline(events):
+    start = perf_counter_ns()
+    assert events.wait_until(start + 30_000_000) is False
+    elapsed = perf_counter_ns() - start
+    assert 30_000_000 <= elapsed < 80_000_000
+
+
+def test_long_waits_report_lateness_from_the_actual_timeout(events):
+    events.start_measure()
+    events.wait_until(perf_counter_ns() + 1_300_000_000)
+    lateness = list(events.measurement["lateness"])
+    assert events.stop_measure()["timeouts"] >= 2  # un tramo de 1 s y el resto
+    # Ni adelantos de cientos de ms (plazo sin recortar al tramo) ni atrasos grandes
+    assert all(-20_000 < value < 50_000 for value in lateness)
+
+
+def test_binding_stops_the_wait(events):
+    events.bind(USEREVENT, lambda event: True)
+    pygame.event.post(pygame.event.Event(USEREVENT))
+    start = perf_counter_ns()
+    assert events.wait_until(start + 500_000_000) is True
+    assert perf_counter_ns() - start < 100_000_000
+
+
+def test_listener_consumes_its_events_and_bindings_are_scoped(events):
+    seen = []
+    stopped = []
+
+    def listener(event, now):
+        if event.type == KEYDOWN and event.key == K_v:
+            seen.append(now)
+            return True
+        return False
+
+    with events.bound({(KEYDOWN, K_v): lambda event: stopped.append("v") or True,
+                       (KEYUP, None): lambda event: stopped.append("up") or False}, listener=listener):
+        pygame.event.post(pygame.event.Event(KEYDOWN, key=K_v))
+        pygame.event.post(pygame.event.Event(KEYUP, key=K_n))
+        assert events.pump() is False
+    assert len(seen) == 1 and stopped == ["up"]
+    assert events.listeners == [] and events.bindings == [{}]
+
+
+def test_until_ends_the_wait(events):
+    flags = iter([False, True])
+    assert events.wait_until(perf_counter_ns() + 500_000_000, until=lambda: next(flags)) is True
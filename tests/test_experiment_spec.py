@@ -0,0 +1,91 @@
+# coding=utf-8
+
+import copy
+
+import pytest
+
+import experiment_spec
+
+keys = {"space": 32, "return": 13, "v": 118, "n": 110}
+
+
+@pytest.fixture
+def spec():
+    return experiment_spec.load()
+
+
+def compile_for(spec, subject, block_lists):
+    def prepare(image_list, block, task, answer, iti):
+        return [(block, task, answer, iti, trial) for trial in image_list]
+    return experiment_spec.compile_plan(spec, subject, block_lists, prepare, lambda ms: round(ms / 10), keys.__getitem__)
+
+
+def test_shipped_spec_is_valid(spec):
+    experiment_spec.validate(spec)
+
+
+def test_validate_lists_every_problem(spec):
+    spec = copy.deepcopy(spec)
+    spec["keys"]["F"] = {"v": "Happy", "Enter": "Sad"}
+    spec["triggers"]["fixation"] = 300
+    spec["sequence"].append({"block": 7})
+    with pytest.raises(experiment_spec.SpecError) as error:
+        experiment_spec.validate(spec)
+    message = str(error.value)
+    assert "tecla desconocida: Enter" in message
+    assert "trigger fixation" in message
+    assert "bloque 7" in message
+
+
+def test_validate_reports_missing_sections():
+    with pytest.raises(experiment_spec.SpecError, match="slides"):
+        experiment_spec.validate({"subject": {}})
+
+
+def test_parse_subject_and_data_file(spec):
+    assert experiment_spec.parse_subject(spec, "4321_T_P") == {"uid": "4321", "keys": "T", "first": "P"}
+    assert experiment_spec.parse_subject(spec, "4321_X_P") is None
+    assert experiment_spec.parse_data_file(spec, "data/2024-05-01_10-20-30_4321_F_C.csv") == (
+        "2024-05-01_10-20-30", {"uid": "4321", "keys": "F", "first": "C"})
+    assert experiment_spec.parse_data_file(spec, "data/resumen.csv") == (None, None)
+
+
+def test_compile_plan_follows_the_subject_design(spec):
+    steps = compile_for(spec, {"uid": "1", "keys": "T", "first": "P"}, {1: ["a", "b"], 2: ["c"]})
+    assert [step.kind for step in steps] == ["trigger", "slide", "slide", "block", "slide", "slide", "block",
+                                             "slide", "slide", "trigger"]
+    assert steps[0].trigger == spec["triggers"]["start"] and steps[-1].trigger == spec["triggers"]["stop"]
+
+    first, second = [step for step in steps if step.kind == "block"]
+    assert (first.task, first.trigger) == ("Palabra", spec["triggers"]["start_block_1"])
+    assert (second.task, second.trigger) == ("Cara", spec["triggers"]["start_block_2"])
+    assert first.trials == [(1, "Palabra", "word", (1000, 1200), "a"), (1, "Palabra", "word", (1000, 1200), "b")]
+    assert first.keys == {keys["v"]: "Sad", keys["n"]: "Happy"}
+    assert first.frames == {"inicio": 50, "fijacion": 100, "estimulo": 20, "respuesta": 100}
+
+    intro = steps[2]
+    assert intro.key == keys["space"]
+    assert "responder usando la emoción que aparece escrita en la palabra" in " ".join(intro.text)
+    assert "El dedo índice sobre la tecla [V] para indicar TRISTE." in intro.text
+
+
+def test_compile_plan_skips_finished_blocks(spec):
+    steps = compile_for(spec, {"uid": "1", "keys": "F", "first": "C"}, {1: [], 2: ["c"]})
+    assert [step.block for step in steps if step.kind == "block"] == [2]
+    assert all(step.block != 1 for step in steps)
+
+
+def test_compile_plan_requires_every_block(spec):
+    with pytest.raises(experiment_spec.SpecError, match="bloque 2"):
+        compile_for(spec, {"uid": "1", "keys": "F", "first": "C"}, {1: ["a"]})
+
+
+def test_describe_lists_every_step(spec):
+    spec = copy.deepcopy(spec)
+    spec["slides"]["farewell"] = []  # válido: diapositiva sin texto
+    experiment_spec.validate(spec)
+    steps = compile_for(spec, {"uid": "1", "keys": "F", "first": "C"}, {1: [], 2: []})
+    lines = experiment_spec.describe(steps).splitlines()
+    assert len(lines) == len(steps) == 4
+    assert "diapositiva 'Bienvenido/a, a este experimento!!!'" in lines[1]
+    assert lines[2].endswith("diapositiva ''")
@@ -0,0 +1,107 @@
+# coding=utf-8
+
+import threading
+
+import pytest
+
+import iochannel
+import results
+
+
+@pytest.fixture
+def ring():
+    ring = iochannel.SharedRing(slots=8)
+    yield ring
+    ring.close(unlink=True)
+
+
+def drain(ring):
+    records = []
+    while (item := ring.get()) is not None:
+        records.append(item)
+    return records
+
+
+def test_records_come_out_in_order(ring):
+    ring.put(iochannel.TEXT, b"hola")
+    ring.put(iochannel.FLUSH)
+    assert drain(ring) == [(iochannel.TEXT, b"hola"), (iochannel.FLUSH, b"")]
+    assert ring.get() is None
+
+
+def test_oversized_record_is_rejected(ring):
+    with pytest.raises(ValueError):
+        ring.put(iochannel.ROW, b"x" * (iochannel.payload_size + 1))
+
+
+def test_long_payload_is_split_without_loss(ring):
+    payload = ("ñ" * 300).encode("utf-8")  # 600 bytes, tres registros
+    ring.put_parts(iochannel.ROW, iochannel.ROW_PART, payload)
+    records = drain(ring)
+    assert [kind for kind, _ in records] == [iochannel.ROW_PART, iochannel.ROW_PART, iochannel.ROW]
+    assert b"".join(part for _, part in records) == payload
+
+
+def test_full_ring_with_dead_consumer_breaks(ring, monkeypatch):
+    monkeypatch.setattr(iochannel, "full_timeout", 5.0)
+    ring.alive = lambda: False
+    for _ in range(ring.slots):
+        ring.put(iochannel.TEXT, b".")
+    with pytest.raises(iochannel.ChannelBroken):
+        ring.put(iochannel.TEXT, b".")
+    assert ring.broken
+
+
+def test_full_ring_with_stalled_consumer_times_out(ring, monkeypatch):
+    monkeypatch.setattr(iochannel, "full_timeout", 0.05)
+    for _ in range(ring.slots):
+        ring.put(iochannel.TEXT, b".")
+    with pytest.raises(iochannel.ChannelBroken):
+        ring.put(iochannel.TEXT, b".")
+
+
+def test_full_ring_waits_for_a_live_consumer(ring):
+    for _ in range(ring.slots):
+        ring.put(iochannel.TEXT, b".")
+    timer = threading.Timer(0.05, ring.get)
+    timer.start()
+    ring.put(iochannel.TEXT, b"!")
+    timer.join()
+    assert ring.waits > 0 and not ring.broken
+
+
+def test_companion_writes_rows_and_falls_back_when_it_dies(tmp_path, monkeypatch):
+    monkeypatch.setattr(iochannel, "full_timeout", 5.0)
+    path = tmp_path/"sesion.csv"
+    ring, writer, console = iochannel.start(path, slots=16)
+    try:
+        writer.write(["4321", "001", 1, "", "Happy", "Sad", "Cara", "Happy", 1, 500000, 560000])
+        assert writer.flush()
+        writer.process.kill()
+        writer.process.join()
+        for index in range(40):  # más filas de las que caben en el buffer
+            writer.write(["4321", f"{index:03d}", 1, 500, "Happy", "Sad", "Cara", "Happy", 1, 500000, 560000])
+        assert writer.direct is not None
+        console.write("sigue\n")
+    finally:
+        writer.close()
+    session = results.read_session(path)
+    assert [row["IdImagen"] for row in session["rows"]] == ["001"] + [f"{index:03d}" for index in range(40)]
+
+
+def test_stalled_companion_saves_its_unsynced_rows_before_the_fallback(tmp_path, monkeypatch):
+    monkeypatch.setattr(iochannel, "full_timeout", 0.2)
+    path = tmp_path/"sesion.csv"
+    ring, writer, console = iochannel.start(path, slots=16, console_path=tmp_path/"consola.txt", console_delay=1.0)
+    try:
+        for index in range(3):  # quedan en el ResultWriter del acompañante, sin sincronizar
+            writer.write(["4321", f"a{index}", 1, 500, "Happy", "Sad", "Cara", "Happy", 1, 500000, 560000])
+        console.write("consola lenta\n")  # el acompañante se detiene aquí y el buffer se llena
+        for index in range(40):
+            writer.write(["4321", f"{index:03d}", 1, 500, "Happy", "Sad", "Cara", "Happy", 1, 500000, 560000])
+        assert writer.direct is not None
+    finally:
+        writer.close()
+    session = results.read_session(path)
+    assert [row["IdImagen"] for row in session["rows"]] == [f"a{index}" for index in range(3)] + [
+        f"{index:03d}" for index in range(40)]
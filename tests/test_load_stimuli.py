@@ -0,0 +1,71 @@
+# coding=utf-8
+
+import numpy as np
+import pytest
+
+import atlas
+
+
+@pytest.fixture
+def images(experiment, tmp_path, monkeypatch):
+    """Two stimulus images on disk and an empty cache"""
+    pygame = experiment.pygame
+    rng = np.random.default_rng(0)
+    paths = []
+    for number in range(2):
+        surface = pygame.Surface((80, 60), 0, 32)
+        pygame.surfarray.blit_array(surface, rng.integers(0, 1 << 24, (80, 60), dtype=np.uint32))
+        paths.append(tmp_path/f"00{number}.png")
+        pygame.image.save(surface, str(paths[-1]))
+    monkeypatch.setattr(experiment, "stimulus_cache", {})
+    return paths
+
+
+@pytest.fixture
+def no_atlas(monkeypatch):
+    def missing():
+        raise FileNotFoundError("sin atlas")
+    monkeypatch.setattr(atlas, "Atlas", missing)
+
+
+@pytest.mark.usefixtures("no_atlas")
+def test_each_image_is_prepared_once_before_the_blocks(experiment, images):
+    first, second = images
+    experiment.load_stimuli([[(first, "Happy"), (second, "Sad")], [(first, "Sad")]], 40, grayscale=True)
+    assert list(experiment.stimulus_cache) == [first, second]
+    picture = experiment.stimulus_cache[first]
+    assert picture.get_size() == (40, 30)
+    assert picture.get_bitsize() == experiment.screen.get_bitsize()  # ya convertida al formato de la pantalla
+    pixels = experiment.pygame.surfarray.array3d(picture)
+    assert (pixels[..., 0] == pixels[..., 2]).all()
+
+
+@pytest.mark.usefixtures("no_atlas")
+def test_budget_limits_the_cache(experiment, images, capsys):
+    one = 40 * 30 * experiment.screen.get_bytesize()
+    experiment.load_stimuli([[(image, "Happy") for image in images]], 40, grayscale=True, budget=one)
+    assert list(experiment.stimulus_cache) == images[:1]
+    assert "1 imágenes se cargarán desde disco" in capsys.readouterr().out
+
+
+@pytest.mark.usefixtures("no_atlas")
+def test_show_image_uses_the_cache(experiment, images, monkeypatch):
+    experiment.load_stimuli([[(images[0], "Happy")]], 40, grayscale=True)
+
+    def prepare_image(*args):
+        raise AssertionError("la imagen ya estaba en el cache")
+    monkeypatch.setattr(experiment, "prepare_image", prepare_image)
+    experiment.show_image(images[0], 40, grayscale=True)
+    center = (experiment.resolution[0] // 2, experiment.resolution[1] // 2)
+    assert experiment.screen.get_at(center) == experiment.stimulus_cache[images[0]].get_at((20, 15))
+
+
+def test_compiled_atlas_is_used_when_fresh(experiment, images, tmp_path, monkeypatch, capsys):
+    paths = {"atlas_path": tmp_path/"atlas.bin", "index_path": tmp_path/"atlas.json"}
+    atlas.compile_atlas([tmp_path], 40, True, **paths)
+    monkeypatch.setattr(atlas, "Atlas", lambda Atlas=atlas.Atlas: Atlas(**paths))
+    experiment.load_stimuli([[(image, "Happy") for image in images]], 40, grayscale=True)
+    assert "(2 desde atlas)" in capsys.readouterr().out
+    expected = experiment.prepare_image(images[1], 40, grayscale=True)
+    assert (experiment.pygame.surfarray.array3d(experiment.stimulus_cache[images[1]])
+            == experiment.pygame.surfarray.array3d(expected)).all()
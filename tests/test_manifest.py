@@ -0,0 +1,54 @@
+# coding=utf-8
+
+import os
+
+import pytest
+
+import manifest
+
+
+@pytest.fixture
+def folders(tmp_path):
+    folders = [tmp_path/"Happy", tmp_path/"Sad"]
+    for folder in folders:
+        folder.mkdir()
+        for name in ("002_ha_o.jpg", "001_ha_c.jpg"):
+            (folder/name).write_bytes(b"x")
+    return folders
+
+
+def test_lists_the_files_of_each_folder(folders, tmp_path):
+    images = manifest.load_manifest(folders, tmp_path/"manifest.json")
+    assert images == {folder.name: [folder/"001_ha_c.jpg", folder/"002_ha_o.jpg"] for folder in folders}
+    assert (tmp_path/"manifest.json").exists()
+
+
+def test_unchanged_folders_are_read_from_the_manifest(folders, tmp_path, monkeypatch):
+    path = tmp_path/"manifest.json"
+    first = manifest.load_manifest(folders, path)
+
+    def no_scan(folder):
+        raise AssertionError("la carpeta no cambió, no debería recorrerse")
+    monkeypatch.setattr(manifest, "scan_folder", no_scan)
+    assert manifest.load_manifest(folders, path) == first
+
+
+def test_a_changed_folder_is_scanned_again(folders, tmp_path, monkeypatch):
+    path = tmp_path/"manifest.json"
+    manifest.load_manifest(folders, path)
+    (folders[1]/"003_sa_c.jpg").write_bytes(b"x")
+    stat = os.stat(folders[1])
+    os.utime(folders[1], ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))  # mtime distinto seguro
+
+    scanned = []
+    scan = manifest.scan_folder
+    monkeypatch.setattr(manifest, "scan_folder", lambda folder: scanned.append(folder.name) or scan(folder))
+    images = manifest.load_manifest(folders, path)
+    assert scanned == ["Sad"]
+    assert [image.name for image in images["Sad"]] == ["001_ha_c.jpg", "002_ha_o.jpg", "003_sa_c.jpg"]
+
+
+def test_a_corrupt_manifest_is_rebuilt(folders, tmp_path):
+    path = tmp_path/"manifest.json"
+    path.write_text("{roto", encoding="utf-8")
+    assert len(manifest.load_manifest(folders, path)["Happy"]) == 2
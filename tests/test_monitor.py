@@ -0,0 +1,77 @@
+# coding=utf-8
+
+import json
+import socket
+from time import monotonic, sleep
+from urllib.request import urlopen
+
+import pytest
+
+import monitor
+
+
+def free_port(kind=socket.SOCK_STREAM):
+    with socket.socket(socket.AF_INET, kind) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def message(kind, **fields):
+    return {"station": "pc1", "kind": kind, "time": 100.0, **fields}
+
+
+def test_station_summarizes_a_block():
+    station = monitor.Station("pc1")
+    station.update(message("bloque", uid="4321", block=1, task="Cara", trials=4))
+    station.update(message("ensayo", trial=0, answer="Happy", correct=True, rt_ms=500))
+    station.update(message("ensayo", trial=1, answer="Sad", correct=False, rt_ms=700))
+    station.update(message("ensayo", trial=2, answer="Missed", correct=None, rt_ms=None, dropped_frames=2))
+    state = station.state(now=101.0)
+    assert (state["uid"], state["block"], state["trials"], state["block_trials"]) == ("4321", 1, 3, 4)
+    assert state["accuracy"] == 0.5
+    assert state["miss_rate"] == pytest.approx(1 / 3)
+    assert state["mean_rt_ms"] == 600 and state["median_rt_ms"] == 700
+    assert state["dropped_frames"] == 2
+    assert state["active"] and not state["finished"]
+    assert not station.state(now=100.0 + monitor.stale_after)["active"]
+
+    station.update(message("sesion", status="finalizada"))
+    state = station.state(now=101.0)
+    assert state["finished"] and not state["active"]
+
+
+def test_invalid_datagrams_are_counted():
+    server = monitor.MonitorServer()
+    server.datagram_received(b"no es json", None)
+    server.datagram_received(json.dumps({"kind": "ensayo"}).encode(), None)
+    server.datagram_received(json.dumps(message("bloque", block=2)).encode(), None)
+    assert (server.invalid, server.received) == (2, 1)
+    assert [state["block"] for state in server.snapshot()] == [2]
+
+
+def test_local_server_serves_the_state_and_stops_on_close():
+    http, udp = free_port(), free_port(socket.SOCK_DGRAM)
+    publisher = monitor.start_local(http, udp, station="pc1")
+    server, thread = publisher.server
+    try:
+        with urlopen(f"http://127.0.0.1:{http}/events", timeout=5) as events:
+            publisher.publish("bloque", uid="4321", block=1, task="Cara", trials=10)
+            for line in events:
+                if line.startswith(b"data: "):
+                    assert json.loads(line[6:])["uid"] == "4321"
+                    break
+        publisher.publish("ensayo", trial=0, answer="Happy", correct=True, rt_ms=450)
+        deadline = monotonic() + 5
+        while server.received < 2 and monotonic() < deadline:
+            sleep(0.01)
+        with urlopen(f"http://127.0.0.1:{http}/state", timeout=5) as response:
+            [state] = json.load(response)
+        assert (state["trials"], state["mean_rt_ms"]) == (1, 450)
+        with urlopen(f"http://127.0.0.1:{http}/", timeout=5) as response:
+            assert "textContent" in response.read().decode("utf-8")
+    finally:
+        publisher.close()
+    assert not thread.is_alive()
+    with pytest.raises(OSError):
+        urlopen(f"http://127.0.0.1:{http}/state", timeout=1)
+    publisher.close()  # cerrar dos veces no falla
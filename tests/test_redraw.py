@@ -0,0 +1,68 @@
+# coding=utf-8
+
+import pytest
+
+import scheduler
+
+
+@pytest.fixture
+def dirty(experiment, monkeypatch):
+    monkeypatch.setattr(experiment, "dirty_rects", True)
+    experiment.clear_screen()
+    return experiment
+
+
+def square(experiment, color, center, size=20):
+    surface = experiment.pygame.Surface((size, size))
+    surface.fill(experiment.Color(color))
+    return surface, surface.get_rect(center=center)
+
+
+def full_redraw(experiment, items):
+    screen = experiment.screen.copy()
+    screen.fill(experiment.background)
+    for surface, rect in items:
+        screen.blit(surface, rect)
+    return experiment.pygame.surfarray.array3d(screen)
+
+
+def test_only_the_changed_regions_are_redrawn(dirty):
+    fixation = [(dirty.fix, dirty.fixbox)]
+    assert dirty.redraw(fixation) == [dirty.fixbox]
+
+    stimulus = [square(dirty, "red", (40, 40)), square(dirty, "blue", (100, 60))]
+    changed = dirty.redraw(stimulus)
+    # La cruz se borra y se dibujan los dos cuadros
+    assert changed == [dirty.fixbox, stimulus[0][1], stimulus[1][1]]
+    assert (dirty.pygame.surfarray.array3d(dirty.screen) == full_redraw(dirty, stimulus)).all()
+
+    assert dirty.redraw([]) == [stimulus[0][1], stimulus[1][1]]
+    assert (dirty.pygame.surfarray.array3d(dirty.screen) == full_redraw(dirty, [])).all()
+
+
+def test_clear_screen_forgets_the_drawn_regions(dirty):
+    dirty.redraw([square(dirty, "red", (40, 40))])
+    assert dirty.clear_screen() is None
+    item = square(dirty, "blue", (100, 60))
+    assert dirty.redraw([item]) == [item[1]]
+
+
+def test_full_screen_mode_returns_no_rects(experiment, monkeypatch):
+    monkeypatch.setattr(experiment, "dirty_rects", False)
+    item = square(experiment, "red", (40, 40))
+    assert experiment.redraw([item]) is None
+    assert (experiment.pygame.surfarray.array3d(experiment.screen) == full_redraw(experiment, [item])).all()
+
+
+@pytest.mark.parametrize("partial, rects, expected", [
+    (True, [(0, 0, 4, 4)], ("update", [(0, 0, 4, 4)])),
+    (True, None, ("flip",)),  # p.ej. después de una diapositiva
+    (False, [(0, 0, 4, 4)], ("flip",)),
+])
+def test_scheduler_pushes_only_the_changed_rects(monkeypatch, partial, rects, expected):
+    pushed = []
+    monkeypatch.setattr(scheduler.pygame.display, "update", lambda rects: pushed.append(("update", rects)))
+    monkeypatch.setattr(scheduler.pygame.display, "flip", lambda: pushed.append(("flip",)))
+    frames = scheduler.FrameScheduler(refresh_rate=1000, partial_updates=partial)
+    frames.present("estimulo", 1, rects)
+    assert pushed == [expected]
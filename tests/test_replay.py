@@ -0,0 +1,90 @@
+# coding=utf-8
+
+import pytest
+
+import replay
+import results
+import telemetry
+
+ms = 1_000_000
+
+
+def row(image, face, word, answer, rt_us, block):
+    return ["4321", image, block, "", face, word, "Cara", answer, "", rt_us, ""]
+
+
+@pytest.fixture
+def session(tmp_path):
+    path = tmp_path/"2024-05-01_10-20-30_4321_F_C.csv"
+    writer = results.ResultWriter(path)
+    writer.write(row("001", "Happy", "Happy", "Happy", 600_000, 1))
+    writer.write(row("002", "Happy", "Sad", "Happy", 700_000, 1))
+    writer.write(row("003", "Happy", "Sad", "Missed", "", 2))
+    writer.close()
+
+    # Solo el bloque 1 tiene telemetría; el 2 se arma con las duraciones nominales
+    log = telemetry.Telemetry(capacity=64)
+    log.record("inicio", t=0, trial=-1)
+    for trial, start in enumerate((500 * ms, 3400 * ms)):
+        log.record("fijacion", t=start, trial=trial)
+        log.record("estimulo", t=start + 1000 * ms, trial=trial)
+        log.record("iti", t=start + 1800 * ms, trial=trial)
+    log.record("fin", t=6300 * ms, trial=-1)
+    log.dump(telemetry.sidecar_path(path, 1))
+    return path
+
+
+def test_timeline_uses_telemetry_and_falls_back_to_nominal(experiment, session):
+    segments = replay.session_timeline(session, experiment, slides=False)
+    assert [(segment["Bloque"], segment["Fase"]) for segment in segments] == [
+        (1, "inicio"), (1, "fijacion"), (1, "estimulo"), (1, "iti"), (1, "fijacion"), (1, "estimulo"), (1, "iti"),
+        (2, "inicio"), (2, "fijacion"), (2, "estimulo"), (2, "iti")]
+    assert [segment["DuracionMs"] for segment in segments[:7]] == [500, 1000, 800, 1100, 1000, 800, 1100]
+    assert segments[1]["TiempoNs"] == 500 * ms
+    assert segments[5]["TReaccionMs"] == 700
+
+    nominal = segments[7:]
+    assert nominal[0]["DuracionMs"] == experiment.initial_blank_time
+    assert nominal[1]["DuracionMs"] == experiment.fixation_time
+    # Sin respuesta la cara queda toda la ventana
+    assert nominal[2]["DuracionMs"] == experiment.stimulus_time + experiment.answer_time
+    assert nominal[3]["DuracionMs"] == sum(experiment.iti_range) / 2
+    assert [segment["Ensayo"] for segment in segments if segment["Fase"] == "estimulo"] == [0, 1, 2]
+    assert segments[-1]["InicioMs"] == pytest.approx(sum(segment["DuracionMs"] for segment in segments[:-1]))
+
+
+def test_timeline_with_slides(experiment, session):
+    segments = replay.session_timeline(session, experiment, fps=100, slide_ms=2000)
+    slides = [segment for segment in segments if segment["Fase"] == "diapositiva"]
+    assert len(slides) == 6
+    assert {(segment["DuracionMs"], segment["Cuadros"]) for segment in slides} == {(2000, 200)}
+    assert segments[0]["Fase"] == "diapositiva"
+
+
+def test_split_cuts_only_at_trial_or_slide_starts():
+    phases = ["diapositiva", "inicio"] + ["fijacion", "estimulo", "iti"] * 6
+    segments = [{"Segmento": number, "Fase": phase, "Cuadros": 60 if phase == "diapositiva" else 1}
+                for number, phase in enumerate(phases)]
+    chunks = replay.split(segments, 3)
+    assert [segment for chunk in chunks for segment in chunk] == segments
+    assert len(chunks) == 3
+    assert all(chunk[0]["Fase"] in ("diapositiva", "fijacion") for chunk in chunks)
+    # Con video el costo es el número de cuadros: la diapositiva larga ocupa sola un rango
+    chunks = replay.split(segments, 2, video=True)
+    assert [segment["Fase"] for segment in chunks[0]] == ["diapositiva", "inicio"]
+
+
+def test_render_chunk_saves_repeated_screens_once(experiment, session, tmp_path, monkeypatch):
+    monkeypatch.setattr(replay, "renderer", experiment)
+    segments = replay.session_timeline(session, experiment, slides=False)
+    settings = {"out": str(tmp_path), "video": False, "fps": 60, "resolution": (320, 240), "scale": 0.5,
+                "annotate": False}
+    written, _ = replay.render_chunk((0, segments, settings))
+    assert [number for number, _, _ in written] == [segment["Segmento"] for segment in segments]
+    names = {segment["Fase"]: set() for segment in segments}
+    for segment, (_, name, _) in zip(segments, written):
+        names[segment["Fase"]].add(name)
+    assert len(names["fijacion"]) == 1
+    assert len(names["estimulo"]) == 3
+    image = experiment.pygame.image.load(str(tmp_path/next(iter(names["estimulo"]))))
+    assert image.get_size() == (160, 120)
@@ -0,0 +1,53 @@
+# coding=utf-8
+
+from pathlib import Path
+
+import results
+
+
+def row(image, word, block=1):
+    return ["4321", image, block, 500, "Happy", word, "Cara", "Happy", 1, 500000, 560000]
+
+
+def write_rows(path, rows):
+    writer = results.ResultWriter(path)
+    for values in rows:
+        writer.write(values)
+    writer.close()
+
+
+def test_writer_appends_and_read_session_groups_blocks(tmp_path):
+    path = tmp_path/"sesion.csv"
+    write_rows(path, [row("001", "Happy"), row("002", "Sad")])
+    write_rows(path, [row("003", "Happy", block=2)])  # reanudada: no repite el encabezado
+    session = results.read_session(path)
+    assert session["columns"] == list(results.columns)
+    assert [r["IdImagen"] for r in session["rows"]] == ["001", "002", "003"]
+    assert sorted(session["blocks"]) == [1, 2]
+    assert session["last_block"] == 2
+    assert not session["torn"]
+
+
+def test_read_session_drops_a_torn_last_line(tmp_path):
+    path = tmp_path/"sesion.csv"
+    write_rows(path, [row("001", "Happy"), row("002", "Sad")])
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("4321,003,1,5")  # corte a mitad de fila
+    session = results.read_session(path)
+    assert [r["IdImagen"] for r in session["rows"]] == ["001", "002"]
+    assert session["torn"]
+
+
+def test_read_session_of_an_empty_file(tmp_path):
+    path = tmp_path/"vacio.csv"
+    path.write_text("", encoding="utf-8")
+    session = results.read_session(path)
+    assert session["rows"] == [] and session["last_block"] is None
+
+
+def test_remaining_trials_removes_each_answered_pair_once():
+    image_id = lambda image: Path(image).stem
+    block = [("a/001.jpg", "Happy"), ("a/001.jpg", "Sad"), ("a/002.jpg", "Happy"), ("a/001.jpg", "Happy")]
+    done = [{"IdImagen": "001", "Palabra": "Happy"}, {"IdImagen": "002", "Palabra": "Happy"}]
+    assert results.remaining_trials(block, done, image_id) == [("a/001.jpg", "Sad"), ("a/001.jpg", "Happy")]
+    assert results.remaining_trials(block, [], image_id) == block
@@ -0,0 +1,76 @@
+# coding=utf-8
+
+import os
+from time import sleep
+
+import pytest
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+import pygame
+
+from scheduler import FrameScheduler
+
+
+@pytest.fixture
+def scheduler():
+    # Si otra prueba ya abrió la pantalla (el experimento) se usa esa y no se cierra
+    opened = pygame.display.get_surface() is None
+    if opened:
+        pygame.display.init()
+        pygame.display.set_mode((16, 16))
+    yield FrameScheduler(refresh_rate=100)  # cuadros de 10 ms, sin vsync: flips al ritmo nominal
+    if opened:
+        pygame.display.quit()
+
+
+class Stop:
+    """Event dispatcher stand-in that ends the wait at once"""
+
+    def wait_until(self, deadline_ns, until=None):
+        return True
+
+
+def test_frames_rounds_to_whole_frames(scheduler):
+    assert [scheduler.frames(ms) for ms in (1, 14, 15, 200, 1000)] == [1, 1, 2, 20, 100]
+
+
+def test_phases_last_their_frames(scheduler):
+    scheduler.present("fijacion", 5)
+    assert not scheduler.hold()
+    scheduler.present("estimulo", 2)
+    scheduler.hold()
+    scheduler.present("iti", 1)
+    durations = {phase: (requested, achieved) for phase, requested, achieved, _ in scheduler.durations()}
+    assert durations["fijacion"][0] == pytest.approx(50)
+    assert durations["fijacion"][1] == pytest.approx(50, abs=5)
+    assert durations["estimulo"][1] == pytest.approx(20, abs=5)
+    assert scheduler.frame_count == 8
+    assert scheduler.dropped_frames == 0
+
+
+def test_dropped_frames_do_not_lengthen_a_phase(scheduler):
+    scheduler.present("estimulo", 6)
+    sleep(0.035)  # se pierden unos tres cuadros
+    scheduler.hold()
+    scheduler.present("respuesta", 1)
+    (_, _, achieved, _), = scheduler.durations()
+    assert scheduler.dropped_frames >= 2
+    assert achieved == pytest.approx(60, abs=10)
+    assert "cuadros perdidos" in scheduler.report()
+
+
+def test_hold_ends_early_when_the_dispatcher_stops(scheduler):
+    scheduler.present("respuesta", 50)
+    assert scheduler.hold(Stop()) is True
+    scheduler.present("iti", 1)
+    (phase, _, achieved, interrupted), = scheduler.durations()
+    assert phase == "respuesta" and interrupted and achieved < 50
+    assert "todas interrumpidas" in scheduler.report()
+
+
+def test_resync_does_not_count_a_pause_as_dropped_frames(scheduler):
+    scheduler.present("fin", 1)
+    scheduler.resync()
+    sleep(0.05)  # p.ej. una diapositiva de texto
+    scheduler.present("inicio", 1)
+    assert scheduler.dropped_frames == 0
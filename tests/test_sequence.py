@@ -0,0 +1,75 @@
+# coding=utf-8
+
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+import sequence
+
+
+def pools(faces):
+    return ([Path("media/images/Happy")/f"{i:03d}_h.jpg" for i in range(faces)],
+            [Path("media/images/Sad")/f"{i:03d}_s.jpg" for i in range(faces)])
+
+
+def longest_run(values):
+    longest = run = 1
+    for previous, current in zip(values, values[1:]):
+        run = run + 1 if current == previous else 1
+        longest = max(longest, run)
+    return longest
+
+
+def test_blocks_cross_every_face_with_both_words():
+    happy, sad = pools(8)
+    plan = sequence.make_plan(happy, sad, seed=3, blocks=3, faces=8, candidates=2000)
+    assert len(plan["blocks"]) == 3
+    for block in plan["blocks"]:
+        trials = block["trials"]
+        assert len(trials) == 32
+        assert Counter((sequence.face_type(image), word) for image, word in trials) == {
+            condition: 8 for condition in sequence.conditions}
+        assert all(count == 2 for count in Counter(image for image, _ in trials).values())
+
+
+def test_best_order_respects_the_constraints():
+    happy, sad = pools(10)
+    plan = sequence.make_plan(happy, sad, seed=11, blocks=1, faces=10, max_run=3, candidates=5000)
+    trials = plan["blocks"][0]["trials"]
+    assert plan["blocks"][0]["stats"]["violations"] == 0
+    conditions = [(sequence.face_type(image), word) for image, word in trials]
+    congruent = [face == word for face, word in conditions]
+    assert longest_run(conditions) <= 3
+    assert longest_run(congruent) <= 3
+    assert all(a[0] != b[0] for a, b in zip(trials, trials[1:]))
+
+
+def test_score_counts_runs_and_repeated_images():
+    codes = np.array([0, 0, 0, 0, 1])  # cuatro HH seguidos
+    images = np.array([0, 1, 2, 3, 4])
+    _, violations, _ = sequence.score(np.arange(5)[None, :], codes, images, max_run=3)
+    assert violations[0] == 2  # racha de congruentes y racha de la misma condición
+    _, violations, _ = sequence.score(np.array([[0, 4, 1, 2, 3]]), codes, np.array([0, 0, 1, 2, 3]), max_run=5)
+    assert violations[0] == 0
+    _, violations, _ = sequence.score(np.arange(5)[None, :], codes, np.array([0, 0, 1, 2, 3]), max_run=5)
+    assert violations[0] == 1  # la misma imagen dos veces seguidas
+
+
+def test_same_seed_same_plan():
+    happy, sad = pools(6)
+    first = sequence.make_plan(happy, sad, uid="t", seed=5, faces=6, candidates=1000)
+    second = sequence.make_plan(happy, sad, uid="t", seed=5, faces=6, candidates=1000)
+    assert [block["trials"] for block in first["blocks"]] == [block["trials"] for block in second["blocks"]]
+
+
+def test_saved_plan_round_trip(tmp_path):
+    happy, sad = pools(4)
+    plan = sequence.make_plan(happy, sad, uid="4321", seed=9, faces=4, candidates=500)
+    path = sequence.save_plan(plan, tmp_path)
+    assert path == tmp_path/"4321_9.json"
+    assert sequence.latest_plan("4321", tmp_path) == path
+    assert sequence.latest_plan("otro", tmp_path) is None
+    loaded = sequence.load_plan(path)
+    assert [[(Path(image).relative_to(sequence.script_path), word) for image, word in block["trials"]]
+            for block in loaded["blocks"]] == [block["trials"] for block in plan["blocks"]]
@@ -0,0 +1,81 @@
+# coding=utf-8
+
+import pytest
+
+import results
+from session_store import SessionStore
+from telemetry import Telemetry, sidecar_path
+
+
+def row(uid, image, face, word, answer, correct, rt_us, block=1, task="Cara"):
+    return [uid, image, block, rt_us // 1000 if rt_us else 1000, face, word, task, answer, correct,
+            rt_us or "", rt_us + 60000 if rt_us else ""]
+
+
+def write_session(path, rows):
+    writer = results.ResultWriter(path)
+    for values in rows:
+        writer.write(values)
+    writer.close()
+    return path
+
+
+@pytest.fixture
+def data(tmp_path):
+    first = write_session(tmp_path/"2024-05-01_10-00-00_1111_F_C.csv", [
+        row("1111", "001_ha_c", "Happy", "Happy", "Happy", 1, 500000),
+        row("1111", "001_ha_c", "Happy", "Sad", "Happy", 1, 600000),
+        row("1111", "002_sa_o", "Sad", "Happy", "Missed", "", None),
+    ])
+    second = write_session(tmp_path/"2024-05-02_10-00-00_2222_T_P.csv", [
+        row("2222", "001_ha_c", "Happy", "Happy", "Sad", 0, 700000, task="Palabra"),
+        row("2222", "001_ha_c", "Happy", "Sad", "Sad", 1, 400000, task="Palabra"),
+    ])
+    log = Telemetry(capacity=8)
+    log.trial = 0
+    log.record("trigger_encolado", 11, t=1000)
+    log.record("trigger_escrito", 11, t=2000)
+    log.record("estimulo", t=1500)
+    log.dump(sidecar_path(first, 1))
+    return [first, second]
+
+
+def test_ingest_loads_sessions_trials_and_triggers(data, tmp_path):
+    with SessionStore(tmp_path/"sessions.sqlite") as store:
+        assert store.ingest(data) == (2, 0)
+        columns, sessions = store.sessions()
+        sessions = [dict(zip(columns, values)) for values in sessions]
+        assert [(s["subject"], s["happy_key"], s["first_block"], s["date"], s["trials"]) for s in sessions] == [
+            ("1111", "F", "C", "2024-05-01_10-00-00", 3), ("2222", "T", "P", "2024-05-02_10-00-00", 2)]
+        _, triggers = store.query("SELECT block, trial, event, code FROM triggers")
+        assert triggers == [(1, 0, "trigger_encolado", 11), (1, 0, "trigger_escrito", 11)]
+        _, [(rt_ms, release_us, condition, congruent)] = store.query(
+            "SELECT rt_ms, release_us, condition, congruent FROM trials WHERE subject = '1111' AND trial = 1")
+        assert (rt_ms, release_us, condition, congruent) == (600.0, 660000, "HS", 0)
+
+
+def test_cross_session_queries(data, tmp_path):
+    with SessionStore(tmp_path/"sessions.sqlite") as store:
+        store.ingest(data)
+        columns, rows = store.mean_rt_per_image()
+        by_image = {values[0]: dict(zip(columns, values)) for values in rows}
+        assert by_image["001_ha_c"]["subjects"] == 2 and by_image["001_ha_c"]["n"] == 4
+        assert by_image["001_ha_c"]["rt_ms"] == pytest.approx(500)  # aciertos: 500, 600, 400
+        assert by_image["001_ha_c"]["accuracy"] == pytest.approx(0.75)
+        assert "002_sa_o" not in by_image  # omisión
+        _, rows = store.mean_rt_per_condition("1111")
+        assert [(task, condition, missed) for _, task, condition, _, _, _, missed in rows] == [
+            ("Cara", "HH", 0), ("Cara", "HS", 0), ("Cara", "SH", 1)]
+
+
+def test_unchanged_files_are_skipped_and_changed_ones_replaced(data, tmp_path):
+    path = tmp_path/"sessions.sqlite"
+    with SessionStore(path) as store:
+        store.ingest(data)
+    write_session(data[1], [row("2222", "002_sa_o", "Sad", "Sad", "Sad", 1, 450000, block=2, task="Cara")])
+    with SessionStore(path) as store:
+        assert store.ingest(data) == (1, 1)
+        _, [(count,)] = store.query("SELECT COUNT(*) FROM trials WHERE subject = '2222'")
+        assert count == 3
+        _, [(sessions,)] = store.query("SELECT COUNT(*) FROM sessions")
+        assert sessions == 2
@@ -0,0 +1,36 @@
+# coding=utf-8
+
+import numpy as np
+import pytest
+
+import simulate
+
+
+@pytest.mark.parametrize("df, expected", [(5, 2.571), (10, 2.228), (29, 2.045), (100, 1.984)])
+def test_t_critical_matches_the_two_sided_table(df, expected):
+    assert simulate.t_critical(0.05, df) == pytest.approx(expected, abs=0.002)
+
+
+def test_power_is_two_sided():
+    rng = np.random.default_rng(1)
+    effects = rng.normal(30, 20, 4000)
+    assert simulate.power(effects, 20) > 0.95
+    assert simulate.power(-effects, 20) == simulate.power(effects, 20)
+    assert simulate.power(rng.normal(0, 20, 40000), 20) == pytest.approx(0.05, abs=0.02)
+    assert simulate.power(effects[:10], 20) is None
+
+
+def test_simulate_with_the_experiment_design():
+    data, summary = simulate.simulate(sessions=20, workers=1, seed=3, participants=(10,))
+    assert len(data["duration"]) == 20
+    assert [block["tarea"] for block in summary["bloques"]] == ["Cara", "Palabra"]
+
+
+def test_first_task_comes_from_the_design():
+    experiment = simulate.load_experiment(headless=True, discover=False)
+    design = {**simulate.design_defaults(experiment), "faces": 4, "candidates": 200, "first": "P"}
+    layout = simulate.plan_layout(design, seed=1)
+    assert layout["tasks"] == ["Palabra", "Cara"]
+    first = layout["block"] == 0
+    assert (layout["expected"][first] == layout["word"][first]).all()
+    assert (layout["expected"][~first] == layout["face"][~first]).all()
@@ -0,0 +1,71 @@
+# coding=utf-8
+
+import numpy as np
+import pygame
+import pytest
+
+import stimuli
+
+
+def random_surface(size=(40, 30), seed=0, alpha=False):
+    rng = np.random.default_rng(seed)
+    surface = pygame.Surface(size, pygame.SRCALPHA if alpha else 0, 32)
+    pygame.surfarray.blit_array(surface, rng.integers(0, 256, (*size, 3)).astype(np.uint32) @ [1 << 16, 1 << 8, 1])
+    return surface
+
+
+def test_grayscale_matches_the_per_pixel_formula():
+    surface = random_surface()
+    gray = stimuli.grayscale(surface)
+    original = pygame.surfarray.array3d(surface)
+    result = pygame.surfarray.array3d(gray)
+    for x, y in ((0, 0), (7, 3), (39, 29), (20, 15)):
+        r, g, b = (int(value) for value in original[x, y])
+        # Misma fórmula que el bucle de pixeles original (int trunca)
+        assert result[x, y].tolist() == [int(0.299 * r + 0.587 * g + 0.114 * b)] * 3
+    assert (pygame.surfarray.array3d(surface) == original).all()  # la original no cambia
+
+
+def test_grayscale_keeps_alpha_and_accepts_8_bit_surfaces():
+    surface = random_surface(alpha=True)
+    pygame.surfarray.pixels_alpha(surface)[:] = 128
+    gray = stimuli.grayscale(surface)
+    assert gray.get_flags() & pygame.SRCALPHA
+    assert (pygame.surfarray.array_alpha(gray) == 128).all()
+
+    paletted = pygame.Surface((10, 10), 0, 8)
+    paletted.fill((200, 10, 10))
+    r, g, b = paletted.get_at((5, 5))[:3]  # el color más cercano de la paleta
+    assert stimuli.grayscale(paletted).get_at((5, 5))[:3] == (int(0.299 * r + 0.587 * g + 0.114 * b),) * 3
+
+
+@pytest.mark.parametrize("smooth", [False, True])
+def test_scale_keeps_the_aspect_ratio(smooth):
+    assert stimuli.scale(random_surface((400, 300)), 350, smooth).get_size() == (350, 262)
+
+
+def test_normalize_matches_mean_and_contrast():
+    surfaces = [stimuli.grayscale(random_surface(seed=seed)) for seed in range(3)]
+    dark = surfaces[0].copy()
+    pygame.surfarray.pixels3d(dark)[:] //= 3
+    surfaces.append(dark)
+    normalized = stimuli.normalize(surfaces, mean=100, std=20)
+    for surface in normalized:
+        lum = stimuli.luminance(surface)
+        assert lum.mean() == pytest.approx(100, abs=1)
+        assert lum.std() == pytest.approx(20, abs=1)
+    assert stimuli.normalize([]) == []
+
+
+def test_process_folders_saves_the_processed_set(tmp_path):
+    folder = tmp_path/"Happy"
+    folder.mkdir()
+    for number in range(2):
+        pygame.image.save(random_surface((80, 60), seed=number), str(folder/f"00{number}.png"))
+    (folder/"roto.jpg").write_bytes(b"no es una imagen")
+    processed = stimuli.process_folders([folder], 40, tmp_path/"out")
+    assert sorted(path.name for path in processed) == ["000.png", "001.png"]
+    saved = pygame.image.load(str(tmp_path/"out"/"Happy"/"001.png"))
+    assert saved.get_size() == (40, 30)
+    pixels = pygame.surfarray.array3d(saved)
+    assert (pixels[..., 0] == pixels[..., 1]).all()
@@ -0,0 +1,41 @@
+# coding=utf-8
+
+import telemetry
+
+
+def test_triggers_pair_in_order_within_each_code():
+    records = [
+        (-1, "trigger_escrito", 51, 5_000_000),  # encolado antes de limpiar: sin pareja
+        (0, "trigger_encolado", 1, 10_000_000),
+        (0, "trigger_encolado", 21, 11_000_000),
+        (0, "trigger_escrito", 1, 12_000_000),
+        (0, "trigger_escrito", 21, 14_000_000),
+        (1, "trigger_encolado", 1, 20_000_000),
+        (1, "trigger_escrito", 1, 20_500_000),
+    ]
+    assert telemetry.pair_triggers(records) == [2.0, 3.0, 0.5]
+
+
+def test_summary_measures_intervals_per_trial():
+    log = telemetry.Telemetry(capacity=64)
+    for trial, start in enumerate((0, 100_000_000)):
+        log.trial = trial
+        log.record("fijacion", t=start)
+        log.record("estimulo", t=start + 1_000_000_000)
+        log.record("trigger_encolado", 11, t=start + 1_000_000_000)
+        log.record("trigger_escrito", 11, t=start + 1_001_000_000)
+    lines = {tuple(line.split()[:3]): line.split()[3:] for line in log.summary().splitlines()[1:]}
+    assert lines[("fijacion", "->", "estimulo")][:3] == ["n=", "2", "1000.000"]
+    assert lines[("trigger_encolado", "->", "trigger_escrito")][:3] == ["n=", "2", "1.000"]
+
+
+def test_ring_keeps_the_newest_records(tmp_path):
+    log = telemetry.Telemetry(capacity=4)
+    for t in range(6):
+        log.record("tecla_presionada", code=t, t=t)
+    assert log.overwritten == 2
+    assert [code for _, _, code, _ in log.records()] == [2, 3, 4, 5]
+    path = log.dump(tmp_path/"t.csv")
+    assert [record[2] for record in telemetry.read_dump(path)] == [2, 3, 4, 5]
+    log.clear()
+    assert log.records() == [] and log.trial == -1
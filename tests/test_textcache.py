@@ -0,0 +1,47 @@
+# coding=utf-8
+
+import pygame
+
+from textcache import TextCache
+
+
+class Font:
+    """pygame Font stand-in that counts renders"""
+
+    def __init__(self):
+        self.rendered = []
+
+    def render(self, text, antialias, color):
+        self.rendered.append(text)
+        return pygame.Surface((len(text) + 1, 10))
+
+
+def test_each_text_is_rendered_once():
+    font, cache = Font(), TextCache()
+    first = cache.render(font, "FELIZ", "red")
+    assert cache.render(font, "FELIZ", (255, 0, 0)) is first  # mismo color con otro formato
+    cache.render(font, "FELIZ", "black")
+    cache.render(font, "FELIZ", "black", antialias=False)
+    assert font.rendered == ["FELIZ"] * 3
+    assert cache.stats() == {"entries": 3, "hits": 1, "misses": 3}
+
+
+def test_least_recently_used_entry_is_evicted():
+    font, cache = Font(), TextCache(max_entries=2)
+    cache.render(font, "a", "black")
+    cache.render(font, "b", "black")
+    cache.render(font, "a", "black")  # "b" pasa a ser la menos usada
+    cache.render(font, "c", "black")
+    cache.render(font, "a", "black")
+    cache.render(font, "b", "black")
+    assert font.rendered == ["a", "b", "c", "b"]
+    assert cache.stats()["entries"] == 2
+
+
+def test_clear_resets_the_counters():
+    font, cache = Font(), TextCache()
+    cache.render(font, "a", "black")
+    cache.clear()
+    assert cache.stats() == {"entries": 0, "hits": 0, "misses": 0}
+    cache.render(font, "a", "black")
+    assert font.rendered == ["a", "a"]
@@ -0,0 +1,54 @@
+# coding=utf-8
+
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def image(experiment, tmp_path, monkeypatch):
+    pygame = experiment.pygame
+    surface = pygame.Surface((80, 60), 0, 32)
+    pygame.surfarray.blit_array(surface, np.random.default_rng(0).integers(0, 1 << 24, (80, 60), dtype=np.uint32))
+    path = tmp_path/"001.png"
+    pygame.image.save(surface, str(path))
+    monkeypatch.setattr(experiment, "stimulus_cache", {})
+    monkeypatch.setattr(experiment, "trial_frames", {})
+    monkeypatch.setattr(experiment, "dirty_rects", False)
+    return path
+
+
+def screen_pixels(experiment):
+    return experiment.pygame.surfarray.array3d(experiment.screen)
+
+
+def test_composite_frame_draws_face_and_word(experiment, image):
+    experiment.redraw(experiment.trial_frame(image, "Sad", 40, grayscale=True))
+    composed = screen_pixels(experiment)
+
+    # Lo mismo dibujado por partes, como antes de los cuadros compuestos
+    picture = experiment.prepare_image(image, 40, grayscale=True)
+    phrase = experiment.text_cache.render(experiment.char, experiment.text_convertor["Sad"], experiment.word_color)
+    experiment.screen.fill(experiment.background)
+    experiment.screen.blit(picture, experiment.image_in_center(picture))
+    experiment.screen.blit(phrase, phrase.get_rect(centerx=experiment.center[0], top=experiment.center[1] - 20))
+    assert (composed == screen_pixels(experiment)).all()
+
+
+def test_pairs_are_built_once_before_the_blocks(experiment, image):
+    blocks = [[(image, "Happy"), (image, "Sad")], [(image, "Sad"), (image, "Happy")]]
+    experiment.build_trial_frames(blocks, 40, grayscale=True)
+    assert set(experiment.trial_frames) == {(image, "Happy"), (image, "Sad")}
+    frame, framebox = experiment.trial_frames[(image, "Sad")]
+    assert frame.get_size() == framebox.size
+    assert experiment.trial_frame(image, "Sad", 40, grayscale=True) == [experiment.trial_frames[(image, "Sad")]]
+
+
+def test_frames_over_budget_are_composed_during_the_trial(experiment, image, capsys):
+    experiment.build_trial_frames([[(image, "Happy")]], 40, grayscale=True, budget=0)
+    assert experiment.trial_frames == {}
+    assert "1 pares se compondrán durante el ensayo" in capsys.readouterr().out
+    [(frame, framebox)] = experiment.trial_frame(image, "Happy", 40, grayscale=True)
+    assert framebox.contains(frame.get_rect(center=experiment.center).clip(framebox))
+    broken = image.with_name("roto.png")
+    broken.write_bytes(b"no es una imagen")
+    assert experiment.trial_frame(broken, "Happy", 40) == []
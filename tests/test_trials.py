@@ -0,0 +1,72 @@
+# coding=utf-8
+
+import tracemalloc
+from pathlib import Path
+
+import pytest
+
+import trials
+
+trigger_helper = {"happy_happy": 11, "sad_sad": 12, "happy_sad": 21, "sad_happy": 22}
+image_list = [("m/Happy/001.jpg", "Happy"), ("m/Sad/002.jpg", "Happy"), ("m/Sad/003.jpg", "Sad")]
+
+
+def prepare(block, **kwargs):
+    return trials.prepare_block(image_list, block, trigger_helper, lambda image: Path(image).stem,
+                                lambda image: Path(image).parent.name, **kwargs)
+
+
+def test_records_are_computed_before_the_block():
+    frames = []
+    block = prepare(1, frame=lambda image, word: frames.append((image, word)) or len(frames),
+                    iti_frames=iter((60, 66, 72)).__next__)
+    assert [(trial.image_id, trial.image_type, trial.trigger) for trial in block] == [
+        ("001", "Happy", 11), ("002", "Sad", 22), ("003", "Sad", 12)]
+    assert [trial.frame for trial in block] == [1, 2, 3] and frames == image_list
+    assert [trial.iti_frames for trial in block] == [60, 66, 72]
+    assert [trial.index for trial in block] == [0, 1, 2]
+
+
+def test_expected_answer_follows_the_task():
+    assert [(trial.task, trial.expected) for trial in prepare(1)] == [
+        ("Cara", "Happy"), ("Cara", "Sad"), ("Cara", "Sad")]
+    assert [trial.expected for trial in prepare(2)] == ["Happy", "Happy", "Sad"]
+    # La especificación decide, no el número de bloque
+    by_word = prepare(1, task="Palabra", answer="word")
+    assert {trial.task for trial in by_word} == {"Palabra"}
+    assert [trial.expected for trial in by_word] == ["Happy", "Happy", "Sad"]
+
+
+def test_score_and_row():
+    assert trials.score("Happy", "Happy") is True
+    assert trials.score("Sad", "Happy") is False
+    assert trials.score("Missed", "Happy") is None
+    assert trials.score(None, "Happy") is None
+
+    trial = prepare(1)[1]
+    assert trial.row("4321", 1) == ["4321", "002", 1, None, "Sad", "Happy", "Cara", None, None, None, None]
+    trial.rt, trial.rt_us, trial.release_us, trial.selected_answer = 120, 420_000, 510_000, "Sad"
+    trial.is_correct = trials.score(trial.selected_answer, trial.expected)
+    assert trial.row("4321", 1) == ["4321", "002", 1, 120, "Sad", "Happy", "Cara", "Sad", 1, 420_000, 510_000]
+    with pytest.raises(AttributeError):
+        trial.extra = 1  # __slots__: sin diccionario por ensayo
+
+
+def test_allocation_audit_measures_each_trial():
+    audit = trials.AllocationAudit(3)
+    audit.start()
+    kept = []
+    try:
+        for index in range(3):
+            audit.begin_trial()
+            if index == 1:
+                kept.append(bytearray(100_000))
+            audit.end_trial(index)
+    finally:
+        report = audit.stop()
+    assert not tracemalloc.is_tracing()
+    assert audit.count == 3
+    assert audit.retained[1] >= 100_000 and audit.peak[1] >= 100_000
+    assert audit.retained[0] < 10_000 and audit.retained[2] < 10_000
+    assert "3 ensayos" in report.splitlines()[0]
+    assert "test_trials.py" in report
@@ -0,0 +1,40 @@
+# coding=utf-8
+
+import sys
+
+import pytest
+
+import trigger_devices
+from triggers import TriggerDispatcher
+
+
+@pytest.mark.parametrize("name", ["loopback", pytest.param("pty", marks=pytest.mark.skipif(
+    sys.platform == "win32", reason="pty solo en POSIX"))])
+def test_virtual_port_receives_every_byte_in_order(name):
+    device = trigger_devices.open_virtual(name)
+    try:
+        dispatcher = TriggerDispatcher(serial_port=device.port, pulse_ms=1)
+        codes = [1, 11, 255, 100, 0x0a, 0x0d]  # salto de línea y retorno no se traducen
+        for code in codes:
+            dispatcher.send(code)
+        dispatcher.close()
+        assert device.wait(len(codes))
+        assert [byte for byte, _ in device.received] == codes
+        assert all(received >= queued for (_, received), (_, queued, *_) in zip(device.received, dispatcher.log))
+    finally:
+        device.close()
+
+
+def test_virtual_lpt_records_code_and_reset():
+    lpt = trigger_devices.VirtualLpt()
+    dispatcher = TriggerDispatcher(lpt=lpt, lpt_address=0x378, pulse_ms=1)
+    dispatcher.send(51)
+    dispatcher.close()
+    assert [value for value, _ in lpt.received] == [51, 0]
+    lpt.clear()
+    assert lpt.received == []
+
+
+def test_unknown_virtual_port():
+    with pytest.raises(ValueError):
+        trigger_devices.open_virtual("usb")
@@ -0,0 +1,61 @@
+# coding=utf-8
+
+from time import perf_counter_ns
+
+from telemetry import Telemetry
+from triggers import TriggerDispatcher
+
+
+class Lpt:
+    """dlportio stand-in that records every value written"""
+
+    def __init__(self):
+        self.values = []
+
+    def DlPortWritePortUchar(self, address, value):
+        self.values.append((address, value, perf_counter_ns()))
+
+
+class BrokenSerial:
+    def write(self, data):
+        raise OSError("puerto desconectado")
+
+
+def test_pulses_keep_their_order_width_and_never_overlap():
+    lpt = Lpt()
+    dispatcher = TriggerDispatcher(lpt=lpt, lpt_address=0x378, pulse_ms=2)
+    codes = [1, 11, 100, 1, 21, 200]
+    for code in codes:
+        dispatcher.send(code)
+    assert dispatcher.flush(2.0)
+    dispatcher.close()
+
+    assert [code for code, *_ in dispatcher.log] == codes
+    assert [value for _, value, _ in lpt.values] == [value for code in codes for value in (code, 0)]
+    assert all(address == 0x378 for address, _, _ in lpt.values)
+    for (_, queued, written, reset, ok), previous in zip(dispatcher.log, [None] + dispatcher.log):
+        assert ok and queued <= written
+        assert reset - written >= 2_000_000
+        if previous is not None:
+            assert written >= previous[3]  # el pulso anterior ya volvió a cero
+
+
+def test_send_does_not_wait_for_the_pulse():
+    dispatcher = TriggerDispatcher(lpt=Lpt(), lpt_address=0, pulse_ms=20)
+    start = perf_counter_ns()
+    for code in (1, 2, 3):
+        dispatcher.send(code)
+    assert perf_counter_ns() - start < 5_000_000
+    dispatcher.close()
+
+
+def test_failed_writes_are_logged_and_summarized():
+    telemetry = Telemetry(capacity=16)
+    dispatcher = TriggerDispatcher(serial_port=BrokenSerial(), pulse_ms=0, names={"fixation": 1},
+                                   telemetry=telemetry)
+    dispatcher.send(1)
+    dispatcher.close()
+    assert dispatcher.log[0][4] is False
+    summary = dispatcher.summary()
+    assert "fixation" in summary and "1 fallidos" in summary
+    assert [(kind, code) for _, kind, code, _ in telemetry.records()] == [("trigger_escrito", 1)]
@@ -0,0 +1,57 @@
+# coding=utf-8
+
+from time import perf_counter_ns
+
+from trials import Trial
+
+
+class Capture:
+    """ResponseCapture stand-in: the key is pressed at press_ns, or when the window asks for it"""
+
+    def __init__(self, onset_ns, press_ns=None, answer="Happy", respond=True):
+        self.onset_ns = onset_ns
+        self.press_ns = press_ns
+        self.answer = answer
+        self.respond = respond
+
+    def __call__(self, event, now):
+        return False
+
+    def pressed(self):
+        if self.press_ns is None and self.respond:
+            self.press_ns = perf_counter_ns()
+        return self.press_ns is not None
+
+    def rt_us(self):
+        return None if self.press_ns is None else (self.press_ns - self.onset_ns) // 1000
+
+
+def trial():
+    return Trial(0, "001.jpg", "Sad", "001", "Happy", "Cara", 21, "Happy")
+
+
+def test_rt_is_measured_from_the_response_window(experiment, monkeypatch):
+    monkeypatch.setattr(experiment, "answer_frames", 30)
+    onset = perf_counter_ns() - 300_000_000  # el estímulo empezó hace 300 ms
+    answered = experiment.wait_answer(trial(), Capture(onset))
+    assert answered.selected_answer == "Happy" and answered.is_correct
+    assert answered.rt_us >= 300_000
+    assert 0 <= answered.rt < 100  # TReaccion: desde el inicio de la ventana de respuesta
+
+
+def test_key_pressed_during_the_stimulus(experiment, monkeypatch):
+    monkeypatch.setattr(experiment, "answer_frames", 30)
+    onset = perf_counter_ns() - 300_000_000
+    answered = experiment.wait_answer(trial(), Capture(onset, press_ns=onset + 150_000_000, answer="Sad"))
+    assert answered.rt == 0
+    assert answered.rt_us == 150_000
+    assert answered.is_correct is False
+
+
+def test_missed_response_lasts_the_window(experiment, monkeypatch):
+    monkeypatch.setattr(experiment, "answer_frames", 6)
+    onset = perf_counter_ns() - 300_000_000
+    answered = experiment.wait_answer(trial(), Capture(onset, respond=False))
+    assert answered.selected_answer == "Missed" and answered.is_correct is None
+    assert answered.rt_us is None
+    assert 80 <= answered.rt < 250  # unos 6 cuadros, sin contar los 300 ms del estímulo
@@ -0,0 +1,45 @@
+# coding=utf-8
+
+"""
+Cache de textos renderizados.
+
+Cada frase se renderiza una sola vez por (fuente, texto, color) y se reutiliza; las entradas
+menos usadas se descartan cuando se supera el máximo. Los contadores de aciertos y fallos
+permiten comprobar que durante los ensayos no se renderiza texto.
+"""
+import pygame
+from collections import OrderedDict
+
+
+class TextCache:
+    """LRU cache of rendered text Surfaces keyed by (font, text, color)"""
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font, text, color, antialias=True):
+        key = (font, text, tuple(pygame.Color(color)), antialias)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return surface
+
+        self.misses += 1
+        surface = font.render(text, antialias, color)
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert_alpha()  # mismo formato que la pantalla, blit más rápido
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_entries:
+            self.surfaces.popitem(last=False)
+        return surface
+
+    def stats(self):
+        return {"entries": len(self.surfaces), "hits": self.hits, "misses": self.misses}
+
+    def clear(self):
+        self.surfaces.clear()
+        self.hits = self.misses = 0
@@ -0,0 +1,121 @@
+# coding=utf-8
+
+"""
+Registros de ensayo precalculados y auditoría de memoria del ciclo de ensayos.
+
+Antes de cada bloque se arma un Trial (con __slots__) por ensayo con todo lo que el ciclo
+necesita: IdImagen, TipoImagen, palabra, código de trigger, respuesta esperada, cuadro
+compuesto y duración del ITI. Durante el bloque el ciclo solo lee esos campos y escribe la
+respuesta en el mismo registro, sin construir Path, f-strings ni diccionarios.
+
+AllocationAudit (modo de auditoría) mide con tracemalloc la memoria que asigna cada ensayo y
+los sitios que más asignaron durante el bloque.
+"""
+import tracemalloc
+from array import array
+
+
+class Trial:
+    """One trial of a block, precomputed before the block; the response fields are filled during it"""
+
+    __slots__ = ("index", "image", "word", "image_id", "image_type", "task", "trigger", "expected", "frame",
+                 "iti_frames", "rt", "rt_us", "release_us", "selected_answer", "is_correct")
+
+    def __init__(self, index, image, word, image_id, image_type, task, trigger, expected, frame=None, iti_frames=0):
+        self.index = index
+        self.image = image
+        self.word = word
+        self.image_id = image_id
+        self.image_type = image_type
+        self.task = task
+        self.trigger = trigger
+        self.expected = expected
+        self.frame = frame
+        self.iti_frames = iti_frames
+        self.rt = None
+        self.rt_us = None
+        self.release_us = None
+        self.selected_answer = None
+        self.is_correct = None
+
+    def row(self, uid, block):
+        """Row of the data file (same columns as results.columns)"""
+        return [uid, self.image_id, block, self.rt, self.image_type, self.word, self.task, self.selected_answer,
+                int(self.is_correct) if self.is_correct is not None else None, self.rt_us, self.release_us]
+
+
+def condition_trigger(face, word, trigger_helper):
+    """Trigger code of a face x word condition (happy_happy, happy_sad, sad_sad, sad_happy)"""
+    return trigger_helper[('happy' if face == 'Happy' else 'sad') + '_' + ('happy' if word == 'Happy' else 'sad')]
+
+
+def score(selected_answer, expected):
+    """True/False for an answer, None when there was no response"""
+    if selected_answer is None or selected_answer == "Missed":
+        return None
+    return selected_answer == expected
+
+
+def prepare_block(image_list, block, trigger_helper, image_id, image_type, frame=None, iti_frames=None, task=None,
+                  answer=None):
+    """Trial records of a block
+
+    image_id and image_type map an image path to IdImagen and TipoImagen; frame(image, word)
+    returns the prepared drawing of the stimulus and iti_frames() the ITI length of a trial.
+    task (TipoRespuesta) and answer ("face"/"word") come from the experiment specification;
+    without them block 1 is answered by the face and any other block by the word.
+    """
+    by_face = answer == "face" if answer is not None else block == 1
+    if task is None:
+        task = "Cara" if by_face else "Palabra"
+    trials = []
+    for index, (image, word) in enumerate(image_list):
+        face = image_type(image)
+        trials.append(Trial(index, image, word, image_id(image), face, task, condition_trigger(face, word, trigger_helper),
+                            face if by_face else word, frame(image, word) if frame is not None else None,
+                            iti_frames() if iti_frames is not None else 0))
+    return trials
+
+
+class AllocationAudit:
+    """Per-trial memory allocated in the trial loop, measured with tracemalloc"""
+
+    def __init__(self, trials, frames=10):
+        self.retained = array('q', bytes(8 * trials))  # memoria que quedó asignada al terminar el ensayo
+        self.peak = array('q', bytes(8 * trials))  # máximo asignado durante el ensayo
+        self.frames = frames
+        self.start_memory = 0
+        self.first = None
+        self.count = 0
+
+    def start(self):
+        tracemalloc.start(self.frames)
+        self.first = tracemalloc.take_snapshot()
+
+    def begin_trial(self):
+        tracemalloc.reset_peak()
+        self.start_memory = tracemalloc.get_traced_memory()[0]
+
+    def end_trial(self, index):
+        current, peak = tracemalloc.get_traced_memory()
+        self.retained[index] = current - self.start_memory
+        self.peak[index] = peak - self.start_memory
+        self.count = max(self.count, index + 1)
+
+    def stop(self, top=10):
+        """Stops tracing, returns the report"""
+        last = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        ignore = (tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__))
+        differences = last.filter_traces(ignore).compare_to(self.first.filter_traces(ignore), "lineno")
+
+        retained = sorted(self.retained[:self.count])
+        peak = sorted(self.peak[:self.count])
+        lines = [f"Memoria por ensayo (tracemalloc, {self.count} ensayos):"]
+        if self.count:
+            lines.append(f"  retenida: mediana {retained[len(retained) // 2]} B, máx {retained[-1]} B, "
+                         f"total {sum(retained)} B")
+            lines.append(f"  pico: mediana {peak[len(peak) // 2]} B, máx {peak[-1]} B")
+        lines.append("  Sitios con más memoria nueva en el bloque:")
+        lines += [f"    {stat}" for stat in differences[:top] if stat.size_diff > 0]
+        return "\n".join(lines)
@@ -0,0 +1,160 @@
+# coding=utf-8
+
+"""
+Puertos de triggers virtuales para probar fuera del PC del laboratorio.
+
+Un dispositivo virtual es el extremo receptor de un puerto: un hilo lee cada byte que llega y
+lo marca con perf_counter_ns, como lo haría el amplificador de EEG. El puerto que se entrega
+al experimento (o a TriggerDispatcher) tiene la misma interfaz que serial.Serial (write,
+close, is_open) o que dlportio (DlPortWritePortUchar), así que el código de envío es el mismo.
+
+- "loopback": par de sockets conectados, funciona en cualquier sistema.
+- "pty": pseudo-terminal (POSIX), el experimento escribe con pyserial como a un puerto real.
+- VirtualLpt: puerto paralelo que registra cada valor escrito (código y vuelta a cero).
+"""
+import os, socket, sys, threading
+from time import perf_counter_ns, sleep
+
+virtual_ports = ("loopback", "pty")
+
+
+class VirtualDevice:
+    """Receiving end of a virtual port: timestamps every byte from a reader thread"""
+
+    def __init__(self):
+        self.received = []  # (byte, perf_counter_ns)
+        self.port = None
+        self.thread = None
+
+    def start(self, read):
+        self.thread = threading.Thread(target=self.read_loop, args=(read,), name="virtual-trigger-device",
+                                       daemon=True)
+        self.thread.start()
+
+    def read_loop(self, read):
+        while True:
+            try:
+                data = read()
+            except OSError:
+                break
+            if not data:
+                break
+            now = perf_counter_ns()
+            self.received.extend((byte, now) for byte in data)
+
+    def wait(self, count, timeout=2.0):
+        """Waits until count bytes were received, returns False on timeout"""
+        deadline = perf_counter_ns() + int(timeout * 1e9)
+        while len(self.received) < count:
+            if perf_counter_ns() > deadline:
+                return False
+            sleep(0.001)
+        return True
+
+    def clear(self):
+        self.received = []
+
+    def close(self):
+        if self.port is not None:
+            self.port.close()
+
+
+class SocketPort:
+    """serial.Serial-like writer over one end of a socket pair"""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.is_open = True
+
+    def write(self, data):
+        self.sock.sendall(data)
+        return len(data)
+
+    def close(self):
+        if self.is_open:
+            self.is_open = False
+            self.sock.close()
+
+
+class LoopbackDevice(VirtualDevice):
+    """Virtual port over a connected socket pair"""
+
+    def __init__(self):
+        super().__init__()
+        sender, self.receiver = socket.socketpair()
+        sender.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4096)
+        self.port = SocketPort(sender)
+        self.start(lambda: self.receiver.recv(4096))
+
+    def close(self):
+        super().close()
+        self.thread.join(1.0)
+        self.receiver.close()
+
+
+class FdPort:
+    """serial.Serial-like writer over a file descriptor (used when pyserial is not installed)"""
+
+    def __init__(self, fd):
+        self.fd = fd
+        self.is_open = True
+
+    def write(self, data):
+        return os.write(self.fd, data)
+
+    def close(self):
+        if self.is_open:
+            self.is_open = False
+            os.close(self.fd)
+
+
+class PtyDevice(VirtualDevice):
+    """Virtual serial port over a pseudo-terminal (POSIX only)
+
+    The experiment side opens the terminal with pyserial like a real port (raw mode, so no byte
+    is translated); the device reads the other side.
+    """
+
+    def __init__(self, baudrate=115200):
+        super().__init__()
+        import pty, tty
+        self.master, slave = pty.openpty()
+        tty.setraw(self.master)
+        tty.setraw(slave)
+        self.name = os.ttyname(slave)
+        try:
+            import serial
+            self.port = serial.Serial(self.name, baudrate)
+            os.close(slave)
+        except ImportError:
+            self.port = FdPort(slave)
+        self.start(lambda: os.read(self.master, 4096))
+
+    def close(self):
+        super().close()
+        os.close(self.master)  # el lector recibe EOF/EIO y termina
+        self.thread.join(1.0)
+
+
+class VirtualLpt:
+    """dlportio-like parallel port recording every (value, perf_counter_ns) written"""
+
+    def __init__(self):
+        self.received = []
+
+    def DlPortWritePortUchar(self, address, value):
+        self.received.append((value, perf_counter_ns()))
+
+    def clear(self):
+        self.received = []
+
+
+def open_virtual(name, baudrate=115200):
+    """Creates a virtual device by name ("loopback" or "pty"), returns it (its port is device.port)"""
+    if name == "loopback":
+        return LoopbackDevice()
+    if name == "pty":
+        if sys.platform == "win32":
+            raise OSError("pty no está disponible en Windows, use loopback")
+        return PtyDevice(baudrate)
+    raise ValueError(f"Puerto virtual desconocido: {name}")
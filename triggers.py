@@ -0,0 +1,110 @@
+# coding=utf-8
+
+"""
+Envío de triggers en un hilo de fondo.
+
+El ciclo de presentación solo encola el código (no bloquea); el hilo escribe el pulso en el
+puerto serial y/o paralelo, mantiene el ancho de pulso, vuelve a cero y registra los tiempos
+de encolado y escritura de cada código. El orden de envío se mantiene (una sola cola FIFO) y
+un pulso nunca se superpone al siguiente.
+"""
+import queue, threading
+from time import perf_counter_ns
+
+from scheduler import sleep_until
+
+
+class TriggerDispatcher:
+    """Background worker writing trigger pulses to the serial port and/or parallel port"""
+
+    def __init__(self, serial_port=None, lpt=None, lpt_address=None, pulse_ms=5, serial_reset=False,
+                 names=None, verbose=False, telemetry=None):
+        self.serial_port = serial_port
+        self.lpt = lpt
+        self.lpt_address = lpt_address
+        self.pulse_ns = int(pulse_ms * 1_000_000)
+        self.serial_reset = serial_reset  # algunos equipos necesitan un 0 explícito por serial
+        self.names = {code: name for name, code in (names or {}).items()}
+        self.verbose = verbose
+        self.telemetry = telemetry  # telemetry.Telemetry, registra cada escritura
+
+        self.log = []  # (código, encolado_ns, escrito_ns, vuelta_a_cero_ns, ok)
+        self.queue = queue.SimpleQueue()
+        self.pending = 0
+        self.idle = threading.Condition()
+        self.thread = threading.Thread(target=self.run, name="triggers", daemon=True)
+        self.thread.start()
+
+    def send(self, code):
+        """Queues a trigger code, returns immediately"""
+        with self.idle:
+            self.pending += 1
+        self.queue.put((code, perf_counter_ns()))
+
+    def write(self, code):
+        """Writes the code to every port, returns False if any write failed"""
+        ok = True
+        if self.serial_port is not None:
+            try:
+                self.serial_port.write(code.to_bytes(1, 'little'))
+            except Exception:
+                ok = False
+        if self.lpt is not None:
+            try:
+                self.lpt.DlPortWritePortUchar(self.lpt_address, code)
+            except Exception:
+                ok = False
+        return ok
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            code, queued = item
+
+            ok = self.write(code)
+            written = perf_counter_ns()
+            if self.telemetry is not None:
+                self.telemetry.record("trigger_escrito", code, written)
+            sleep_until(written + self.pulse_ns)  # ancho del pulso
+            if self.lpt is not None or self.serial_reset:
+                ok = self.write(0) and ok
+            reset = perf_counter_ns()
+
+            self.log.append((code, queued, written, reset, ok))
+            if self.verbose:
+                print(('Trigger ' if ok else 'Failed to send trigger ') + str(code))
+
+            with self.idle:
+                self.pending -= 1
+                self.idle.notify_all()
+
+    def flush(self, timeout=None):
+        """Waits until every queued trigger was written"""
+        with self.idle:
+            return self.idle.wait_for(lambda: self.pending == 0, timeout)
+
+    def close(self, timeout=1.0):
+        self.flush(timeout)
+        self.queue.put(None)
+        self.thread.join(timeout)
+
+    def summary(self):
+        """Per-code count, failures and queue-to-write latency"""
+        stats = {}
+        for code, queued, written, reset, ok in self.log:
+            entry = stats.setdefault(code, {"n": 0, "failed": 0, "latency": [], "width": []})
+            entry["n"] += 1
+            entry["failed"] += not ok
+            entry["latency"].append((written - queued) / 1e6)
+            entry["width"].append((reset - written) / 1e6)
+
+        lines = ["Triggers (código: n, latencia encolado->escritura media/máx, ancho de pulso medio):"]
+        for code, entry in sorted(stats.items()):
+            latency = entry["latency"]
+            lines.append(f"  {code:3d} {self.names.get(code, '')}: n={entry['n']} "
+                         f"latencia={sum(latency) / len(latency):.3f}/{max(latency):.3f} ms "
+                         f"ancho={sum(entry['width']) / len(entry['width']):.3f} ms"
+                         + (f" ({entry['failed']} fallidos)" if entry["failed"] else ""))
+        return "\n".join(lines)